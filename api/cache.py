@@ -0,0 +1,119 @@
+"""
+In-memory response cache for the report endpoints.
+
+Reports aggregate the whole of the marts, which only change when data is
+loaded or dbt runs. Responses are cached as encoded JSON, keyed on endpoint
+and parameters, and valid for one warehouse data version
+(raw.warehouse_version, bumped by every load and dbt run). Entries also
+expire after a TTL, for changes made without a bump. The cache is bounded
+by the size of the cached bodies and evicts least recently used entries.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+CACHE_MAX_MB = float(os.getenv('API_CACHE_MAX_MB', 64))
+CACHE_TTL_SECONDS = float(os.getenv('API_CACHE_TTL_SECONDS', 300))
+
+# The version is read from the database at most this often, so polling
+# dashboards do not add a query per request
+VERSION_CHECK_SECONDS = float(os.getenv('API_CACHE_VERSION_CHECK_SECONDS', 1))
+
+# Keys share this many locks while they are computed
+KEY_LOCKS = 16
+
+
+class ResponseCache:
+    """LRU cache of response bodies, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (version, expires_at, body)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.key_locks = [threading.Lock() for _ in range(KEY_LOCKS)]
+
+        self.version = None
+        self.version_checked = 0.0
+
+    def current_version(self, db):
+        """The warehouse data version, re-read every VERSION_CHECK_SECONDS; None without a version table."""
+        now = time.monotonic()
+        if now - self.version_checked < VERSION_CHECK_SECONDS:
+            return self.version
+
+        try:
+            version = db.execute(text("SELECT version FROM raw.warehouse_version")).scalar()
+        except SQLAlchemyError:
+            db.rollback()
+            version = None
+
+        with self.lock:
+            if version != self.version:
+                # Entries of other versions can never be served again
+                self.entries.clear()
+                self.size = 0
+            self.version, self.version_checked = version, now
+        return version
+
+    def get(self, key, version):
+        """Cached body for a key at a version, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < time.monotonic():
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key, version, body):
+        """Store a body, evicting least recently used entries to stay within max_bytes."""
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[2])
+            self.entries[key] = (version, time.monotonic() + self.ttl, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def key_lock(self, key):
+        """Lock held while a key is computed, so concurrent misses run the query once."""
+        return self.key_locks[hash(key) % KEY_LOCKS]
+
+
+response_cache = ResponseCache(int(CACHE_MAX_MB * 1024 * 1024), CACHE_TTL_SECONDS)
+
+
+def cached_response(db, endpoint, params, compute):
+    """
+    Serve endpoint(params) from the cache, or compute, encode and cache it.
+
+    compute returns the response data (e.g. a list of schema objects). The
+    X-Cache header tells whether the body came from the cache.
+    """
+    key = (endpoint, tuple(sorted(params.items())))
+    version = response_cache.current_version(db)
+
+    body = response_cache.get(key, version)
+    status = 'HIT'
+    if body is None:
+        with response_cache.key_lock(key):
+            # Another request may have filled it while this one waited
+            body = response_cache.get(key, version)
+            if body is None:
+                body = json.dumps(jsonable_encoder(compute())).encode()
+                response_cache.put(key, version, body)
+                status = 'MISS'
+
+    return Response(content=body, media_type='application/json', headers={'X-Cache': status})
@@ -3,11 +3,29 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 import pandas as pd
 from typing import List, Optional
+import os
+import re
 from . import schemas
+from .cache import cached_response
 from .database import get_db
 
 router = APIRouter()
 
+# Message search ranks and counts at most this many matches per query. The
+# full-text index returns matches in no useful order, so past the cap
+# results are the best of the first matches found, and the response says so
+SEARCH_MAX_CANDIDATES = int(os.getenv('API_SEARCH_MAX_CANDIDATES', 10000))
+
+# Match inside words with ILIKE; needs the pg_trgm index on fct_messages
+# (dbt var search_partial), without it every search scans the table
+SEARCH_PARTIAL = os.getenv('API_SEARCH_PARTIAL', 'false').lower() in ('1', 'true', 'yes')
+
+# Memory for the search's bitmap scans; at the 4MB default, common terms
+# overflow into lossy pages and every row on them is rechecked
+SEARCH_WORK_MEM = os.getenv('API_SEARCH_WORK_MEM', '64MB')
+
+SEARCH_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+
 @router.get("/health", response_model=schemas.HealthCheck)
 def health_check(db: Session = Depends(get_db)):
     """Check API and database health"""
@@ -44,7 +62,12 @@ def get_top_products(
     Get most frequently mentioned medical products or drugs across all channels.
     
     Extracts product terms from message text and counts mentions.
+    Served from the response cache until the warehouse data changes.
     """
+    return cached_response(db, 'top_products', {'limit': limit}, lambda: query_top_products(db, limit))
+
+def query_top_products(db: Session, limit: int) -> List[schemas.TopProduct]:
+    """Run the top products report query."""
     query = text("""
         WITH product_terms AS (
             SELECT 
@@ -140,45 +163,97 @@ def search_messages(
 ):
     """
     Search for messages containing specific keywords.
+    
+    Words match whole words or word prefixes through the full-text index on
+    fct_messages; with API_SEARCH_PARTIAL, queries of 3+ characters also
+    match inside words through the trigram index. Results are ranked by
+    relevance, then views, with the matches highlighted in a snippet. At most
+    API_SEARCH_MAX_CANDIDATES matches are counted and ranked;
+    total_count_capped tells when a query matched more.
     """
     offset = (page - 1) * limit
     
-    # Build query
-    sql = """
-        SELECT 
-            fm.message_id,
-            dc.channel_name,
-            fm.message_text,
-            fm.message_length,
-            fm.view_count,
-            fm.forward_count,
-            fm.has_media,
-            dd.full_date as post_timestamp,
-            fm.date_key
-        FROM medical_warehouse_marts.fct_messages fm
-        JOIN medical_warehouse_marts.dim_channels dc ON fm.channel_key = dc.channel_key
-        JOIN medical_warehouse_marts.dim_dates dd ON fm.date_key = dd.date_key
-        WHERE LOWER(fm.message_text) LIKE LOWER(:search_term)
-    """
+    # Every word is a prefix, so results update as the user types
+    words = re.findall(r'\w+', query.lower())
+    params = {
+        "tsquery": " & ".join(f"{word}:*" for word in words),
+        # One more than the cap, to tell whether the cap was reached
+        "max_candidates": SEARCH_MAX_CANDIDATES + 1,
+        "headline_options": SEARCH_HEADLINE_OPTIONS,
+        "limit": limit,
+        "offset": offset
+    }
     
-    params = {"search_term": f"%{query}%", "limit": limit, "offset": offset}
+    conditions = ["fm.search_vector @@ q.query"]
+    if SEARCH_PARTIAL and len(query.strip()) >= 3:
+        conditions.append("fm.message_text ILIKE :pattern")
+        escaped = query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params["pattern"] = f"%{escaped}%"
     
+    channel_filter = ""
     if channel_name:
-        sql += " AND dc.channel_name = :channel_name"
+        channel_filter = """
+              AND fm.channel_key IN (
+                  SELECT channel_key FROM medical_warehouse_marts.dim_channels WHERE channel_name = :channel_name
+              )"""
         params["channel_name"] = channel_name
     
-    # Count total
-    count_sql = f"SELECT COUNT(*) FROM ({sql.replace('dd.full_date as post_timestamp, fm.date_key', '1')}) as subquery"
-    total_count = db.execute(text(count_sql.replace("LIMIT :limit OFFSET :offset", "")), params).scalar()
-    
-    # Get paginated results
-    sql += " ORDER BY fm.view_count DESC LIMIT :limit OFFSET :offset"
+    # Matches are capped before ranking, so very common terms stay fast;
+    # snippets are only built for the returned page
+    sql = f"""
+        WITH matches AS (
+            SELECT 
+                fm.message_id,
+                fm.channel_key,
+                fm.date_key,
+                fm.message_text,
+                fm.message_length,
+                fm.view_count,
+                fm.forward_count,
+                fm.has_media,
+                ts_rank_cd(fm.search_vector, q.query) as rank
+            FROM medical_warehouse_marts.fct_messages fm,
+                 to_tsquery('simple', :tsquery) as q(query)
+            WHERE ({" OR ".join(conditions)}){channel_filter}
+            LIMIT :max_candidates
+        ),
+        page AS (
+            SELECT *
+            FROM matches
+            ORDER BY rank DESC, view_count DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT 
+            total.total_count,
+            page.message_id,
+            dc.channel_name,
+            page.message_text,
+            page.message_length,
+            page.view_count,
+            page.forward_count,
+            page.has_media,
+            dd.full_date as post_timestamp,
+            page.date_key,
+            page.rank,
+            ts_headline('simple', page.message_text, q.query, :headline_options) as snippet
+        FROM (SELECT COUNT(*) as total_count FROM matches) total
+        LEFT JOIN page ON TRUE
+        LEFT JOIN medical_warehouse_marts.dim_channels dc ON page.channel_key = dc.channel_key
+        LEFT JOIN medical_warehouse_marts.dim_dates dd ON page.date_key = dd.date_key
+        CROSS JOIN to_tsquery('simple', :tsquery) as q(query)
+        ORDER BY page.rank DESC, page.view_count DESC
+    """
     
-    result = db.execute(text(sql), params)
+    db.execute(text("SELECT set_config('work_mem', :work_mem, true)"), {"work_mem": SEARCH_WORK_MEM})
+    result = db.execute(text(sql), params).fetchall()
+    total_count = result[0].total_count if result else 0
+    total_count_capped = total_count > SEARCH_MAX_CANDIDATES
     
     messages = []
     for row in result:
-        messages.append(schemas.MessageResponse(
+        if row.message_id is None:
+            continue
+        messages.append(schemas.SearchResult(
             message_id=row.message_id,
             channel_name=row.channel_name,
             message_text=row.message_text,
@@ -187,12 +262,15 @@ def search_messages(
             forward_count=row.forward_count,
             has_media=row.has_media,
             post_timestamp=row.post_timestamp,
-            date_key=row.date_key
+            date_key=row.date_key,
+            rank=row.rank,
+            snippet=row.snippet
         ))
     
     return schemas.SearchResponse(
         messages=messages,
-        total_count=total_count,
+        total_count=min(total_count, SEARCH_MAX_CANDIDATES),
+        total_count_capped=total_count_capped,
         page=page,
         limit=limit
     )
@@ -202,7 +280,12 @@ def get_visual_content_stats(db: Session = Depends(get_db)):
     """
     Get statistics about image usage across channels.
     Includes YOLO detection categories.
+    Served from the response cache until the warehouse data changes.
     """
+    return cached_response(db, 'visual_content', {}, lambda: query_visual_content_stats(db))
+
+def query_visual_content_stats(db: Session) -> List[schemas.VisualContentStats]:
+    """Run the visual content report query."""
     query = text("""
         WITH channel_stats AS (
             SELECT 
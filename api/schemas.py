@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -55,9 +55,16 @@ class VisualContentStats(BaseModel):
     product_display_count: int
     other_count: int
 
+class SearchResult(MessageResponse):
+    rank: float
+    snippet: str
+
 class SearchResponse(BaseModel):
-    messages: List[MessageResponse]
-    total_count: int
+    messages: List[SearchResult]
+    total_count: int = Field(description="Matching messages, counted up to the search's candidate cap "
+                                         "(API_SEARCH_MAX_CANDIDATES)")
+    total_count_capped: bool = Field(description="More messages match than the cap; total_count stops at the cap, "
+                                                 "and results are ranked among the first matches found only")
     page: int
     limit: int
 
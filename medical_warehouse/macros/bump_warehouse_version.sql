@@ -0,0 +1,18 @@
+{% macro bump_warehouse_version() %}
+    -- Bump the warehouse data version after runs that rebuild models, so the
+    -- API recomputes its cached reports (see src/warehouse_version.py)
+    {% if execute and flags.WHICH in ('run', 'build', 'seed', 'snapshot') %}
+        CREATE TABLE IF NOT EXISTS raw.warehouse_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            updated_by VARCHAR(100)
+        );
+        INSERT INTO raw.warehouse_version (id, version, updated_at, updated_by)
+        VALUES (TRUE, 1, CURRENT_TIMESTAMP, 'dbt {{ flags.WHICH }}')
+        ON CONFLICT (id) DO UPDATE
+        SET version = raw.warehouse_version.version + 1,
+            updated_at = EXCLUDED.updated_at,
+            updated_by = EXCLUDED.updated_by;
+    {% endif %}
+{% endmacro %}
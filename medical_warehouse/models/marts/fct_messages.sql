@@ -1,4 +1,19 @@
-{{ config(materialized='table') }}
+{% set search_partial = var('search_partial') %}
+
+{{ config(
+    materialized='table',
+    pre_hook=("CREATE EXTENSION IF NOT EXISTS pg_trgm" if search_partial else []),
+    indexes=[
+        {'columns': ['search_vector'], 'type': 'gin'},
+        {'columns': ['channel_key']}
+    ] + ([{'columns': ['message_text gin_trgm_ops'], 'type': 'gin'}] if search_partial else [])
+) }}
+
+-- search_vector backs /api/search/messages: whole-word and prefix matches
+-- through its GIN index, ranked with ts_rank_cd. The 'simple' configuration
+-- splits Amharic and English alike, without language-specific stemming.
+-- With the search_partial var (and API_SEARCH_PARTIAL in the API), partial
+-- words are matched through a trigram index on message_text
 
 WITH messages AS (
     SELECT
@@ -38,5 +53,6 @@ SELECT
     image_path,
     edited,
     edit_date,
-    pinned
+    pinned,
+    TO_TSVECTOR('simple', COALESCE(message_text, '')) as search_vector
 FROM messages
\ No newline at end of file
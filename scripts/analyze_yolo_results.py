@@ -1,13 +1,53 @@
+import argparse
 import psycopg2
 import pandas as pd
 import os
+import sys
 from getpass import getpass
 
-def analyze_yolo_results():
-    """
-    Analyze YOLO detection results and answer business questions.
-    """
-    
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Lake equivalents of the mart queries, used when reading the files through DuckDB
+DUCKDB_ENGAGEMENT_QUERY = """
+WITH category_stats AS (
+    SELECT 
+        i.image_category,
+        COUNT(*) as post_count,
+        ROUND(AVG(m.views)::numeric, 0) as avg_views,
+        ROUND(AVG(m.forwards)::numeric, 1) as avg_forwards,
+        ROUND(AVG(i.confidence_score)::numeric, 2) as avg_confidence
+    FROM raw.yolo_detections i
+    JOIN raw.telegram_messages m
+        ON i.message_id = m.message_id AND i.channel_name = m.channel_username
+    GROUP BY i.image_category
+)
+SELECT * FROM category_stats
+ORDER BY avg_views DESC;
+"""
+
+DUCKDB_VISUAL_CONTENT_QUERY = """
+SELECT 
+    m.channel_name,
+    CASE 
+        WHEN m.channel_name ILIKE '%pharma%' OR m.channel_name ILIKE '%drug%' OR m.channel_name ILIKE '%med%' THEN 'Pharmaceutical'
+        WHEN m.channel_name ILIKE '%cosmetic%' OR m.channel_name ILIKE '%beauty%' THEN 'Cosmetics'
+        ELSE 'Medical'
+    END as channel_type,
+    COUNT(DISTINCT m.message_id) as total_posts,
+    COUNT(DISTINCT i.message_id) as posts_with_images,
+    ROUND(100.0 * COUNT(DISTINCT i.message_id) / NULLIF(COUNT(DISTINCT m.message_id), 0), 1) as image_percentage,
+    STRING_AGG(DISTINCT i.image_category, ', ') as detected_categories
+FROM raw.telegram_messages m
+LEFT JOIN raw.yolo_detections i
+    ON m.message_id = i.message_id AND m.channel_username = i.channel_name
+GROUP BY m.channel_name
+ORDER BY image_percentage DESC NULLS LAST;
+"""
+
+
+def connect_postgres():
+    """Connect to the PostgreSQL warehouse, trying common passwords first."""
     # Try to get password from environment variable first
     db_password = os.getenv('DB_PASSWORD')
     
@@ -46,7 +86,34 @@ def analyze_yolo_results():
     except Exception as e:
         print(f"❌ Connection failed: {e}")
         print("\nTrying common passwords...")
-        return
+        return None
+    
+    # Reports are read-only; autocommit keeps one failing query from
+    # aborting the transaction for the ones after it
+    conn.autocommit = True
+    return conn
+
+
+def analyze_yolo_results(use_duckdb=False):
+    """
+    Analyze YOLO detection results and answer business questions.
+    
+    With use_duckdb the reports run directly over the lake files,
+    data/yolo_detections.csv and data/yolo_boxes.parquet instead of the
+    PostgreSQL warehouse.
+    """
+    if use_duckdb:
+        from src.load_to_db import DataLoader
+        
+        loader = DataLoader(backend='duckdb', include_raw=False)
+        loader.create_views()
+        conn = loader.conn
+        read_query = loader.read_query
+    else:
+        conn = connect_postgres()
+        if conn is None:
+            return
+        read_query = lambda query: pd.read_sql_query(query, conn)
     
     print("📊 YOLO DETECTION ANALYSIS")
     print("=" * 60)
@@ -65,7 +132,7 @@ def analyze_yolo_results():
     """
     
     try:
-        df1 = pd.read_sql_query(query1, conn)
+        df1 = read_query(query1)
         print(df1.to_string(index=False))
     except Exception as e:
         print(f"Error: {e}")
@@ -89,7 +156,7 @@ def analyze_yolo_results():
     """
     
     try:
-        df2 = pd.read_sql_query(query2, conn)
+        df2 = read_query(DUCKDB_ENGAGEMENT_QUERY if use_duckdb else query2)
         print(df2.to_string(index=False))
     except Exception as e:
         print(f"Error: {e}")
@@ -112,7 +179,7 @@ def analyze_yolo_results():
     """
     
     try:
-        df3 = pd.read_sql_query(query3, conn)
+        df3 = read_query(DUCKDB_VISUAL_CONTENT_QUERY if use_duckdb else query3)
         print(df3.to_string(index=False))
     except Exception as e:
         print(f"Error: {e}")
@@ -120,24 +187,21 @@ def analyze_yolo_results():
     # 4. Most common detected objects
     print("\n4. MOST COMMON DETECTED OBJECTS:")
     query4 = """
-    WITH objects AS (
-        SELECT 
-            TRIM(UNNEST(STRING_TO_ARRAY(detected_objects, ','))) as object_name
-        FROM raw.yolo_detections
-        WHERE detected_objects != ''
-    )
     SELECT 
-        object_name,
+        class_name as object_name,
+        COUNT(DISTINCT image_path) as image_count,
         COUNT(*) as detection_count,
-        ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER(), 1) as percentage
-    FROM objects
-    GROUP BY object_name
+        ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER(), 1) as percentage,
+        ROUND(AVG(confidence)::numeric, 2) as avg_confidence
+    FROM raw.yolo_boxes
+    WHERE confidence > 0.5
+    GROUP BY class_name
     ORDER BY detection_count DESC
     LIMIT 10;
     """
     
     try:
-        df4 = pd.read_sql_query(query4, conn)
+        df4 = read_query(query4)
         print(df4.to_string(index=False))
     except Exception as e:
         print(f"Error: {e}")
@@ -158,4 +222,12 @@ def analyze_yolo_results():
     print("   - Understand YOLO's capabilities and limitations")
 
 if __name__ == "__main__":
-    analyze_yolo_results()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Analyze YOLO detection results')
+    parser.add_argument(
+        '--duckdb',
+        action='store_true',
+        help='Query the data lake files directly with DuckDB instead of PostgreSQL'
+    )
+    args = parser.parse_args()
+    
+    analyze_yolo_results(use_duckdb=args.duckdb)
\ No newline at end of file
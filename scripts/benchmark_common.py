@@ -0,0 +1,99 @@
+"""
+Helpers shared by the benchmark scripts: isolated case runs, peak RSS and
+JSON baselines with regression thresholds.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Marker for the line a case subprocess reports its result on
+RESULT_MARKER = 'BENCH_RESULT '
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB."""
+    if resource is None:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except (ImportError, AttributeError):
+            return None
+
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+def report_result(result):
+    """Print a case result for the parent process to pick up."""
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+
+
+def run_case(script, args, env=None):
+    """
+    Run one benchmark case in a fresh interpreter and return its result dict.
+
+    Each case gets its own process so peak RSS is measured per case.
+    """
+    completed = subprocess.run(
+        [sys.executable, str(script), *args],
+        capture_output=True,
+        text=True,
+        env={**os.environ, **(env or {})},
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+
+    raise RuntimeError(
+        f"Benchmark case {' '.join(args)} failed (exit {completed.returncode}):\n"
+        f"{completed.stderr[-2000:] or completed.stdout[-2000:]}"
+    )
+
+
+def load_baseline(path):
+    """Load a baseline file, or return an empty dict when there is none."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_results(path, results):
+    """Write results (or a baseline) as pretty-printed JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True), encoding='utf-8')
+
+
+def find_regressions(results, baseline, metric, threshold, higher_is_better=True):
+    """
+    Compare results to a baseline and describe every case that regressed.
+
+    A case regresses when metric is worse than the baseline value by more
+    than threshold (a fraction, e.g. 0.2 for 20%).
+    """
+    regressions = []
+    for case, result in results.items():
+        expected = baseline.get(case, {}).get(metric)
+        actual = result.get(metric)
+        if not expected or actual is None:
+            continue
+
+        change = (actual - expected) / expected
+        if not higher_is_better:
+            change = -change
+        if change < -threshold:
+            regressions.append(f"{case}: {metric} {actual:,.1f} vs baseline {expected:,.1f} ({change:+.0%})")
+    return regressions
@@ -0,0 +1,216 @@
+"""
+Detection throughput and latency benchmark.
+
+Runs detect_objects_in_images (src/yolo_detect.py) over a fixed synthetic
+image set at several resolutions, batch sizes and process counts and
+reports images/s, per-image latency percentiles, peak RSS and the time
+spent in each stage (discover, hash, decode, stall, infer, postprocess,
+write). Results are compared with a JSON baseline and the run fails when
+throughput drops past the threshold.
+
+    python scripts/benchmark_detection.py --resolutions 640x480 1280x720 --batch-sizes 1 8
+    python scripts/benchmark_detection.py --backend onnx --int8
+    python scripts/benchmark_detection.py --processes 1 2
+    YOLO_TENSOR_CACHE_MB=512 python scripts/benchmark_detection.py --repeat 2
+    python scripts/benchmark_detection.py --save-baseline
+
+Each case goes through the same pipeline as a detection run, configured by
+the YOLO_* environment: decode prefetching, sharding across processes,
+near-duplicate hashing and the tensor cache. Every run detects all images
+again (force); the tensor cache is kept between the runs of a case, so with
+--repeat the fastest run is a warm-cache one.
+
+Decode seconds are summed over the decode threads, and stall is the time
+the model waited for a decoded image. Per-image latency is the time from
+asking for an image's batch to its finished detection row, so larger
+batches trade latency for throughput.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_common import (
+    find_regressions, load_baseline, peak_rss_mb, report_result, run_case, save_results
+)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+RESOLUTIONS = ['640x480', '1280x720', '1920x1080']
+
+DEFAULT_BASELINE = PROJECT_DIR / 'benchmarks' / 'detection_baseline.json'
+DEFAULT_IMAGE_DIR = PROJECT_DIR / 'benchmarks' / 'lakes' / 'detection'
+
+STAGES = ['discover', 'hash', 'decode', 'stall', 'infer', 'postprocess', 'write']
+
+
+def ensure_images(image_root, resolution, count):
+    """
+    Generate the synthetic image set for a resolution unless it already exists.
+
+    The set is laid out like a project directory (data/raw/images/<channel>),
+    so a case runs detection from inside it.
+    """
+    from scripts.generate_synthetic_lake import make_jpeg
+
+    path = Path(image_root) / f"{resolution}_{count}"
+    channel_dir = path / 'data' / 'raw' / 'images' / 'bench_channel'
+    marker = channel_dir.parent / '.complete'
+    if not marker.exists():
+        print(f"📦 Generating {count} {resolution} images in {path}...")
+        width, height = (int(side) for side in resolution.split('x'))
+        # Fixed seed so every run measures the same input
+        rng = random.Random(42)
+        channel_dir.mkdir(parents=True, exist_ok=True)
+        for message_id in range(count):
+            (channel_dir / f"{message_id}_20260101_000000.jpg").write_bytes(make_jpeg(rng, width, height))
+        marker.touch()
+    return path
+
+
+def percentile(values, q):
+    """q-th percentile of values (nearest rank); None when there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_case_in_process(work_dir, batch_size, backend, int8, processes):
+    """Run one case in this process and report its measurements."""
+    # Model weights and exports stay where they are; everything else is
+    # read and written inside the image set
+    os.environ['YOLO_WEIGHTS'] = str(Path(os.getenv('YOLO_WEIGHTS', 'yolov8n.pt')).resolve())
+    os.chdir(work_dir)
+
+    import cv2
+    from src.image_index import IMAGE_DIR, list_images
+    from src.yolo_detect import BOX_CONFIDENCE, detect_objects_in_images
+    from src.yolo_export import load_model
+
+    # The model is loaded and warmed up outside the measurement; sharded
+    # cases load theirs in every process, which is measured
+    model, model_seconds = None, 0.0
+    warmup_paths = list_images(IMAGE_DIR, refresh=True)[:batch_size]
+    if processes <= 1 and warmup_paths:
+        start = time.perf_counter()
+        model = load_model(backend, int8)
+        model([cv2.imread(path) for path in warmup_paths], verbose=False, batch=len(warmup_paths),
+              conf=BOX_CONFIDENCE)
+        model_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = detect_objects_in_images(batch_size=batch_size, force=True, backend=backend, int8=int8,
+                                       processes=processes, model=model)
+    seconds = time.perf_counter() - start
+
+    stages = summary['stats']
+    stages['infer'] = stages.get('inference', 0.0)
+    latencies = summary['latencies']
+    report_result({
+        'images': summary['images'],
+        'detected': summary['detected'],
+        'duplicates': summary['duplicates'],
+        'failed': summary['failed'],
+        'seconds': round(seconds, 3),
+        'images_per_s': round(summary['pending'] / seconds, 2) if summary['pending'] else 0.0,
+        'latency_ms': {
+            f"p{q}": round(percentile(latencies, q) * 1000, 1) if latencies else None for q in (50, 95, 99)
+        },
+        'peak_rss_mb': round(peak_rss_mb() or 0, 1),
+        'model_load_s': round(model_seconds, 3),
+        'stages': {stage: round(stages.get(stage, 0.0), 3) for stage in STAGES},
+    })
+
+
+def print_results(results):
+    """Print a results table."""
+    print(f"\n{'case':<32} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8}  stages (s)")
+    print("-" * 120)
+    for case, result in sorted(results.items()):
+        stages = ', '.join(f"{name}={value}" for name, value in result['stages'].items())
+        latency = {q: '-' if ms is None else f"{ms:.1f}" for q, ms in result['latency_ms'].items()}
+        print(f"{case:<32} {result['images_per_s']:>8.2f} {latency['p50']:>8} {latency['p95']:>8} "
+              f"{latency['p99']:>8} {result['peak_rss_mb']:>8.1f}  {stages}")
+
+
+def main():
+    """Parse arguments, run the benchmark matrix and check for regressions."""
+    parser = argparse.ArgumentParser(description='Benchmark YOLO detection throughput and latency')
+    parser.add_argument('--resolutions', nargs='+', default=['640x480', '1280x720'], choices=RESOLUTIONS,
+                        help='Image resolutions to benchmark')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8], help='Batch sizes to benchmark')
+    parser.add_argument('--processes', nargs='+', type=int, default=[1],
+                        help='Detection process counts to benchmark (see YOLO_PROCESSES)')
+    parser.add_argument('--images', type=int, default=64, help='Images per resolution')
+    parser.add_argument('--backend', default='pytorch', choices=['pytorch', 'onnx', 'openvino'],
+                        help='Inference backend (see src/yolo_export.py)')
+    parser.add_argument('--int8', action='store_true', help='Use the int8-quantized onnx export')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept')
+    parser.add_argument('--image-dir', default=str(DEFAULT_IMAGE_DIR), help='Where generated images are kept')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed throughput drop versus the baseline (fraction)')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--batch-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case_in_process(args.run_case, args.batch_size, args.backend, args.int8, args.processes[0])
+        return
+
+    backend = f"{args.backend}{'-int8' if args.int8 else ''}"
+    results = {}
+    for resolution in args.resolutions:
+        image_dir = ensure_images(args.image_dir, resolution, args.images)
+        for batch_size, processes in itertools.product(args.batch_sizes, args.processes):
+            key = f"{backend}/{resolution}/b{batch_size}" + (f"/p{processes}" if processes > 1 else "")
+            case_args = ['--run-case', str(image_dir), '--batch-size', str(batch_size), '--backend', args.backend,
+                         '--processes', str(processes)]
+            if args.int8:
+                case_args.append('--int8')
+            runs = [run_case(__file__, case_args) for _ in range(args.repeat)]
+            results[key] = max(runs, key=lambda run: run['images_per_s'])
+            p95 = results[key]['latency_ms']['p95']
+            print(f"  ✓ {key}: {results[key]['images_per_s']:,.2f} images/s, "
+                  f"p95 {'-' if p95 is None else f'{p95:,.0f}'} ms")
+
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, {'created_at': datetime.now().isoformat(), 'results': results})
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_results(args.baseline, baseline)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    regressions = find_regressions(results, baseline, 'images_per_s', args.threshold)
+    if regressions:
+        print(f"\n❌ Throughput regressed by more than {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+
+    print(f"\n✅ No throughput regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Loader throughput benchmark.
+
+Runs DataLoader (SQLite, and PostgreSQL when one is reachable) and
+scripts/load_raw_data.py against fixed-size synthetic lakes and reports
+rows/s, MB/s, peak RSS and per-phase timings. Results are compared with a
+JSON baseline and the run fails when throughput drops past the threshold.
+
+    python scripts/benchmark_loader.py --sizes 10k 100k
+    python scripts/benchmark_loader.py --save-baseline
+
+PostgreSQL cases use a scratch database (BENCH_DB_NAME, default
+telegram_warehouse_bench) with the usual DB_HOST/DB_PORT/DB_USER/DB_PASSWORD.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_common import (
+    find_regressions, load_baseline, peak_rss_mb, report_result, run_case, save_results
+)
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Lake sizes in messages; lakes are generated once and reused
+LAKE_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+DEFAULT_BASELINE = PROJECT_DIR / 'benchmarks' / 'loader_baseline.json'
+DEFAULT_LAKE_DIR = PROJECT_DIR / 'benchmarks' / 'lakes'
+
+
+def ensure_lake(lake_dir, size):
+    """Generate the synthetic lake for a size unless it already exists."""
+    from scripts.generate_synthetic_lake import generate_lake
+
+    path = Path(lake_dir) / size
+    marker = path / '.complete'
+    if not marker.exists():
+        print(f"📦 Generating {size} lake in {path}...")
+        # Fixed shape and seed so every run measures the same input
+        generate_lake(path, channels=10, messages=LAKE_SIZES[size], days=30,
+                      images=False, end_date='2026-01-31', seed=42)
+        marker.touch()
+    return path
+
+
+def lake_megabytes(lake):
+    """Size of the message partition files of a lake, in MB."""
+    files = (Path(lake) / 'raw' / 'telegram_messages').glob('*/*.json')
+    return sum(f.stat().st_size for f in files) / 1e6
+
+
+def bench_db_env():
+    """Environment pointing the loaders at the scratch benchmark database."""
+    return {'DB_NAME': os.getenv('BENCH_DB_NAME', 'telegram_warehouse_bench')}
+
+
+def postgres_available():
+    """Check the benchmark database is reachable, creating it if needed."""
+    try:
+        import psycopg2
+    except ImportError:
+        return False
+
+    params = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', 'postgres'),
+        'connect_timeout': 3,
+    }
+    database = bench_db_env()['DB_NAME']
+    try:
+        psycopg2.connect(database=database, **params).close()
+        return True
+    except psycopg2.OperationalError:
+        pass
+
+    try:
+        conn = psycopg2.connect(database='postgres', **params)
+        conn.autocommit = True
+        # Message text is mostly non-ASCII, so don't inherit a SQL_ASCII template
+        conn.cursor().execute(f'CREATE DATABASE "{database}" ENCODING \'UTF8\' TEMPLATE template0')
+        conn.close()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def reset_postgres():
+    """Drop the raw tables of the benchmark database so every run starts empty."""
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.environ['DB_NAME'],
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+    )
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("CREATE SCHEMA IF NOT EXISTS raw")
+    cursor.execute("DROP TABLE IF EXISTS raw.telegram_messages, raw.telegram_message_payloads, raw.telegram_channels CASCADE")
+    conn.close()
+
+
+def run_case_in_process(case, lake):
+    """Run one case in this process and report its measurements."""
+    os.environ['DATA_DIR'] = str(Path(lake).resolve())
+    workdir = tempfile.mkdtemp(prefix='bench_loader_')
+    os.chdir(workdir)
+
+    phases = {}
+    output = io.StringIO()
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(output):
+        if case == 'load_raw_data':
+            from scripts.load_raw_data import recreate_and_load
+
+            rows = recreate_and_load()
+        else:
+            from src.load_to_db import DataLoader
+
+            if case == 'postgres':
+                reset_postgres()
+            loader = DataLoader(use_sqlite=case == 'sqlite')
+            loader.create_tables()
+            loader.load_channels()
+            rows = loader.load_messages()
+            phases = {phase: round(seconds, 3) for phase, seconds in loader.timings.items()}
+
+    seconds = time.perf_counter() - start
+    megabytes = lake_megabytes(lake)
+    report_result({
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_s': round(rows / seconds, 1),
+        'mb_per_s': round(megabytes / seconds, 2),
+        'peak_rss_mb': round(peak_rss_mb() or 0, 1),
+        'phases': phases,
+    })
+
+
+def print_results(results):
+    """Print a results table."""
+    print(f"\n{'case':<24} {'rows':>10} {'rows/s':>12} {'MB/s':>8} {'RSS MB':>8}  phases (s)")
+    print("-" * 100)
+    for case, result in sorted(results.items()):
+        phases = ', '.join(f"{name}={value}" for name, value in result['phases'].items())
+        print(f"{case:<24} {result['rows']:>10,} {result['rows_per_s']:>12,.0f} "
+              f"{result['mb_per_s']:>8.2f} {result['peak_rss_mb']:>8.1f}  {phases}")
+
+
+def main():
+    """Parse arguments, run the benchmark matrix and check for regressions."""
+    parser = argparse.ArgumentParser(description='Benchmark the raw data loaders')
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k'], choices=sorted(LAKE_SIZES),
+                        help='Lake sizes to benchmark')
+    parser.add_argument('--cases', nargs='+', default=['sqlite', 'postgres', 'load_raw_data'],
+                        choices=['sqlite', 'postgres', 'load_raw_data'], help='Loaders to benchmark')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept')
+    parser.add_argument('--lake-dir', default=str(DEFAULT_LAKE_DIR), help='Where generated lakes are kept')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed throughput drop versus the baseline (fraction)')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--lake', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case_in_process(args.run_case, args.lake)
+        return
+
+    cases = list(args.cases)
+    if {'postgres', 'load_raw_data'} & set(cases) and not postgres_available():
+        print("⚠️  PostgreSQL not reachable, skipping postgres and load_raw_data cases")
+        cases = [case for case in cases if case == 'sqlite']
+
+    results = {}
+    for size in args.sizes:
+        lake = ensure_lake(args.lake_dir, size)
+        for case in cases:
+            key = f"{case}/{size}"
+            env = bench_db_env() if case != 'sqlite' else None
+            runs = [run_case(__file__, ['--run-case', case, '--lake', str(lake)], env) for _ in range(args.repeat)]
+            results[key] = max(runs, key=lambda run: run['rows_per_s'])
+            print(f"  ✓ {key}: {results[key]['rows_per_s']:,.0f} rows/s")
+
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, {'created_at': datetime.now().isoformat(), 'results': results})
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_results(args.baseline, baseline)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    regressions = find_regressions(results, baseline, 'rows_per_s', args.threshold)
+    if regressions:
+        print(f"\n❌ Throughput regressed by more than {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+
+    print(f"\n✅ No throughput regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
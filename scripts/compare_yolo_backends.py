@@ -0,0 +1,100 @@
+"""
+Compare an optimized YOLO backend with the PyTorch model on archive images.
+
+Reports per-image latency of both and how often they agree on the image
+category and on the set of detected objects. Exits non-zero when category
+agreement falls below the tolerance.
+
+    python scripts/compare_yolo_backends.py --backend onnx --int8
+    python scripts/compare_yolo_backends.py --backend openvino --images 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import cv2
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.categorize import categorize_boxes
+from src.image_index import list_images
+from src.yolo_detect import category_rules, detected_boxes, detected_object_names
+from src.yolo_export import BACKENDS, load_model
+
+
+def sample_images(image_dir, count):
+    """Load a fixed random sample of archive images into memory."""
+    image_paths = list_images(image_dir)
+    sample = random.Random(0).sample(sorted(image_paths), min(count, len(image_paths)))
+    images = [(path, cv2.imread(path)) for path in sample]
+    return [(path, image) for path, image in images if image is not None]
+
+
+def run_model(model, images):
+    """Run a model image by image; returns per-image latencies (ms), detected objects and categories."""
+    model(images[0][1], verbose=False)  # Warm-up
+
+    latencies, objects, categories = [], [], []
+    for _, image in images:
+        start = time.perf_counter()
+        detection_results = model(image, verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        objects.append(detected_object_names(detection_results))
+        height, width = detection_results.orig_shape
+        categories.append(categorize_boxes(detected_boxes(detection_results), width, height, category_rules()))
+    return latencies, objects, categories
+
+
+def main():
+    """Compare a backend against PyTorch and check category agreement."""
+    parser = argparse.ArgumentParser(description='Compare a YOLO CPU backend with PyTorch')
+    parser.add_argument('--backend', default='onnx', choices=[b for b in BACKENDS if b != 'pytorch'],
+                        help='Backend to compare against PyTorch')
+    parser.add_argument('--int8', action='store_true', help='Use the int8-quantized export')
+    parser.add_argument('--images', type=int, default=100, help='Number of archive images to compare on')
+    parser.add_argument('--image-dir', default='data/raw/images', help='Image archive')
+    parser.add_argument('--tolerance', type=float, default=0.98,
+                        help='Minimum fraction of images whose category must match')
+    args = parser.parse_args()
+
+    images = sample_images(args.image_dir, args.images)
+    if not images:
+        print(f"❌ No images found under {args.image_dir}")
+        sys.exit(1)
+
+    label = f"{args.backend}{' int8' if args.int8 else ''}"
+    print(f"📸 Comparing pytorch and {label} on {len(images)} images")
+
+    base_latencies, base_objects, base_categories = run_model(load_model('pytorch'), images)
+    latencies, objects, categories = run_model(
+        load_model(args.backend, args.int8, calibration_dir=args.image_dir), images
+    )
+
+    category_agreement = statistics.mean(a == b for a, b in zip(base_categories, categories))
+    objects_agreement = statistics.mean(a == b for a, b in zip(base_objects, objects))
+
+    print(f"\n{'backend':<16} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    print("-" * 50)
+    for name, values in (('pytorch', base_latencies), (label, latencies)):
+        p95 = sorted(values)[int(0.95 * (len(values) - 1))]
+        print(f"{name:<16} {statistics.mean(values):>10.1f} {statistics.median(values):>10.1f} {p95:>10.1f}")
+
+    speedup = statistics.mean(base_latencies) / statistics.mean(latencies)
+    print(f"\n⚡ Per-image latency: {speedup:.2f}x vs pytorch")
+    print(f"🎯 Category agreement: {category_agreement:.1%} (tolerance {args.tolerance:.0%})")
+    print(f"   Detected-object sets identical: {objects_agreement:.1%}")
+
+    if category_agreement < args.tolerance:
+        print(f"\n❌ {label} disagrees with pytorch on more than {1 - args.tolerance:.0%} of images")
+        sys.exit(1)
+
+    print(f"\n✅ {label} is within tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Generate a synthetic data lake for scale testing.
+
+Writes message partitions, channel info files and images in exactly the
+layout and format TelegramScraper produces, so DataLoader, dbt and the API
+can be exercised at 10k, 1M or 10M messages on one machine:
+
+    <output>/raw/telegram_messages/YYYY-MM-DD/<channel>_YYYY-MM-DD.json
+    <output>/raw/channels/<channel>_info.json
+    <output>/raw/images/<channel>/<message_id>_YYYYMMDD_HHMMSS.jpg
+
+Point the loaders at it with DATA_DIR=<output>.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Images are skipped without Pillow
+    Image = None
+
+# Vocabulary the message texts are drawn from
+ENGLISH_WORDS = [
+    'paracetamol', 'aspirin', 'ibuprofen', 'vitamin', 'calcium', 'zinc', 'cream', 'ointment',
+    'tablet', 'capsule', 'syrup', 'injection', 'antibiotic', 'antiseptic', 'serum', 'lotion',
+    'omega', 'protein', 'collagen', 'd3', '500mg', '250mg', '100mg', 'available', 'now', 'in',
+    'stock', 'price', 'call', 'order', 'delivery', 'free', 'original', 'new', 'best', 'for',
+    'skin', 'hair', 'health', 'pharmacy', 'discount', 'the', 'and', 'with', 'quality', 'birr',
+]
+AMHARIC_WORDS = [
+    'መድሃኒት', 'ዋጋ', 'ጤና', 'ቅናሽ', 'ክሬም', 'ቫይታሚን', 'ታብሌት', 'ይደውሉ', 'አድራሻ', 'አዲስ',
+    'አበባ', 'ብር', 'ለቆዳ', 'ለፀጉር', 'ያገኛሉ', 'በቅናሽ', 'ዋናው', 'ምርት', 'ፋርማሲ', 'እና',
+]
+CHANNEL_SUFFIXES = ['pharma', 'cosmetics', 'medical', 'drugstore', 'beauty', 'health']
+
+# JPEG pool shared with the generator processes, set by the pool initializer
+_image_pool = []
+
+
+def _init_generator(image_pool):
+    """Pool initializer: keep one copy of the image pool per process."""
+    global _image_pool
+    _image_pool = image_pool
+
+
+def make_channels(count, seed):
+    """Build channel info dicts like TelegramScraper.get_channel_info returns."""
+    rng = random.Random(seed)
+    channels = []
+    for index in range(count):
+        username = f"synthetic_{CHANNEL_SUFFIXES[index % len(CHANNEL_SUFFIXES)]}_{index:04d}"
+        created = datetime(2018, 1, 1, tzinfo=timezone.utc) + timedelta(days=rng.randint(0, 2000))
+        channels.append({
+            'channel_id': 1_000_000_000 + index,
+            'channel_username': username,
+            'channel_name': username.replace('_', ' ').title(),
+            'description': f"Synthetic {CHANNEL_SUFFIXES[index % len(CHANNEL_SUFFIXES)]} channel",
+            'participants_count': rng.randint(500, 200_000),
+            'date_created': created.isoformat(),
+            'scraped_at': datetime.now(timezone.utc).isoformat(),
+            'is_verified': False,
+            'is_scam': False,
+            'total_messages': 0,
+        })
+    return channels
+
+
+def make_text(rng, median_words, amharic_ratio):
+    """Draw a message text with log-normally distributed length."""
+    length = max(1, int(rng.lognormvariate(0, 0.8) * median_words))
+    amharic = rng.random() < amharic_ratio
+    words = [
+        rng.choice(AMHARIC_WORDS) if amharic and rng.random() < 0.8 else rng.choice(ENGLISH_WORDS)
+        for _ in range(length)
+    ]
+    return ' '.join(words)
+
+
+def make_jpeg(rng, width, height):
+    """Render a small random product-like picture as JPEG bytes."""
+    image = Image.new('RGB', (width, height), tuple(rng.randint(150, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(2, 6)):
+        x0, y0 = rng.randint(0, width - 20), rng.randint(0, height - 20)
+        x1, y1 = rng.randint(x0 + 10, width), rng.randint(y0 + 10, height)
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def make_message(rng, message_id, channel, message_date, session_id, options):
+    """Build one message dict like TelegramScraper.extract_message_data returns."""
+    text = make_text(rng, options['median_words'], options['amharic_ratio'])
+    has_media = rng.random() < options['media_ratio']
+    media_type = None
+    if has_media:
+        media_type = 'MessageMediaPhoto' if rng.random() < 0.9 else 'MessageMediaDocument'
+    edited = rng.random() < 0.05
+    edit_date = (message_date + timedelta(minutes=rng.randint(1, 600))).isoformat() if edited else None
+    views = int(rng.paretovariate(1.5) * 200)
+    forwards = int(views * rng.random() * 0.02)
+
+    return {
+        'message_id': message_id,
+        'channel_id': channel['channel_id'],
+        'channel_username': channel['channel_username'],
+        'channel_name': channel['channel_name'],
+        'message_date': message_date.isoformat(),
+        'message_text': text,
+        'message_raw': {
+            '_': 'Message',
+            'id': message_id,
+            'peer_id': {'_': 'PeerChannel', 'channel_id': channel['channel_id']},
+            'date': message_date.replace(tzinfo=timezone.utc).isoformat(),
+            'message': text,
+            'out': False,
+            'mentioned': False,
+            'post': True,
+            'media': {'_': media_type, 'spoiler': False, 'ttl_seconds': None} if media_type else None,
+            'views': views,
+            'forwards': forwards,
+            'replies': None,
+            'edit_date': edit_date,
+            'post_author': None,
+            'grouped_id': None,
+            'entities': [],
+            'ttl_period': None,
+        },
+        'has_media': has_media,
+        'media_type': media_type,
+        'image_path': None,
+        'views': views,
+        'forwards': forwards,
+        'replies': 0,
+        'edited': edited,
+        'edit_date': edit_date,
+        'pinned': rng.random() < 0.01,
+        'via_bot': None,
+        'scraped_at': datetime.now(timezone.utc).isoformat(),
+        'scraping_session_id': session_id,
+    }
+
+
+def generate_partition(task):
+    """Write one channel/day partition file and its images; return (messages, images, bytes)."""
+    channel, day_index, first_message_id, count, options = task
+    rng = random.Random(f"{options['seed']}-{channel['channel_id']}-{day_index}")
+
+    output_dir = Path(options['output_dir'])
+    day = datetime.strptime(options['end_date'], '%Y-%m-%d') - timedelta(days=day_index)
+    date_str = day.strftime('%Y-%m-%d')
+    session_id = options['session_id']
+
+    # Newest first, as iter_messages returns them
+    offsets = sorted((rng.randint(0, 86_399) for _ in range(count)), reverse=True)
+    message_ids = range(first_message_id + count - 1, first_message_id - 1, -1)
+
+    image_pool = _image_pool
+    image_dir = output_dir / 'raw' / 'images' / channel['channel_username']
+    images_written = 0
+    bytes_written = 0
+
+    messages = []
+    for message_id, offset in zip(message_ids, offsets):
+        message_date = day + timedelta(seconds=offset)
+        message = make_message(rng, message_id, channel, message_date, session_id, options)
+
+        if message['has_media'] and image_pool:
+            filename = f"{message_id}_{message_date.strftime('%Y%m%d_%H%M%S')}.jpg"
+            image_path = image_dir / filename
+            image_dir.mkdir(parents=True, exist_ok=True)
+            image_bytes = rng.choice(image_pool)
+            image_path.write_bytes(image_bytes)
+            message['image_path'] = str(image_path.relative_to(output_dir))
+            images_written += 1
+            bytes_written += len(image_bytes)
+
+        messages.append(message)
+
+    date_dir = output_dir / 'raw' / 'telegram_messages' / date_str
+    date_dir.mkdir(parents=True, exist_ok=True)
+    filepath = date_dir / f"{channel['channel_username']}_{date_str}.json"
+    payload = json.dumps(messages, indent=2, ensure_ascii=False, default=str)
+    filepath.write_text(payload, encoding='utf-8')
+    bytes_written += len(payload.encode('utf-8'))
+
+    return len(messages), images_written, bytes_written
+
+
+def plan_partitions(channels, total_messages, days, options):
+    """Split the message budget over channel/day partitions with increasing message ids."""
+    rng = random.Random(options['seed'])
+    per_channel = [total_messages // len(channels)] * len(channels)
+    for index in range(total_messages % len(channels)):
+        per_channel[index] += 1
+
+    tasks = []
+    for channel, channel_total in zip(channels, per_channel):
+        # Uneven daily volume; message ids grow with time, so start from the oldest day
+        weights = [rng.uniform(0.5, 1.5) for _ in range(days)]
+        scale = channel_total / sum(weights)
+        counts = [int(w * scale) for w in weights]
+        counts[0] += channel_total - sum(counts)
+
+        next_id = 1
+        for day_index in reversed(range(days)):
+            if counts[day_index]:
+                tasks.append((channel, day_index, next_id, counts[day_index], options))
+                next_id += counts[day_index]
+        channel['total_messages'] = next_id - 1
+    return tasks
+
+
+def generate_lake(output_dir, channels=5, messages=10_000, days=30, median_words=25,
+                  amharic_ratio=0.3, media_ratio=0.4, images=True, distinct_images=200,
+                  image_size=(640, 480), end_date=None, seed=42, workers=None):
+    """Generate a synthetic lake under output_dir and return generation statistics."""
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+    session_id = datetime.now(timezone.utc).isoformat()
+
+    if images and Image is None:
+        print("⚠️  Pillow is not installed, skipping image generation (pip install pillow)")
+        images = False
+
+    # A fixed pool of pictures reused across messages, like sellers reposting photos
+    image_rng = random.Random(seed)
+    image_pool = [make_jpeg(image_rng, *image_size) for _ in range(distinct_images)] if images else []
+
+    options = {
+        'output_dir': str(output_dir),
+        'end_date': end_date or datetime.now().strftime('%Y-%m-%d'),
+        'median_words': median_words,
+        'amharic_ratio': amharic_ratio,
+        'media_ratio': media_ratio,
+        'session_id': session_id,
+        'seed': seed,
+    }
+
+    channel_infos = make_channels(channels, seed)
+    tasks = plan_partitions(channel_infos, messages, days, options)
+
+    totals = [0, 0, 0]
+    workers = workers or os.cpu_count() or 1
+    with Pool(workers, initializer=_init_generator, initargs=(image_pool,)) as pool:
+        for index, result in enumerate(pool.imap_unordered(generate_partition, tasks, chunksize=4), 1):
+            for i, value in enumerate(result):
+                totals[i] += value
+            if index % 100 == 0 or index == len(tasks):
+                print(f"  {index}/{len(tasks)} partitions, {totals[0]:,} messages")
+
+    channels_dir = output_dir / 'raw' / 'channels'
+    channels_dir.mkdir(parents=True, exist_ok=True)
+    for channel in channel_infos:
+        filepath = channels_dir / f"{channel['channel_username']}_info.json"
+        filepath.write_text(json.dumps(channel, indent=2, ensure_ascii=False, default=str), encoding='utf-8')
+
+    return {
+        'output_dir': str(output_dir),
+        'channels': channels,
+        'partitions': len(tasks),
+        'messages': totals[0],
+        'images': totals[1],
+        'bytes': totals[2],
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def parse_size(value):
+    """Parse WIDTHxHEIGHT."""
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    """Parse arguments and generate the lake."""
+    parser = argparse.ArgumentParser(description='Generate a synthetic Telegram data lake for scale testing')
+    parser.add_argument('--output', default='./data/synthetic', help='Lake root (use as DATA_DIR)')
+    parser.add_argument('--channels', type=int, default=5, help='Number of channels')
+    parser.add_argument('--messages', type=int, default=10_000, help='Total number of messages')
+    parser.add_argument('--days', type=int, default=30, help='Number of daily partitions per channel')
+    parser.add_argument('--end-date', help='Newest partition date (YYYY-MM-DD, default: today)')
+    parser.add_argument('--median-words', type=int, default=25, help='Median words per message (log-normal)')
+    parser.add_argument('--amharic-ratio', type=float, default=0.3, help='Share of mostly-Amharic messages')
+    parser.add_argument('--media-ratio', type=float, default=0.4, help='Share of messages with media')
+    parser.add_argument('--no-images', action='store_true', help='Do not write JPEG files')
+    parser.add_argument('--distinct-images', type=int, default=200, help='Distinct pictures reused across posts')
+    parser.add_argument('--image-size', type=parse_size, default=(640, 480), help='Image size as WIDTHxHEIGHT')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--workers', type=int, help='Generator processes (default: CPU count)')
+    args = parser.parse_args()
+
+    if Path(args.output).resolve() == Path('./data').resolve():
+        print("❌ Refusing to write a synthetic lake over ./data")
+        sys.exit(1)
+
+    print(f"Generating {args.messages:,} messages for {args.channels} channels over {args.days} days...")
+    stats = generate_lake(
+        args.output,
+        channels=args.channels,
+        messages=args.messages,
+        days=args.days,
+        median_words=args.median_words,
+        amharic_ratio=args.amharic_ratio,
+        media_ratio=args.media_ratio,
+        images=not args.no_images,
+        distinct_images=args.distinct_images,
+        image_size=args.image_size,
+        end_date=args.end_date,
+        seed=args.seed,
+        workers=args.workers,
+    )
+
+    print(f"\n✅ Generated {stats['messages']:,} messages, {stats['images']:,} images "
+          f"({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']}s")
+    print(f"   Load it with: DATA_DIR={stats['output_dir']} python src/load_to_db.py")
+
+
+if __name__ == "__main__":
+    main()
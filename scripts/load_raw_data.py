@@ -1,15 +1,33 @@
 # scripts/recreate_and_load.py
 import psycopg2
-import json
+from psycopg2.extras import execute_values
 import os
-from datetime import datetime
+import sys
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import encode_payload, iter_batches, iter_records
+from src.timestamps import parse_datetime_column
+
+# Messages inserted per parsed batch
+BATCH_SIZE = 5000
+
+# Columns of raw.telegram_messages in insert order; the key comes first
+MESSAGE_COLUMNS = [
+    'message_id', 'channel_id', 'channel_username', 'channel_name',
+    'message_date', 'message_text', 'has_media', 'media_type', 'image_path',
+    'views', 'forwards', 'replies', 'edited', 'edit_date', 'pinned',
+    'scraped_at', 'scraping_session_id'
+]
 
 def recreate_and_load():
     conn = psycopg2.connect(
-        host="localhost",
-        database="telegram_warehouse",
-        user="postgres",
-        password="password"
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'telegram_warehouse'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres')
     )
     
     cursor = conn.cursor()
@@ -17,13 +35,14 @@ def recreate_and_load():
     # Create raw schema
     cursor.execute("CREATE SCHEMA IF NOT EXISTS raw;")
     
-    # Drop existing table if it exists
+    # Drop existing tables if they exist
     cursor.execute("DROP TABLE IF EXISTS raw.telegram_messages;")
+    cursor.execute("DROP TABLE IF EXISTS raw.telegram_message_payloads;")
     
     # Create table with correct schema based on your JSON structure
     create_table_sql = """
     CREATE TABLE raw.telegram_messages (
-        message_id BIGINT PRIMARY KEY,
+        message_id BIGINT,
         channel_id BIGINT,
         channel_username VARCHAR(255),
         channel_name VARCHAR(255),
@@ -40,14 +59,40 @@ def recreate_and_load():
         pinned BOOLEAN,
         scraped_at TIMESTAMP,
         scraping_session_id VARCHAR(100),
-        raw_data JSONB
+        -- Telegram message ids are only unique within a channel
+        PRIMARY KEY (channel_id, message_id)
     );
     """
     cursor.execute(create_table_sql)
+    
+    # Full records live in a side table so scans of the typed table stay narrow.
+    # Payloads are zlib-compressed JSON already, so TOAST must not recompress them
+    cursor.execute("""
+    CREATE TABLE raw.telegram_message_payloads (
+        channel_id BIGINT,
+        message_id BIGINT,
+        payload BYTEA,
+        PRIMARY KEY (channel_id, message_id)
+    );
+    """)
+    cursor.execute("ALTER TABLE raw.telegram_message_payloads ALTER COLUMN payload SET STORAGE EXTERNAL;")
     print("✅ Table created with correct schema")
     
+    insert_sql = f"""
+    INSERT INTO raw.telegram_messages ({', '.join(MESSAGE_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (channel_id, message_id) DO UPDATE SET
+        {', '.join(f'{name} = EXCLUDED.{name}' for name in MESSAGE_COLUMNS[2:])};
+    """
+    
+    payload_sql = """
+    INSERT INTO raw.telegram_message_payloads (channel_id, message_id, payload)
+    VALUES %s
+    ON CONFLICT (channel_id, message_id) DO UPDATE SET payload = EXCLUDED.payload;
+    """
+    
     # Now load data from JSON files
-    base_dir = "data/raw/telegram_messages"
+    base_dir = os.path.join(os.getenv('DATA_DIR', 'data'), 'raw', 'telegram_messages')
     total_messages = 0
     
     # Walk through all date directories
@@ -62,65 +107,48 @@ def recreate_and_load():
                 print(f"📄 Loading {full_path}")
                 
                 try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        messages = json.load(f)
+                    # Stream the file in fixed-size batches instead of loading it whole
+                    for messages in iter_batches(iter_records(full_path, include_raw=True), BATCH_SIZE):
+                        # Parse each timestamp column once per batch
+                        message_dates = parse_datetime_column([m.get('message_date') for m in messages])
+                        edit_dates = parse_datetime_column([m.get('edit_date') for m in messages])
+                        scraped_ats = parse_datetime_column([m.get('scraped_at') for m in messages])
                         
-                        if not isinstance(messages, list):
-                            print(f"⚠️  Skipping: Expected list, got {type(messages)}")
-                            continue
-                        
-                        for message in messages:
+                        # A message scraped again (e.g. in two sessions) replaces the
+                        # earlier copy; within one statement each key may appear only once
+                        rows = {}
+                        for message, message_date, edit_date, scraped_at in zip(
+                            messages, message_dates, edit_dates, scraped_ats
+                        ):
                             # Use the exact field names from your JSON
-                            insert_sql = """
-                            INSERT INTO raw.telegram_messages 
-                            (message_id, channel_id, channel_username, channel_name, 
-                             message_date, message_text, has_media, media_type, image_path,
-                             views, forwards, replies, edited, edit_date, pinned,
-                             scraped_at, scraping_session_id, raw_data)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-                            """
-                            
-                            # Convert string dates to datetime objects
-                            message_date_str = message.get('message_date')
-                            edit_date_str = message.get('edit_date')
-                            scraped_at_str = message.get('scraped_at')
-                            
-                            try:
-                                message_date = datetime.fromisoformat(message_date_str.replace('Z', '+00:00')) if message_date_str else None
-                            except:
-                                message_date = None
-                                
-                            try:
-                                edit_date = datetime.fromisoformat(edit_date_str.replace('Z', '+00:00')) if edit_date_str else None
-                            except:
-                                edit_date = None
-                                
-                            try:
-                                scraped_at = datetime.fromisoformat(scraped_at_str.replace('Z', '+00:00')) if scraped_at_str else None
-                            except:
-                                scraped_at = None
-                            
-                            cursor.execute(insert_sql, (
-                                message.get('message_id'),
-                                message.get('channel_id'),
-                                message.get('channel_username'),
-                                message.get('channel_name'),
-                                message_date,
-                                message.get('message_text', ''),
-                                message.get('has_media', False),
-                                message.get('media_type', ''),
-                                message.get('image_path', ''),
-                                message.get('views', 0),
-                                message.get('forwards', 0),
-                                message.get('replies', 0),
-                                message.get('edited', False),
-                                edit_date,
-                                message.get('pinned', False),
-                                scraped_at,
-                                message.get('scraping_session_id'),
-                                json.dumps(message)
-                            ))
-                            total_messages += 1
+                            rows[(message.get('channel_id'), message.get('message_id'))] = (
+                                message, (
+                                    message.get('message_id'),
+                                    message.get('channel_id'),
+                                    message.get('channel_username'),
+                                    message.get('channel_name'),
+                                    message_date,
+                                    message.get('message_text', ''),
+                                    message.get('has_media', False),
+                                    message.get('media_type', ''),
+                                    message.get('image_path', ''),
+                                    message.get('views', 0),
+                                    message.get('forwards', 0),
+                                    message.get('replies', 0),
+                                    message.get('edited', False),
+                                    edit_date,
+                                    message.get('pinned', False),
+                                    scraped_at,
+                                    message.get('scraping_session_id')
+                                )
+                            )
+                        
+                        execute_values(cursor, insert_sql, [values for _, values in rows.values()], page_size=BATCH_SIZE)
+                        execute_values(cursor, payload_sql, [
+                            (channel_id, message_id, psycopg2.Binary(encode_payload(message)))
+                            for (channel_id, message_id), (message, _) in rows.items()
+                        ], page_size=BATCH_SIZE)
+                        total_messages += len(rows)
                             
                 except Exception as e:
                     print(f"❌ Error: {e}")
@@ -158,6 +186,8 @@ def recreate_and_load():
     
     cursor.close()
     conn.close()
+    
+    return count
 
 if __name__ == "__main__":
     recreate_and_load()
\ No newline at end of file
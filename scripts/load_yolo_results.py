@@ -1,13 +1,37 @@
 import psycopg2
 import pandas as pd
+import pyarrow.parquet as pq
+import io
 import os
+import sys
+import time
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.warehouse_version import bump_warehouse_version
+
+
+def copy_frame(cursor, table, frame):
+    """Bulk-load a DataFrame into a table with COPY; missing values become NULL."""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
 
 def load_yolo_results():
     """
     Load YOLO detection results into PostgreSQL database.
+    
+    The CSV is copied into a staging table and merged on each detection's
+    identity, (channel_id, message_id, image_path): only new images and images
+    whose detection changed are written, and only their boxes are reloaded.
+    Everything happens in a single transaction, so readers never see a
+    partial load.
     """
     
     csv_file = "data/yolo_detections.csv"
+    boxes_file = "data/yolo_boxes.parquet"
     
     if not os.path.exists(csv_file):
         print(f"❌ CSV file not found: {csv_file}")
@@ -39,34 +63,135 @@ def load_yolo_results():
         num_detections INTEGER,
         image_category VARCHAR(50),
         confidence_score FLOAT,
+        detected_at TIMESTAMP,
         loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     """
     cursor.execute(create_table_sql)
     
-    # Clear existing data
-    cursor.execute("TRUNCATE TABLE raw.yolo_detections;")
+    # Tables created before incremental loads lack detected_at and channel_id.
+    # Rows are identified by (channel_id, message_id, image_path); image_path
+    # comes first so the merge can look rows up by it
+    cursor.execute("ALTER TABLE raw.yolo_detections ADD COLUMN IF NOT EXISTS detected_at TIMESTAMP;")
+    cursor.execute("ALTER TABLE raw.yolo_detections ADD COLUMN IF NOT EXISTS channel_id BIGINT;")
+    cursor.execute("DROP INDEX IF EXISTS raw.yolo_detections_image_path_key;")
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS yolo_detections_identity_key
+    ON raw.yolo_detections (image_path, message_id, channel_id);
+    """)
+    
+    # Every row of the CSV goes to staging: batch runs stamp detected_at when
+    # an image is detected but write the CSV at the end, while the streamer
+    # appends in between, so no timestamp separates loaded rows from new ones
+    for column in ('detected_at', 'channel_id'):
+        if column not in df.columns:
+            df[column] = None
+    df['detected_at'] = pd.to_datetime(df['detected_at'])
+    df['channel_id'] = pd.to_numeric(df['channel_id']).astype('Int64')
+    df['message_id'] = pd.to_numeric(df['message_id'], errors='coerce').astype('Int64')
+    key = ['channel_id', 'message_id', 'image_path']
+    df = df.sort_values('detected_at', na_position='first').drop_duplicates(key, keep='last')
+    
+    # Everything below is one transaction: readers see the previous rows
+    # until the merge commits, never an empty or half-loaded table
+    load_start = time.perf_counter()
     
-    # Insert data
-    insert_sql = """
-    INSERT INTO raw.yolo_detections 
-    (message_id, channel_name, image_path, detected_objects, 
-     num_detections, image_category, confidence_score)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    # Bulk COPY the detections into a staging table, then merge them
+    columns = ['channel_id', 'message_id', 'channel_name', 'image_path', 'detected_objects',
+               'num_detections', 'image_category', 'confidence_score', 'detected_at']
+    cursor.execute(f"""
+    CREATE TEMP TABLE yolo_detections_staging ON COMMIT DROP AS
+    SELECT {', '.join(columns)} FROM raw.yolo_detections WITH NO DATA;
+    """)
+    copy_frame(cursor, 'yolo_detections_staging', df[columns])
+    
+    # A row matches on its identity. Batch runs don't know channel_id, so a
+    # row without one is the same image as a streamed row with one
+    same_detection = """
+        d.image_path = s.image_path
+        AND d.message_id IS NOT DISTINCT FROM s.message_id
+        AND (d.channel_id = s.channel_id OR d.channel_id IS NULL OR s.channel_id IS NULL)
     """
     
-    for _, row in df.iterrows():
-        cursor.execute(insert_sql, (
-            row['message_id'],
-            row['channel_name'],
-            row['image_path'],
-            row['detected_objects'],
-            row['num_detections'],
-            row['image_category'],
-            row['confidence_score']
-        ))
+    # Changed detections are updated; unchanged rows are left alone so
+    # loaded_at keeps its value
+    cursor.execute(f"""
+    UPDATE raw.yolo_detections d SET
+        channel_id = COALESCE(s.channel_id, d.channel_id),
+        channel_name = s.channel_name,
+        detected_objects = s.detected_objects,
+        num_detections = s.num_detections,
+        image_category = s.image_category,
+        confidence_score = s.confidence_score,
+        detected_at = s.detected_at,
+        loaded_at = CURRENT_TIMESTAMP
+    FROM yolo_detections_staging s
+    WHERE {same_detection}
+      AND (d.channel_id, d.detected_objects, d.image_category, d.confidence_score, d.detected_at)
+          IS DISTINCT FROM (COALESCE(s.channel_id, d.channel_id), s.detected_objects, s.image_category,
+                            s.confidence_score, s.detected_at)
+    RETURNING d.image_path;
+    """)
+    changed = {image_path for image_path, in cursor.fetchall()}
+    
+    # Detections of images not loaded yet are inserted
+    cursor.execute(f"""
+    INSERT INTO raw.yolo_detections ({', '.join(columns)})
+    SELECT {', '.join(columns)}
+    FROM yolo_detections_staging s
+    WHERE NOT EXISTS (SELECT 1 FROM raw.yolo_detections d WHERE {same_detection})
+    RETURNING image_path;
+    """)
+    inserted = {image_path for image_path, in cursor.fetchall()}
+    changed |= inserted
+    merged = len(changed)
+    print(f"🆕 {len(inserted)} new and {merged - len(inserted)} changed detections of {len(df)} in the CSV")
+    
+    # Per-box detections; boxes of re-detected images are replaced
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS raw.yolo_boxes (
+        image_path VARCHAR(500),
+        message_id BIGINT,
+        channel_name VARCHAR(255),
+        class_id SMALLINT,
+        class_name VARCHAR(100),
+        confidence REAL,
+        x1 REAL,
+        y1 REAL,
+        x2 REAL,
+        y2 REAL,
+        detected_at TIMESTAMP,
+        loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    cursor.execute("ALTER TABLE raw.yolo_boxes ADD COLUMN IF NOT EXISTS image_width INTEGER;")
+    cursor.execute("ALTER TABLE raw.yolo_boxes ADD COLUMN IF NOT EXISTS image_height INTEGER;")
+    cursor.execute("CREATE INDEX IF NOT EXISTS yolo_boxes_image_path_idx ON raw.yolo_boxes (image_path);")
+    
+    if changed and os.path.exists(boxes_file):
+        box_columns = ['image_path', 'message_id', 'channel_name', 'class_id', 'class_name',
+                       'confidence', 'x1', 'y1', 'x2', 'y2', 'detected_at', 'image_width', 'image_height']
+        available = set(pq.read_schema(boxes_file).names)
+        box_columns = [column for column in box_columns if column in available]
+        boxes = pd.read_parquet(boxes_file, columns=box_columns, filters=[('image_path', 'in', sorted(changed))])
+        
+        cursor.execute(f"""
+        CREATE TEMP TABLE yolo_boxes_staging ON COMMIT DROP AS
+        SELECT {', '.join(box_columns)} FROM raw.yolo_boxes WITH NO DATA;
+        """)
+        copy_frame(cursor, 'yolo_boxes_staging', boxes)
+        
+        cursor.execute("DELETE FROM raw.yolo_boxes WHERE image_path = ANY(%s);", (sorted(changed),))
+        cursor.execute(f"""
+        INSERT INTO raw.yolo_boxes ({', '.join(box_columns)})
+        SELECT {', '.join(box_columns)} FROM yolo_boxes_staging;
+        """)
+        print(f"📦 Loaded {len(boxes)} boxes into raw.yolo_boxes")
     
+    # Cached API reports are recomputed once the merge is visible
+    bump_warehouse_version(cursor, 'load_yolo_results')
     conn.commit()
+    print(f"⚡ Merged {merged} detections in {time.perf_counter() - load_start:.2f}s")
     
     # Verify
     cursor.execute("SELECT COUNT(*) FROM raw.yolo_detections;")
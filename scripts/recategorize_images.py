@@ -0,0 +1,142 @@
+"""
+Re-categorize detected images from the stored boxes, without re-running YOLO.
+
+Evaluates a category rules file (see src/categorize.py) over
+data/yolo_boxes.parquet and writes the result as a versioned column, e.g.
+image_category_v2, to data/yolo_categories.parquet. Columns of other rule
+versions are kept, so versions can be compared side by side. With --load
+the column is also written to raw.yolo_detections in PostgreSQL.
+
+    python scripts/recategorize_images.py --rules my_rules.json
+    python scripts/recategorize_images.py --load
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.categorize import RULES_FILE, categorize_frame, category_column, load_rules
+from src.warehouse_version import bump_warehouse_version
+
+BOX_READ_COLUMNS = ['image_path', 'class_name', 'confidence', 'x1', 'y1', 'x2', 'y2',
+                    'image_width', 'image_height']
+
+
+def read_boxes(boxes_file):
+    """Read the box columns the rules need; stores without image dimensions get none."""
+    if not os.path.exists(boxes_file):
+        return pd.DataFrame(columns=BOX_READ_COLUMNS)
+
+    import pyarrow.parquet as pq
+    available = set(pq.read_schema(boxes_file).names)
+    return pd.read_parquet(boxes_file, columns=[c for c in BOX_READ_COLUMNS if c in available])
+
+
+def save_categories(output_file, categories):
+    """Merge a versioned category column into the categories file, replacing it atomically."""
+    frame = categories.to_frame()
+    if os.path.exists(output_file):
+        previous = pd.read_parquet(output_file).set_index('image_path')
+        previous = previous.drop(columns=[categories.name], errors='ignore')
+        frame = previous.join(frame, how='outer')
+
+    tmp_file = output_file + '.tmp'
+    frame.rename_axis('image_path').reset_index().to_parquet(tmp_file, index=False, compression='zstd')
+    os.replace(tmp_file, output_file)
+
+
+def load_to_postgres(categories):
+    """Write the versioned column to raw.yolo_detections through a COPY into a temp table."""
+    column = sql.Identifier(categories.name)
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'telegram_warehouse'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres')
+    )
+    cursor = conn.cursor()
+
+    cursor.execute(sql.SQL("ALTER TABLE raw.yolo_detections ADD COLUMN IF NOT EXISTS {} VARCHAR(50);").format(column))
+    cursor.execute("CREATE TEMP TABLE image_categories (image_path VARCHAR(500), category VARCHAR(50)) ON COMMIT DROP;")
+
+    buffer = io.StringIO()
+    categories.rename_axis('image_path').reset_index().to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert("COPY image_categories FROM STDIN WITH (FORMAT csv)", buffer)
+
+    cursor.execute(sql.SQL("""
+        UPDATE raw.yolo_detections d
+        SET {column} = c.category
+        FROM image_categories c
+        WHERE d.image_path = c.image_path
+          AND d.{column} IS DISTINCT FROM c.category;
+    """).format(column=column))
+    updated = cursor.rowcount
+    bump_warehouse_version(cursor, 'recategorize_images')
+    conn.commit()
+
+    cursor.close()
+    conn.close()
+    return updated
+
+
+def main():
+    """Evaluate the rules over the stored boxes and save the versioned categories."""
+    parser = argparse.ArgumentParser(description='Re-categorize images from stored YOLO boxes')
+    parser.add_argument('--rules', default=RULES_FILE, help='Category rules file')
+    parser.add_argument('--detections', default='data/yolo_detections.csv', help='Detections CSV (lists the images)')
+    parser.add_argument('--boxes', default='data/yolo_boxes.parquet', help='Box store')
+    parser.add_argument('--output', default='data/yolo_categories.parquet', help='Versioned categories file')
+    parser.add_argument('--load', action='store_true', help='Also write the column to raw.yolo_detections')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.detections):
+        print(f"❌ Detections not found: {args.detections}")
+        print("Run yolo_detect.py first to generate detections.")
+        sys.exit(1)
+
+    rules = load_rules(args.rules)
+    column = category_column(rules)
+
+    start = time.perf_counter()
+    detections = pd.read_csv(args.detections, usecols=lambda c: c in ('image_path', 'image_category'))
+    boxes = read_boxes(args.boxes)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    categories = categorize_frame(boxes, detections['image_path'], rules)
+    categorize_seconds = time.perf_counter() - start
+
+    print(f"🏷️  Categorized {len(categories)} images from {len(boxes)} boxes with rules v{rules['version']} "
+          f"in {categorize_seconds:.2f}s (read {read_seconds:.2f}s)")
+
+    save_categories(args.output, categories)
+    print(f"✅ Saved {column} to {args.output}")
+
+    # Compare with the categories assigned when the images were detected
+    if 'image_category' in detections.columns:
+        current = detections.drop_duplicates('image_path', keep='last').set_index('image_path')['image_category']
+        changed = (current.reindex(categories.index).astype(str) != categories.astype(str)).sum()
+        print(f"🔄 {changed} images ({changed / max(len(categories), 1):.1%}) differ from their detection-time category")
+
+    print("\n📊 Category Summary:")
+    for category, count in categories.value_counts().items():
+        print(f"  {category}: {count} images")
+
+    if args.load:
+        updated = load_to_postgres(categories)
+        print(f"\n📤 Updated {column} on {updated} rows of raw.yolo_detections")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,18 @@
 Verify the collected Telegram data.
 """
 
-import json
+import os
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
 import sys
 
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.image_index import scan_images
+from src.json_stream import iter_json_items, iter_records
+
 def verify_data_structure():
     """Verify the data lake structure and contents."""
     print("Verifying Data Collection")
@@ -33,12 +39,12 @@ def verify_data_structure():
     print("\n2. Images Collected:")
     images_dir = base_path / 'images'
     if images_dir.exists():
-        channel_dirs = list(images_dir.iterdir())
-        print(f"   Found {len(channel_dirs)} channels with images:")
-        for channel_dir in channel_dirs:
-            if channel_dir.is_dir():
-                images = list(channel_dir.glob('*.jpg'))
-                print(f"   - {channel_dir.name}: {len(images)} images")
+        # Same index the detector reads, so the tree is only walked where it
+        # changed; a read-only check, so the index is not written back
+        channel_counts = scan_images(str(images_dir), save=False).groupby('channel_name').size()
+        print(f"   Found {len(channel_counts)} channels with images:")
+        for channel_name, count in channel_counts.items():
+            print(f"   - {channel_name}: {count} images")
     
     # Check JSON files
     print("\n3. Message JSON Files:")
@@ -54,10 +60,10 @@ def verify_data_structure():
                 total_files += len(json_files)
                 print(f"\n   Date: {date_dir.name}")
                 for json_file in json_files:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        messages = json.load(f)
-                    total_messages += len(messages)
-                    print(f"   - {json_file.name}: {len(messages)} messages")
+                    # Count without materializing the file
+                    message_count = sum(1 for _ in iter_records(json_file))
+                    total_messages += message_count
+                    print(f"   - {json_file.name}: {message_count} messages")
         
         print(f"\n   Total: {total_files} JSON files, {total_messages} messages")
     
@@ -68,8 +74,7 @@ def verify_data_structure():
         channel_files = list(channels_dir.glob('*_info.json'))
         print(f"   Found {len(channel_files)} channel info files:")
         for channel_file in channel_files:
-            with open(channel_file, 'r', encoding='utf-8') as f:
-                channel_info = json.load(f)
+            channel_info = next(iter_json_items(channel_file))
             print(f"   - {channel_info['channel_name']} (@{channel_info['channel_username']})")
     
     # Load and analyze sample data
@@ -86,8 +91,7 @@ def verify_data_structure():
     
     if sample_file:
         print(f"   Analyzing: {sample_file.name}")
-        with open(sample_file, 'r', encoding='utf-8') as f:
-            messages = json.load(f)
+        messages = list(iter_records(sample_file))
         
         if messages:
             # Convert to DataFrame for analysis
@@ -130,9 +134,8 @@ def analyze_content():
     for date_dir in messages_dir.iterdir():
         if date_dir.is_dir():
             for json_file in date_dir.glob('*.json'):
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    messages = json.load(f)
-                    all_messages.extend(messages)
+                # Raw payloads are not needed for the analysis
+                all_messages.extend(iter_records(json_file))
     
     if not all_messages:
         print("No messages found for analysis")
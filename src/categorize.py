@@ -0,0 +1,155 @@
+"""
+Declarative image categories over detected boxes.
+
+Categories come from a rules file (src/category_rules.json, or the path in
+YOLO_CATEGORY_RULES) rather than code, and can be re-evaluated over the
+stored box table at any time, so a rule or threshold change needs no new
+inference pass:
+
+    {
+      "version": 1,
+      "default": "other",
+      "min_confidence": 0.5,
+      "rules": [
+        {"category": "promotional",
+         "all": [{"classes": ["person"]}, {"classes": ["bottle", "box"]}]},
+        {"category": "lifestyle", "all": [{"classes": ["person"]}],
+         "none": [{"classes": ["bottle"], "min_area": 0.2}]}
+      ]
+    }
+
+Rules are tried in order and the first that matches sets the category. A
+rule matches when all of its "all" conditions hold and none of its "none"
+conditions do. A condition holds when the image has at least min_count
+boxes (default 1) of one of its classes (any class when omitted) with
+confidence >= min_confidence (default: the file's) covering at least
+min_area of the image (fraction, default 0).
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RULES_FILE = os.getenv('YOLO_CATEGORY_RULES') or str(Path(__file__).with_name('category_rules.json'))
+
+CONDITION_KEYS = {'classes', 'min_confidence', 'min_area', 'min_count'}
+
+# The version names a database column (see category_column)
+VERSION_PATTERN = re.compile(r'[0-9A-Za-z_]+')
+
+
+def load_rules(path=None):
+    """Read and validate a rules file."""
+    path = path or RULES_FILE
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+
+    for key in ('version', 'default', 'rules'):
+        if key not in rules:
+            raise ValueError(f"Category rules {path} lack '{key}'")
+    version = rules['version']
+    if isinstance(version, bool) or not isinstance(version, (int, str)) or not VERSION_PATTERN.fullmatch(str(version)):
+        raise ValueError(f"Category rules {path} have version {version!r}; "
+                         f"use letters, digits and underscores, e.g. 2 or 2_1")
+    for rule in rules['rules']:
+        if 'category' not in rule or not (rule.get('all') or rule.get('none')):
+            raise ValueError(f"Category rule needs a category and 'all' or 'none' conditions: {rule}")
+        for condition in rule.get('all', []) + rule.get('none', []):
+            unknown = set(condition) - CONDITION_KEYS
+            if unknown:
+                raise ValueError(f"Unknown keys {sorted(unknown)} in category condition {condition}")
+    return rules
+
+
+def category_column(rules):
+    """Name of the versioned column a rules file writes, e.g. image_category_v1."""
+    return f"image_category_v{rules['version']}"
+
+
+def _condition_holds(condition, boxes, width, height, min_confidence):
+    """Check one condition against one image's (class_id, class_name, confidence, x1, y1, x2, y2) boxes."""
+    classes = set(condition['classes']) if 'classes' in condition else None
+    confidence = condition.get('min_confidence', min_confidence)
+    min_area = condition.get('min_area', 0)
+    image_area = (width or 0) * (height or 0)
+
+    count = 0
+    for _, class_name, box_confidence, x1, y1, x2, y2 in boxes:
+        if classes is not None and class_name not in classes:
+            continue
+        if box_confidence < confidence:
+            continue
+        if min_area and (not image_area or (x2 - x1) * (y2 - y1) / image_area < min_area):
+            continue
+        count += 1
+    return count >= condition.get('min_count', 1)
+
+
+def categorize_boxes(boxes, width=None, height=None, rules=None):
+    """Category of one image from its detected boxes; used as images are detected."""
+    rules = rules or load_rules()
+    min_confidence = rules.get('min_confidence', 0.0)
+
+    for rule in rules['rules']:
+        if all(_condition_holds(c, boxes, width, height, min_confidence) for c in rule.get('all', [])) and \
+                not any(_condition_holds(c, boxes, width, height, min_confidence) for c in rule.get('none', [])):
+            return rule['category']
+    return rules['default']
+
+
+def _condition_mask(condition, boxes, image_codes, image_count, area_fraction, min_confidence):
+    """Per-image boolean array: does the condition hold, over the whole box table at once."""
+    selected = boxes['confidence'].to_numpy() >= condition.get('min_confidence', min_confidence)
+    if 'classes' in condition:
+        selected &= boxes['class_name'].isin(condition['classes']).to_numpy()
+    if condition.get('min_area'):
+        selected &= area_fraction >= condition['min_area']
+
+    counts = np.bincount(image_codes[selected], minlength=image_count)
+    return counts >= condition.get('min_count', 1)
+
+
+def categorize_frame(boxes, image_paths, rules=None):
+    """
+    Categories of many images at once, as a Series indexed by image path.
+
+    boxes holds the box store columns (image_path, class_name, confidence,
+    x1..y2 and, for area rules, image_width and image_height). Images with
+    no boxes get the default category. Each condition is one pass of numpy
+    over the box table, so a million images take seconds.
+    """
+    rules = rules or load_rules()
+    min_confidence = rules.get('min_confidence', 0.0)
+    image_paths = pd.Index(image_paths).unique()
+
+    image_codes = image_paths.get_indexer(boxes['image_path'])
+    known = image_codes >= 0
+    boxes, image_codes = boxes[known], image_codes[known]
+
+    area_fraction = np.zeros(len(boxes))
+    if {'image_width', 'image_height'} <= set(boxes.columns):
+        image_area = (boxes['image_width'].astype('float64') * boxes['image_height'].astype('float64')).to_numpy()
+        box_area = ((boxes['x2'] - boxes['x1']) * (boxes['y2'] - boxes['y1'])).to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            area_fraction = np.nan_to_num(box_area / image_area, nan=0.0, posinf=0.0)
+
+    def holds(condition):
+        return _condition_mask(condition, boxes, image_codes, len(image_paths), area_fraction, min_confidence)
+
+    matches = []
+    for rule in rules['rules']:
+        matched = np.ones(len(image_paths), dtype=bool)
+        for condition in rule.get('all', []):
+            matched &= holds(condition)
+        for condition in rule.get('none', []):
+            matched &= ~holds(condition)
+        matches.append(matched)
+
+    # First matching rule wins
+    categories = np.select(matches, [rule['category'] for rule in rules['rules']], default=rules['default']) \
+        if matches else np.full(len(image_paths), rules['default'])
+    return pd.Series(pd.Categorical(categories), index=image_paths, name=category_column(rules))
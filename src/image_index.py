@@ -0,0 +1,198 @@
+"""
+Persisted index of the downloaded images.
+
+One os.scandir walk lists every image under an image directory with its
+channel, message id, size and mtime, and the result is saved inside the tree
+(.image_index/). Later scans only re-list directories whose mtime changed
+since the last one, so discovery over hundreds of thousands of files costs a
+stat per file instead of a listing of every directory.
+
+Files rewritten in place (an image downloaded again) do not change their
+directory's mtime, so the indexed files of unchanged directories are still
+stat'ed for their current size and mtime. refresh=True (or --refresh)
+ignores the saved index altogether.
+
+    python src/image_index.py             # update the index and print a summary
+    python src/image_index.py --refresh   # rebuild it from scratch
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+IMAGE_DIR = 'data/raw/images'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Index files, stored in the image directory; the walk skips dot entries
+INDEX_DIRNAME = '.image_index'
+
+# A directory modified this recently may still change within the same mtime
+# tick, so it is listed again next time
+MTIME_SLACK_NS = 2_000_000_000
+
+IMAGE_COLUMNS = ['image_path', 'directory', 'channel_name', 'message_id', 'size', 'mtime_ns']
+
+
+def message_id_from_filename(filename):
+    """Message id of a downloaded image (messageid_timestamp.jpg), or None."""
+    prefix = filename.split('_', 1)[0]
+    return int(prefix) if prefix.isdigit() else None
+
+
+def _index_paths(image_dir):
+    index_dir = os.path.join(image_dir, INDEX_DIRNAME)
+    return index_dir, os.path.join(index_dir, 'images.parquet'), os.path.join(index_dir, 'directories.parquet')
+
+
+def _load_index(image_dir):
+    """Read the saved index: (images DataFrame, {directory: (mtime_ns, subdirectories)})."""
+    _, images_file, directories_file = _index_paths(image_dir)
+    if not (os.path.exists(images_file) and os.path.exists(directories_file)):
+        return pd.DataFrame(columns=IMAGE_COLUMNS), {}
+
+    images = pd.read_parquet(images_file)
+    directories = pd.read_parquet(directories_file)
+    return images, {
+        directory: (mtime_ns, list(subdirectories))
+        for directory, mtime_ns, subdirectories in directories.itertuples(index=False, name=None)
+    }
+
+
+def _save_index(image_dir, images, directories):
+    """Write the index files atomically."""
+    index_dir, images_file, directories_file = _index_paths(image_dir)
+    os.makedirs(index_dir, exist_ok=True)
+
+    frames = {
+        images_file: images,
+        directories_file: pd.DataFrame(
+            [(directory, mtime_ns, subdirectories) for directory, (mtime_ns, subdirectories) in directories.items()],
+            columns=['directory', 'mtime_ns', 'subdirectories']
+        ),
+    }
+    for path, frame in frames.items():
+        frame.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+
+def _list_directory(directory):
+    """List one directory: (image rows, subdirectories)."""
+    rows, subdirectories = [], []
+    channel_name = os.path.basename(directory)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = entry.stat()
+                rows.append((entry.path, directory, channel_name, message_id_from_filename(entry.name),
+                             stat.st_size, stat.st_mtime_ns))
+    return rows, subdirectories
+
+
+def _restat(frame):
+    """Saved entries of an unchanged directory with their files' current size and mtime."""
+    sizes, mtimes, present = [], [], []
+    for img_path in frame['image_path']:
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            present.append(False)
+            continue
+        present.append(True)
+        sizes.append(stat.st_size)
+        mtimes.append(stat.st_mtime_ns)
+
+    frame = frame[present].copy()
+    changed = int(((frame['size'] != sizes) | (frame['mtime_ns'] != mtimes)).sum())
+    frame['size'], frame['mtime_ns'] = sizes, mtimes
+    return frame, changed
+
+
+def scan_images(image_dir=IMAGE_DIR, refresh=False, save=True, stats=None):
+    """
+    Return the images under image_dir as a DataFrame of IMAGE_COLUMNS, sorted by path.
+
+    Directories whose mtime matches the saved index reuse their saved
+    entries, re-stat'ed for files rewritten in place; the others are listed
+    again. With save=False the index is only read, never written. stats, if
+    given, collects the number of directories listed and reused and of
+    reused files that changed.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(listed=0, reused=0, changed=0)
+    if not os.path.isdir(image_dir):
+        return pd.DataFrame(columns=IMAGE_COLUMNS)
+
+    saved_images, saved_directories = (pd.DataFrame(columns=IMAGE_COLUMNS), {}) if refresh else _load_index(image_dir)
+    saved_by_directory = dict(tuple(saved_images.groupby('directory', sort=False))) if len(saved_images) else {}
+
+    now_ns = time.time_ns()
+    frames, new_rows, directories = [], [], {}
+    pending = [image_dir]
+    while pending:
+        directory = pending.pop()
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            continue
+
+        saved = saved_directories.get(directory)
+        if saved is not None and saved[0] == mtime_ns:
+            subdirectories = saved[1]
+            if directory in saved_by_directory:
+                frame, changed = _restat(saved_by_directory[directory])
+                frames.append(frame)
+                stats['changed'] += changed
+            stats['reused'] += 1
+        else:
+            rows, subdirectories = _list_directory(directory)
+            new_rows.extend(rows)
+            stats['listed'] += 1
+
+        # Recently modified directories are not trusted on the next scan
+        directories[directory] = (mtime_ns if now_ns - mtime_ns > MTIME_SLACK_NS else -1, subdirectories)
+        pending.extend(subdirectories)
+
+    frames.append(pd.DataFrame(new_rows, columns=IMAGE_COLUMNS))
+    images = pd.concat([frame for frame in frames if len(frame)] or frames, ignore_index=True)
+    images['message_id'] = images['message_id'].astype('Int64')
+    images['size'] = images['size'].astype('int64')
+    images['mtime_ns'] = images['mtime_ns'].astype('int64')
+    images = images.sort_values('image_path', ignore_index=True)
+
+    if save:
+        _save_index(image_dir, images, directories)
+    return images
+
+
+def list_images(image_dir=IMAGE_DIR, refresh=False):
+    """Paths of the images under image_dir, from the index."""
+    return scan_images(image_dir, refresh)['image_path'].tolist()
+
+
+def main():
+    """Update the image index and print a per-channel summary."""
+    parser = argparse.ArgumentParser(description='Index downloaded images')
+    parser.add_argument('--image-dir', default=IMAGE_DIR, help='Image directory')
+    parser.add_argument('--refresh', action='store_true', help='Ignore the saved index and re-list everything')
+    args = parser.parse_args()
+
+    stats = {}
+    start = time.perf_counter()
+    images = scan_images(args.image_dir, args.refresh, stats=stats)
+    elapsed = time.perf_counter() - start
+
+    print(f"🗂️  Indexed {len(images)} images in {elapsed:.2f}s "
+          f"({stats['listed']} directories listed, {stats['reused']} unchanged, "
+          f"{stats['changed']} files in them rewritten)")
+    for channel_name, count in images.groupby('channel_name').size().items():
+        print(f"  {channel_name}: {count} images")
+
+
+if __name__ == "__main__":
+    main()
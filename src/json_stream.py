@@ -0,0 +1,120 @@
+"""
+Incremental reading of the JSON files in the data lake.
+
+Partition files are JSON arrays written by the scraper. Instead of json.load,
+which materializes the whole file, the readers here decode one array item at
+a time from a bounded buffer, so memory stays flat regardless of file size.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Nested Telegram payload kept on every scraped message
+RAW_FIELD = 'message_raw'
+
+# zlib settings for stored payloads. Records are a few KB, so a 4 KB window
+# compresses as well as the default 32 KB one and is about twice as fast to set up
+PAYLOAD_COMPRESSION_LEVEL = 3
+PAYLOAD_WBITS = 12
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_items(filepath, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """
+    Yield the items of a top-level JSON array one at a time.
+
+    A file holding a single JSON object (like the channel info files) yields
+    that object once.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        in_array = None
+        read_size = chunk_size
+
+        while True:
+            # Skip whitespace and item separators
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or (in_array and buffer[pos] == ',')):
+                pos += 1
+
+            if pos >= len(buffer):
+                if eof:
+                    return
+                buffer = f.read(read_size)
+                pos = 0
+                eof = not buffer
+                continue
+
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                continue
+
+            if in_array and buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Item continues past the buffer: read more, growing the read
+                # size so very large items are not re-decoded too many times
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                read_size *= 2
+                continue
+
+            yield item
+            pos = end
+            read_size = chunk_size
+
+            if not in_array:
+                return
+
+            # Drop consumed text so the buffer stays bounded
+            if pos >= chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_records(filepath, include_raw: bool = False) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a lake file, dropping the raw payload unless requested."""
+    for record in iter_json_items(filepath):
+        if not include_raw and isinstance(record, dict):
+            record.pop(RAW_FIELD, None)
+        yield record
+
+
+def iter_batches(records: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Group an iterable of records into lists of at most batch_size items."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def encode_payload(record: Any) -> bytes:
+    """Serialize a record to compact, zlib-compressed JSON for the payload side tables."""
+    data = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(data, PAYLOAD_COMPRESSION_LEVEL, wbits=PAYLOAD_WBITS)
+
+
+def decode_payload(payload: Optional[bytes]) -> Any:
+    """Inverse of encode_payload; None stays None."""
+    if payload is None:
+        return None
+    return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
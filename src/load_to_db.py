@@ -3,32 +3,214 @@ Load scraped Telegram data into database (SQLite for development, PostgreSQL for
 """
 
 import json
+import multiprocessing
 import os
+import queue
+import re
 import sys
+import time
+from collections import defaultdict
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
 import pandas as pd
-from sqlalchemy import create_engine, Table, Column, Integer, String, DateTime, Boolean, Text, Float, MetaData
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    create_engine, Table, Column, Identity, Integer, String, DateTime, Boolean, Text, Float, LargeBinary,
+    MetaData, text
+)
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 import structlog
 
+try:
+    import duckdb
+except ImportError:  # DuckDB is only needed for backend='duckdb'
+    duckdb = None
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import decode_payload, encode_payload, iter_batches, iter_json_items, iter_records
+from src.timestamps import parse_datetime, parse_datetime_column
+from src.warehouse_version import bump_warehouse_version
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 logger = structlog.get_logger()
 
+# Column order of the raw messages table, shared by the parse workers and the writer
+MESSAGE_COLUMNS = [
+    'message_id', 'channel_id', 'channel_username', 'channel_name', 'message_date',
+    'message_text', 'has_media', 'media_type', 'image_path', 'views',
+    'forwards', 'replies', 'edited', 'edit_date', 'pinned', 'via_bot', 'scraped_at',
+    'scraping_session_id'
+]
+
+# Column order of the payload side table. The full scraped record is kept there,
+# compressed, so the hot messages table only holds typed columns
+PAYLOAD_COLUMNS = ['channel_id', 'message_id', 'payload']
+
+
+def message_columns(messages: List[Dict[str, Any]], include_raw: bool = True) -> Dict[str, list]:
+    """
+    Normalize a list of scraped messages into a columnar batch.
+    
+    With include_raw the batch also carries a 'payload' column holding each
+    full record compressed with encode_payload.
+    """
+    batch = {
+        'message_id': [m.get('message_id') for m in messages],
+        'channel_id': [m.get('channel_id') for m in messages],
+        'channel_username': [m.get('channel_username') for m in messages],
+        'channel_name': [m.get('channel_name') for m in messages],
+        'message_date': parse_datetime_column([m.get('message_date') for m in messages]),
+        'message_text': [m.get('message_text') for m in messages],
+        'has_media': [m.get('has_media', False) for m in messages],
+        'media_type': [m.get('media_type') for m in messages],
+        'image_path': [m.get('image_path') for m in messages],
+        'views': [m.get('views', 0) for m in messages],
+        'forwards': [m.get('forwards', 0) for m in messages],
+        'replies': [m.get('replies', 0) for m in messages],
+        'edited': [m.get('edited', False) for m in messages],
+        'edit_date': parse_datetime_column([m.get('edit_date') for m in messages]),
+        'pinned': [m.get('pinned', False) for m in messages],
+        'via_bot': [m.get('via_bot') for m in messages],
+        'scraped_at': parse_datetime_column([m.get('scraped_at') for m in messages]),
+        'scraping_session_id': [m.get('scraping_session_id') for m in messages],
+    }
+    if include_raw:
+        batch['payload'] = [encode_payload(m) for m in messages]
+    return batch
+
+
+def iter_message_batches(filepath, batch_size=5000, include_raw=True, timings=None):
+    """
+    Stream normalized columnar batches of at most batch_size messages from one file.
+    
+    When a timings dict is given, seconds spent decoding JSON ('parse') and
+    normalizing it ('transform') are added to it.
+    """
+    batches = iter_batches(iter_records(filepath, include_raw=include_raw), batch_size)
+    while True:
+        start = time.perf_counter()
+        messages = next(batches, None)
+        if messages is None:
+            break
+        parsed = time.perf_counter()
+        batch = message_columns(messages, include_raw=include_raw)
+        if timings is not None:
+            timings['parse'] += parsed - start
+            timings['transform'] += time.perf_counter() - parsed
+        yield batch
+
+
+# Indexes on the SQLite messages table, built once the load has finished
+SQLITE_MESSAGE_INDEXES = {
+    'idx_telegram_messages_channel_message': '(channel_id, message_id)',
+    'idx_telegram_messages_message_date': '(message_date)',
+}
+
+# Full-text index over message_text in SQLite: an FTS5 table reading its
+# text from telegram_messages, rebuilt after every load. The trigram
+# tokenizer matches inside words, in Amharic and English alike
+SQLITE_SEARCH_TABLE = 'telegram_messages_fts'
+
+# Partition of raw.telegram_messages for rows outside every monthly
+# partition, i.e. messages whose date did not parse
+MESSAGE_DEFAULT_PARTITION = 'telegram_messages_default'
+
+# Storage format SQLAlchemy uses for DateTime columns in SQLite
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+# Types DuckDB reads the lake with; keys not listed here are never materialized
+DUCKDB_MESSAGE_COLUMNS = {
+    'message_id': 'BIGINT',
+    'channel_id': 'BIGINT',
+    'channel_username': 'VARCHAR',
+    'channel_name': 'VARCHAR',
+    'message_date': 'TIMESTAMP',
+    'message_text': 'VARCHAR',
+    'has_media': 'BOOLEAN',
+    'media_type': 'VARCHAR',
+    'image_path': 'VARCHAR',
+    'views': 'INTEGER',
+    'forwards': 'INTEGER',
+    'replies': 'INTEGER',
+    'edited': 'BOOLEAN',
+    'edit_date': 'TIMESTAMP',
+    'pinned': 'BOOLEAN',
+    'via_bot': 'BIGINT',
+    'scraped_at': 'TIMESTAMPTZ',
+    'scraping_session_id': 'VARCHAR',
+}
+
+
+# Queue shared with the parse workers, set by the pool initializer
+_batch_queue = None
+
+
+def _init_parse_worker(batch_queue):
+    """Pool initializer: remember the queue batches are streamed to."""
+    global _batch_queue
+    _batch_queue = batch_queue
+
+
+def _parse_worker(filepath, batch_size, include_raw):
+    """Parse one file in a worker process and stream its batches to the writer."""
+    timings = defaultdict(float)
+    _batch_queue.put(('start', filepath, os.getpid()))
+    try:
+        for batch in iter_message_batches(filepath, batch_size, include_raw, timings):
+            _batch_queue.put(('batch', filepath, batch))
+        _batch_queue.put(('done', filepath, dict(timings)))
+    except Exception as e:
+        _batch_queue.put(('error', filepath, str(e)))
+
 
 class DataLoader:
-    def __init__(self, use_sqlite=True):
+    def __init__(self, use_sqlite=True, workers=None, batch_size=None, include_raw=True, bulk=True,
+                 backend=None, partition_by_month=True):
         """Initialize database loader."""
-        self.use_sqlite = use_sqlite
+        # Backend is one of 'sqlite', 'postgres' or 'duckdb'; use_sqlite picks between the first two
+        self.backend = backend or ('sqlite' if use_sqlite else 'postgres')
+        self.use_sqlite = self.backend == 'sqlite'
+        self.use_duckdb = self.backend == 'duckdb'
+        
+        # Number of processes parsing message files (1 disables the pool)
+        self.workers = workers or int(os.getenv('LOADER_WORKERS', os.cpu_count() or 1))
+        
+        # Messages per batch handed to the writer, and whether to keep full records
+        # in the payload side table
+        self.batch_size = batch_size or int(os.getenv('LOADER_BATCH_SIZE', 5000))
+        self.include_raw = include_raw
+        
+        # SQLite bulk mode: WAL, relaxed sync, executemany per batch, indexes after load
+        self.bulk = bulk and self.use_sqlite
+        self._bulk_conn = None
+        
+        # PostgreSQL: range-partition raw.telegram_messages by month of message_date
+        self.partitioned = partition_by_month and self.backend == 'postgres'
+        self._partitions = None
         
-        if self.use_sqlite:
+        # Seconds per load phase of the last load_messages run; parse and
+        # transform are summed over all workers
+        self.timings = defaultdict(float)
+        
+        if self.use_duckdb:
+            # DuckDB configuration: views over the lake files, nothing is copied
+            if duckdb is None:
+                raise ImportError("DuckDB backend requires the duckdb package: pip install duckdb")
+            self.db_path = Path('./data/telegram_warehouse.duckdb')
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            logger.info(f"Using DuckDB database: {self.db_path}")
+        elif self.use_sqlite:
             # SQLite configuration
             self.db_path = Path('./data/telegram_warehouse.db')
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -56,13 +238,24 @@ class DataLoader:
         self.channels_dir = self.raw_dir / 'channels'
         
         # Create database connection
-        self.engine = self.create_engine()
+        if self.use_duckdb:
+            self.engine = None
+            self.conn = self.connect_duckdb()
+        else:
+            self.engine = self.create_engine()
         self.metadata = MetaData()
         
     def create_engine(self):
         """Create SQLAlchemy engine."""
         try:
-            engine = create_engine(self.connection_string)
+            if self.use_sqlite:
+                engine = create_engine(self.connection_string)
+            else:
+                # Resolve unqualified table names against the raw schema first
+                engine = create_engine(
+                    self.connection_string,
+                    connect_args={'options': '-c search_path=raw,public'}
+                )
             # Test connection
             with engine.connect() as conn:
                 logger.info(f"Connected to database successfully")
@@ -71,6 +264,96 @@ class DataLoader:
             logger.error(f"Failed to connect to database: {str(e)}")
             raise
     
+    def connect_duckdb(self):
+        """Open the DuckDB database and resolve unqualified names against the raw schema."""
+        conn = duckdb.connect(str(self.db_path))
+        conn.execute("CREATE SCHEMA IF NOT EXISTS raw")
+        conn.execute("SET search_path = 'raw,main'")
+        logger.info("Connected to database successfully")
+        return conn
+    
+    def create_views(self):
+        """Expose the JSON/Parquet lake and the YOLO detections and boxes as DuckDB views."""
+        logger.info("Creating DuckDB views over the data lake...")
+        
+        messages_glob = (self.messages_dir / '*' / '*').resolve()
+        columns = DUCKDB_MESSAGE_COLUMNS
+        columns_sql = '{' + ', '.join(f"'{name}': '{sql_type}'" for name, sql_type in columns.items()) + '}'
+        
+        # Partitions may be the scraper's JSON files or Parquet conversions of them
+        sources = []
+        if any(self.messages_dir.glob('*/*.json')):
+            sources.append(
+                f"SELECT * FROM read_json('{messages_glob}.json', format = 'array', "
+                f"union_by_name = true, columns = {columns_sql})"
+            )
+        if any(self.messages_dir.glob('*/*.parquet')):
+            sources.append(
+                f"SELECT {', '.join(columns)} FROM read_parquet('{messages_glob}.parquet', union_by_name = true)"
+            )
+        
+        if sources:
+            self.conn.execute(f"CREATE OR REPLACE VIEW raw.telegram_messages AS {' UNION ALL BY NAME '.join(sources)}")
+            
+            # Full records stay in the lake; this view only decodes them when queried.
+            # Each record is read as one untyped JSON value, so DuckDB neither
+            # re-types nested strings nor adds the keys of other records as nulls
+            if self.include_raw and any(self.messages_dir.glob('*/*.json')):
+                self.conn.execute(
+                    f"CREATE OR REPLACE VIEW raw.telegram_message_payloads AS "
+                    f"SELECT CAST(payload ->> 'channel_id' AS BIGINT) AS channel_id, "
+                    f"CAST(payload ->> 'message_id' AS BIGINT) AS message_id, payload "
+                    f"FROM read_json('{messages_glob}.json', format = 'array', records = false, "
+                    f"columns = {{'payload': 'JSON'}})"
+                )
+        else:
+            logger.warning("No message files found")
+        
+        if any(self.channels_dir.glob('*_info.json')):
+            channels_glob = (self.channels_dir / '*_info.json').resolve()
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW raw.telegram_channels AS "
+                f"SELECT * FROM read_json_auto('{channels_glob}', union_by_name = true)"
+            )
+        else:
+            logger.warning("No channel files found")
+        
+        detections_file = self.base_dir / 'yolo_detections.csv'
+        if detections_file.exists():
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW raw.yolo_detections AS "
+                f"SELECT * FROM read_csv_auto('{detections_file.resolve()}')"
+            )
+        
+        boxes_file = self.base_dir / 'yolo_boxes.parquet'
+        if boxes_file.exists():
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW raw.yolo_boxes AS "
+                f"SELECT * FROM read_parquet('{boxes_file.resolve()}')"
+            )
+
+        categories_file = self.base_dir / 'yolo_categories.parquet'
+        if categories_file.exists():
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW raw.yolo_categories AS "
+                f"SELECT * FROM read_parquet('{categories_file.resolve()}')"
+            )
+
+        logger.info("DuckDB views created successfully")
+    
+    def count_rows(self, table_name: str) -> int:
+        """Count the rows of a DuckDB view, or 0 when it does not exist."""
+        try:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        except duckdb.CatalogException:
+            return 0
+    
+    def read_query(self, query: str) -> pd.DataFrame:
+        """Run a query on the active backend and return the result as a DataFrame."""
+        if self.use_duckdb:
+            return self.conn.execute(query).df()
+        return pd.read_sql_query(query, self.engine)
+    
     def create_tables(self):
         """Create raw schema tables."""
         logger.info("Creating database tables...")
@@ -79,14 +362,17 @@ class DataLoader:
         self.raw_messages = Table(
             'telegram_messages',
             self.metadata,
-            Column('id', Integer, primary_key=True, autoincrement=True),
+            # A partitioned table's primary key would have to include message_date,
+            # which is NULL for messages whose date did not parse; there id is an
+            # identity column without a key, and undated rows go to the DEFAULT partition
+            *([Column('id', Integer, Identity())] if self.partitioned
+              else [Column('id', Integer, primary_key=True, autoincrement=True)]),
             Column('message_id', Integer, nullable=False),
             Column('channel_id', Integer),
             Column('channel_username', String(255)),
             Column('channel_name', String(255)),
             Column('message_date', DateTime),
             Column('message_text', Text),
-            Column('message_raw', Text if self.use_sqlite else JSONB),  # JSONB for PostgreSQL, Text for SQLite
             Column('has_media', Boolean),
             Column('media_type', String(100)),
             Column('image_path', String(500)),
@@ -102,6 +388,20 @@ class DataLoader:
             Column('loaded_at', DateTime, default=datetime.now),
             
             # SQLite doesn't support schemas, so we'll use prefixes
+            schema=None if self.use_sqlite else 'raw',
+            **({'postgresql_partition_by': 'RANGE (message_date)'} if self.partitioned else {})
+        )
+        
+        # Define raw.telegram_message_payloads: the full scraped record of each
+        # message as zlib-compressed JSON, read only when a payload is asked for
+        self.message_payloads = Table(
+            'telegram_message_payloads',
+            self.metadata,
+            Column('channel_id', Integer, primary_key=True, autoincrement=False),
+            Column('message_id', Integer, primary_key=True, autoincrement=False),
+            Column('payload', LargeBinary),  # BYTEA for PostgreSQL, BLOB for SQLite
+            Column('loaded_at', DateTime, default=datetime.now),
+            
             schema=None if self.use_sqlite else 'raw'
         )
         
@@ -129,11 +429,38 @@ class DataLoader:
         # Create tables
         try:
             self.metadata.create_all(self.engine, checkfirst=True)
+            if self.use_sqlite:
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+                        "message_text, content='telegram_messages', content_rowid='id', tokenize='trigram')"
+                    )
+            else:
+                self.configure_payload_storage()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating tables: {str(e)}")
             raise
     
+    def configure_payload_storage(self):
+        """Keep payloads out of line without recompressing them in PostgreSQL."""
+        with self.engine.begin() as conn:
+            # Payloads are already zlib-compressed, so skip TOAST compression
+            conn.execute(text(
+                "ALTER TABLE raw.telegram_message_payloads ALTER COLUMN payload SET STORAGE EXTERNAL"
+            ))
+            legacy = conn.execute(text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'raw' AND table_name = 'telegram_messages' AND column_name = 'message_raw'
+            """)).scalar()
+        
+        if legacy:
+            logger.warning(
+                "raw.telegram_messages still has a message_raw column; new payloads go to "
+                "raw.telegram_message_payloads. Drop the column and VACUUM FULL the table "
+                "to get the narrow table's scan speed"
+            )
+    
     def load_channels(self):
         """Load channel information from JSON files."""
         logger.info("Loading channel data...")
@@ -147,8 +474,7 @@ class DataLoader:
         channels_data = []
         for filepath in channel_files:
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    channel_info = json.load(f)
+                channel_info = next(iter_json_items(filepath))
                 
                 # Prepare data for database
                 channel_data = {
@@ -194,95 +520,410 @@ class DataLoader:
         
         return 0
     
+    def message_partitions(self) -> Dict[str, str]:
+        """Return {partition name: bound expression} for raw.telegram_messages."""
+        query = text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'raw.telegram_messages'::regclass
+            ORDER BY c.relname
+        """)
+        with self.engine.connect() as conn:
+            return {name: bound for name, bound in conn.execute(query)}
+    
+    def is_partitioned(self) -> bool:
+        """Check whether raw.telegram_messages exists as a partitioned table."""
+        query = text("""
+            SELECT c.relkind FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'raw' AND c.relname = 'telegram_messages'
+        """)
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar() == 'p'
+    
+    def ensure_message_partitions(self, message_dates) -> None:
+        """Create the monthly partitions a batch of message dates needs, if missing."""
+        if self._partitions is None:
+            if not self.is_partitioned():
+                logger.warning(
+                    "raw.telegram_messages is not partitioned; drop it (or rename it and "
+                    "re-insert its rows) to switch to monthly partitions"
+                )
+                self.partitioned = False
+                return
+            self.allow_undated_messages()
+            self._partitions = set(self.message_partitions())
+            
+            # Rows no monthly partition takes, such as messages without a date
+            if MESSAGE_DEFAULT_PARTITION not in self._partitions:
+                with self.engine.begin() as conn:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS raw.{MESSAGE_DEFAULT_PARTITION} "
+                        f"PARTITION OF raw.telegram_messages DEFAULT"
+                    ))
+                self._partitions.add(MESSAGE_DEFAULT_PARTITION)
+        
+        months = {(d.year, d.month) for d in message_dates if d is not None and not pd.isna(d)}
+        for year, month in sorted(months):
+            partition = f"telegram_messages_{year:04d}_{month:02d}"
+            if partition in self._partitions:
+                continue
+            
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS raw.{partition} "
+                    f"PARTITION OF raw.telegram_messages "
+                    f"FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')"
+                ))
+            self._partitions.add(partition)
+            logger.info(f"Created partition raw.{partition}")
+    
+    def allow_undated_messages(self) -> None:
+        """Drop the (id, message_date) primary key earlier partitioned tables were created with."""
+        with self.engine.begin() as conn:
+            primary_key = conn.execute(text("""
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = 'raw.telegram_messages'::regclass AND contype = 'p'
+            """)).scalar()
+            if primary_key:
+                conn.execute(text(f"ALTER TABLE raw.telegram_messages DROP CONSTRAINT {primary_key}"))
+                conn.execute(text("ALTER TABLE raw.telegram_messages ALTER COLUMN message_date DROP NOT NULL"))
+                logger.info("Dropped the primary key of raw.telegram_messages so undated messages can load")
+    
+    def detach_old_partitions(self, keep_months: int = 12, drop: bool = False) -> List[str]:
+        """
+        Detach monthly partitions older than keep_months from raw.telegram_messages.
+        
+        Detached partitions are renamed to <partition>_archived_<timestamp> and
+        stay in the raw schema as plain tables, so they can be archived
+        (pg_dump) or, with drop=True, removed. Loading messages of a detached
+        month later creates a new, empty partition for it. Returns the names
+        of the detached partitions.
+        """
+        today = datetime.now()
+        cutoff_index = today.year * 12 + today.month - 1 - keep_months
+        cutoff = f"{cutoff_index // 12:04d}_{cutoff_index % 12 + 1:02d}"
+        
+        detached = []
+        for partition in self.message_partitions():
+            month = partition[len('telegram_messages_'):]
+            if not re.fullmatch(r'\d{4}_\d{2}', month) or month >= cutoff:
+                continue
+            archived = f"{partition}_archived_{today:%Y%m%d_%H%M%S}"
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE raw.telegram_messages DETACH PARTITION raw.{partition}"))
+                if drop:
+                    conn.execute(text(f"DROP TABLE raw.{partition}"))
+                else:
+                    # Frees the name, so a later load of this month gets a partition again
+                    conn.execute(text(f"ALTER TABLE raw.{partition} RENAME TO {archived}"))
+            detached.append(partition)
+            logger.info(f"Dropped partition raw.{partition}" if drop
+                        else f"Detached partition raw.{partition} as raw.{archived}")
+        
+        if self._partitions is not None:
+            self._partitions.difference_update(detached)
+        return detached
+    
+    def find_message_files(self) -> List[Path]:
+        """Find all message partition files in the data lake."""
+        json_files = []
+        for date_dir in sorted(self.messages_dir.iterdir()):
+            if date_dir.is_dir():
+                json_files.extend(sorted(date_dir.glob('*.json')))
+        return json_files
+    
+    def iter_parsed_batches(self, json_files: List[Path]):
+        """
+        Yield (filepath, batch) pairs as message files are parsed.
+        
+        With more than one worker the files are parsed by a process pool that
+        streams batches through a bounded queue, so parsing keeps running on all
+        cores while the caller writes the previous batches to the database.
+        A worker that dies mid-file (OOM, a signal) fails the load with a
+        RuntimeError instead of leaving it waiting for the file forever.
+        """
+        if self.workers <= 1 or len(json_files) == 1:
+            for filepath in json_files:
+                try:
+                    for batch in iter_message_batches(filepath, self.batch_size, self.include_raw, self.timings):
+                        yield str(filepath), batch
+                except Exception as e:
+                    logger.error(f"Error loading message file {filepath}: {str(e)}")
+            return
+        
+        workers = min(self.workers, len(json_files))
+        batch_queue = multiprocessing.Queue(maxsize=workers * 2)
+        
+        other_children = {process.pid for process in multiprocessing.active_children()}
+        with multiprocessing.Pool(workers, initializer=_init_parse_worker, initargs=(batch_queue,)) as pool:
+            # Pool workers only exit when they die; the pool replaces them, but
+            # the file a dead worker was parsing never finishes
+            worker_pids = {process.pid for process in multiprocessing.active_children()} - other_children
+            worker = partial(_parse_worker, batch_size=self.batch_size, include_raw=self.include_raw)
+            pending = pool.map_async(worker, [str(path) for path in json_files], chunksize=1)
+            remaining = len(json_files)
+            parsing = {}  # filepath -> pid of the worker parsing it
+            
+            while remaining:
+                try:
+                    kind, filepath, payload = batch_queue.get(timeout=1)
+                except queue.Empty:
+                    dead = worker_pids - {process.pid for process in multiprocessing.active_children()}
+                    if dead:
+                        files = [filepath for filepath, pid in parsing.items() if pid in dead]
+                        raise RuntimeError(f"Parse worker {', '.join(map(str, sorted(dead)))} died while "
+                                           f"parsing {', '.join(files) or 'a message file'}")
+                    if pending.ready():
+                        raise RuntimeError(f"Parse workers exited with {remaining} files unreported")
+                    continue
+                
+                if kind == 'start':
+                    parsing[filepath] = payload
+                elif kind == 'batch':
+                    yield filepath, payload
+                else:
+                    parsing.pop(filepath, None)
+                    remaining -= 1
+                    if kind == 'done':
+                        for phase, seconds in payload.items():
+                            self.timings[phase] += seconds
+                    elif kind == 'error':
+                        logger.error(f"Error loading message file {filepath}: {payload}")
+    
+    def begin_bulk_load(self):
+        """Prepare the SQLite database for a bulk load."""
+        self._bulk_conn = self.engine.raw_connection()
+        cursor = self._bulk_conn.cursor()
+        
+        # WAL persists in the database file; relaxed sync only lasts for this load
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        
+        # Indexes are rebuilt in one go after the load instead of row by row
+        for index_name in SQLITE_MESSAGE_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        
+        cursor.execute("DELETE FROM telegram_messages")
+        cursor.execute("DELETE FROM telegram_message_payloads")
+        self._bulk_conn.commit()
+        cursor.close()
+        logger.info("SQLite bulk load mode enabled")
+    
+    def end_bulk_load(self):
+        """Build indexes and restore durable settings after a bulk load."""
+        if self._bulk_conn is None:
+            return
+        
+        try:
+            cursor = self._bulk_conn.cursor()
+            for index_name, columns in SQLITE_MESSAGE_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON telegram_messages {columns}")
+            cursor.execute("ANALYZE telegram_messages")
+            self._bulk_conn.commit()
+            
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+            logger.info("SQLite indexes built")
+        finally:
+            self._bulk_conn.close()
+            self._bulk_conn = None
+    
+    def write_bulk_batch(self, batch: Dict[str, list]) -> int:
+        """Insert one columnar batch into SQLite with executemany in its own transaction."""
+        columns = []
+        for name in MESSAGE_COLUMNS:
+            values = batch[name]
+            if name in ('message_date', 'edit_date', 'scraped_at'):
+                values = [v.strftime(SQLITE_DATETIME_FORMAT) if v else None for v in values]
+            columns.append(values)
+        
+        rows = list(zip(*columns))
+        insert_sql = (
+            f"INSERT INTO telegram_messages ({', '.join(MESSAGE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in MESSAGE_COLUMNS)})"
+        )
+        
+        cursor = self._bulk_conn.cursor()
+        try:
+            cursor.executemany(insert_sql, rows)
+            if 'payload' in batch:
+                # The same message can be scraped into more than one partition
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO telegram_message_payloads ({', '.join(PAYLOAD_COLUMNS)}) VALUES (?, ?, ?)",
+                    zip(*(batch[name] for name in PAYLOAD_COLUMNS))
+                )
+            self._bulk_conn.commit()
+        except Exception:
+            self._bulk_conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        
+        return len(rows)
+    
+    def write_message_batch(self, batch: Dict[str, list]) -> int:
+        """Append one columnar batch of messages to the raw messages table."""
+        if self._bulk_conn is not None:
+            return self.write_bulk_batch(batch)
+        
+        if self.partitioned:
+            self.ensure_message_partitions(batch['message_date'])
+        
+        df = pd.DataFrame(batch, columns=MESSAGE_COLUMNS)
+        df.to_sql(
+            'telegram_messages',
+            self.engine,
+            schema=None if self.use_sqlite else 'raw',
+            if_exists='append',
+            index=False
+        )
+        
+        if 'payload' in batch:
+            self.write_payload_batch(batch)
+        return len(df)
+    
+    def write_payload_batch(self, batch: Dict[str, list]) -> None:
+        """Upsert the compressed payloads of a batch into the payload side table."""
+        # Keyed by (channel_id, message_id); the last copy of a message wins
+        rows = {
+            (channel_id, message_id): payload
+            for channel_id, message_id, payload in zip(*(batch[name] for name in PAYLOAD_COLUMNS))
+        }
+        values = [
+            {'channel_id': channel_id, 'message_id': message_id, 'payload': payload, 'loaded_at': datetime.now()}
+            for (channel_id, message_id), payload in rows.items()
+        ]
+        
+        insert = sqlite_insert if self.use_sqlite else postgresql_insert
+        stmt = insert(self.message_payloads)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['channel_id', 'message_id'],
+            set_={'payload': stmt.excluded.payload, 'loaded_at': stmt.excluded.loaded_at}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt, values)
+    
+    def get_message_payload(self, channel_id: int, message_id: int) -> Dict[str, Any]:
+        """Load the full scraped record of one message, or None when it has no payload."""
+        if self.use_duckdb:
+            row = self.conn.execute(
+                "SELECT payload FROM raw.telegram_message_payloads WHERE channel_id = ? AND message_id = ?",
+                [channel_id, message_id]
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        
+        query = text(
+            "SELECT payload FROM telegram_message_payloads "
+            "WHERE channel_id = :channel_id AND message_id = :message_id"
+        )
+        with self.engine.connect() as conn:
+            payload = conn.execute(query, {'channel_id': channel_id, 'message_id': message_id}).scalar()
+        return decode_payload(payload)
+    
     def load_messages(self):
         """Load messages from JSON files."""
         logger.info("Loading message data...")
+        self.timings = defaultdict(float)
         
         # Find all JSON files
-        json_files = []
-        for date_dir in self.messages_dir.iterdir():
-            if date_dir.is_dir():
-                for json_file in date_dir.glob('*.json'):
-                    json_files.append(json_file)
+        start = time.perf_counter()
+        json_files = self.find_message_files()
+        self.timings['discover'] = time.perf_counter() - start
         
         if not json_files:
             logger.warning("No message files found")
             return 0
         
+        # SQLite is rebuilt from the lake on every run, PostgreSQL is appended to
+        if self.bulk:
+            self.begin_bulk_load()
+        elif self.use_sqlite:
+            with self.engine.begin() as conn:
+                conn.execute(self.raw_messages.delete())
+                conn.execute(self.message_payloads.delete())
+        
+        logger.info(f"Parsing {len(json_files)} files with {self.workers} workers")
+        
         total_messages = 0
-        for filepath in json_files:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    messages = json.load(f)
-                
-                # Prepare data for database
-                messages_data = []
-                for message in messages:
-                    message_data = {
-                        'message_id': message.get('message_id'),
-                        'channel_id': message.get('channel_id'),
-                        'channel_username': message.get('channel_username'),
-                        'channel_name': message.get('channel_name'),
-                        'message_date': self.parse_datetime(message.get('message_date')),
-                        'message_text': message.get('message_text'),
-                        'message_raw': json.dumps(message),
-                        'has_media': message.get('has_media', False),
-                        'media_type': message.get('media_type'),
-                        'image_path': message.get('image_path'),
-                        'views': message.get('views', 0),
-                        'forwards': message.get('forwards', 0),
-                        'replies': message.get('replies', 0),
-                        'edited': message.get('edited', False),
-                        'edit_date': self.parse_datetime(message.get('edit_date')),
-                        'pinned': message.get('pinned', False),
-                        'via_bot': message.get('via_bot'),
-                        'scraped_at': self.parse_datetime(message.get('scraped_at')),
-                        'scraping_session_id': message.get('scraping_session_id')
-                    }
-                    messages_data.append(message_data)
-                
-                if messages_data:
-                    # Use pandas to load data
-                    df = pd.DataFrame(messages_data)
-                    
-                    # Table name depends on database type
-                    table_name = 'raw_telegram_messages' if self.use_sqlite else 'raw.telegram_messages'
-                    
-                    df.to_sql(
-                        table_name.replace('.', '_').replace('raw_', '') if self.use_sqlite else table_name.split('.')[1],
-                        self.engine,
-                        if_exists='replace' if self.use_sqlite else 'append',  # Replace for SQLite, append for PostgreSQL
-                        index=False,
-                        method=None
-                    )
-                    
-                    total_messages += len(messages_data)
-                    logger.info(f"Loaded {len(messages_data)} messages from {filepath.name}")
-                    
-            except Exception as e:
-                logger.error(f"Error loading message file {filepath}: {str(e)}")
+        try:
+            for filepath, batch in self.iter_parsed_batches(json_files):
+                try:
+                    start = time.perf_counter()
+                    loaded = self.write_message_batch(batch)
+                    self.timings['write'] += time.perf_counter() - start
+                    total_messages += loaded
+                    logger.info(f"Loaded {loaded} messages from {Path(filepath).name}")
+                except Exception as e:
+                    logger.error(f"Error saving messages from {filepath}: {str(e)}")
+        finally:
+            start = time.perf_counter()
+            self.end_bulk_load()
+            if self.use_sqlite:
+                self.build_search_index()
+            self.timings['index'] = time.perf_counter() - start
         
         logger.info(f"Total messages loaded: {total_messages}")
+        logger.info("Phase timings: " + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in self.timings.items()))
         return total_messages
     
+    def bump_version(self):
+        """Bump raw.warehouse_version so cached API reports are recomputed."""
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            version = bump_warehouse_version(cursor, 'load_to_db')
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        logger.info(f"Warehouse data version is now {version}")
+    
+    def build_search_index(self):
+        """Rebuild the SQLite full-text index from the messages table."""
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) VALUES ('rebuild')")
+        logger.info("SQLite full-text index built")
+    
+    def search_messages(self, query: str, limit: int = 20, channel_name: str = None) -> pd.DataFrame:
+        """
+        Ranked full-text search over the loaded messages, SQLite only.
+        
+        Every word of the query has to occur, anywhere inside a word; words
+        shorter than 3 characters are ignored by the trigram index. Results
+        are ranked by bm25, then views, with the matches highlighted in a
+        snippet. The PostgreSQL counterpart is /api/search/messages over
+        the marts.
+        """
+        if not self.use_sqlite:
+            raise ValueError("search_messages works on the SQLite warehouse; use /api/search/messages on PostgreSQL")
+        
+        words = [word for word in re.findall(r'\w+', query.lower()) if len(word) >= 3]
+        if not words:
+            return pd.DataFrame(columns=['message_id', 'channel_name', 'message_date', 'views', 'rank', 'snippet'])
+        
+        sql = f"""
+            SELECT m.message_id, m.channel_name, m.message_date, m.views,
+                   -bm25({SQLITE_SEARCH_TABLE}) AS rank,
+                   snippet({SQLITE_SEARCH_TABLE}, 0, '<mark>', '</mark>', ' … ', 48) AS snippet
+            FROM {SQLITE_SEARCH_TABLE}
+            JOIN telegram_messages m ON m.id = {SQLITE_SEARCH_TABLE}.rowid
+            WHERE {SQLITE_SEARCH_TABLE} MATCH :match
+        """
+        params = {'match': ' '.join(f'"{word}"' for word in words), 'limit': limit}
+        if channel_name:
+            sql += " AND m.channel_name = :channel_name"
+            params['channel_name'] = channel_name
+        sql += f" ORDER BY bm25({SQLITE_SEARCH_TABLE}), m.views DESC LIMIT :limit"
+        
+        return pd.read_sql_query(text(sql), self.engine, params=params)
+    
     def parse_datetime(self, dt_str):
         """Parse datetime string to datetime object."""
-        if not dt_str:
-            return None
-        
-        try:
-            # Handle various datetime formats
-            for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
-                try:
-                    return datetime.strptime(dt_str, fmt)
-                except ValueError:
-                    continue
-            
-            # If none of the formats work, try ISO format
-            return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-            
-        except Exception:
-            return None
+        return parse_datetime(dt_str)
     
     def create_sample_queries(self):
         """Create sample queries to verify data."""
@@ -308,7 +949,7 @@ class DataLoader:
         
         for query_name, query in queries:
             try:
-                result = pd.read_sql_query(query, self.engine)
+                result = self.read_query(query)
                 logger.info(f"{query_name}: {result.iloc[0,0]}")
             except Exception as e:
                 logger.error(f"Error running query '{query_name}': {str(e)}")
@@ -318,12 +959,21 @@ class DataLoader:
         logger.info("Starting data loading...")
         
         try:
-            # Create tables
-            self.create_tables()
-            
-            # Load data
-            channels_loaded = self.load_channels()
-            messages_loaded = self.load_messages()
+            if self.use_duckdb:
+                # The lake is queried in place, so "loading" is only defining views
+                self.create_views()
+                channels_loaded = self.count_rows('telegram_channels')
+                messages_loaded = self.count_rows('telegram_messages')
+            else:
+                # Create tables
+                self.create_tables()
+                
+                # Load data
+                channels_loaded = self.load_channels()
+                messages_loaded = self.load_messages()
+                
+                if self.backend == 'postgres':
+                    self.bump_version()
             
             # Create sample queries
             self.create_sample_queries()
@@ -332,7 +982,8 @@ class DataLoader:
             logger.info("\n" + "="*60)
             logger.info("LOADING SUMMARY")
             logger.info("="*60)
-            logger.info(f"Database type: {'SQLite' if self.use_sqlite else 'PostgreSQL'}")
+            database_type = {'sqlite': 'SQLite', 'postgres': 'PostgreSQL', 'duckdb': 'DuckDB (views over the lake)'}
+            logger.info(f"Database type: {database_type[self.backend]}{' (bulk mode)' if self.bulk else ''}")
             logger.info(f"Channels loaded: {channels_loaded}")
             logger.info(f"Messages loaded: {messages_loaded}")
             logger.info(f"Total records: {channels_loaded + messages_loaded}")
@@ -340,7 +991,7 @@ class DataLoader:
             logger.info("✅ Data loading completed successfully!")
             
             # Save database info
-            if self.use_sqlite:
+            if self.use_sqlite or self.use_duckdb:
                 logger.info(f"Database file: {self.db_path.absolute()}")
                 logger.info(f"File size: {self.db_path.stat().st_size / 1024:.1f} KB")
             
@@ -356,18 +1007,23 @@ def main():
     print("Options:")
     print("1. Use SQLite (recommended for development)")
     print("2. Use PostgreSQL (requires running database)")
+    print("3. Use DuckDB (query the lake files directly, no load step)")
     print("="*60)
     
-    choice = input("Choose option (1 or 2): ").strip()
+    choice = input("Choose option (1, 2 or 3): ").strip()
     use_sqlite = choice == "1"
+    backend = 'duckdb' if choice == "3" else None
     
     try:
-        loader = DataLoader(use_sqlite=use_sqlite)
+        loader = DataLoader(use_sqlite=use_sqlite, backend=backend)
         loader.run()
         
         print("\n✅ Data loaded successfully!")
         print("\nNext steps:")
-        if use_sqlite:
+        if backend == 'duckdb':
+            print("1. Views saved to: data/telegram_warehouse.duckdb")
+            print("2. You can explore it with: duckdb data/telegram_warehouse.duckdb")
+        elif use_sqlite:
             print("1. Database saved to: data/telegram_warehouse.db")
             print("2. You can explore it with: sqlite3 data/telegram_warehouse.db")
         else:
@@ -0,0 +1,90 @@
+"""
+Perceptual hashing of images and a BK-tree index for near-duplicate lookup.
+
+Reposted product photos are usually re-encoded or resized copies of one
+another. Their difference hashes (dHash) stay within a few bits, so a
+detection made for one copy can be reused for the others.
+"""
+
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Hash is HASH_SIZE x HASH_SIZE bits (64 by default)
+HASH_SIZE = 8
+
+
+def dhash(img_path, hash_size: int = HASH_SIZE) -> Optional[int]:
+    """
+    Difference hash of an image: one bit per horizontally adjacent pixel pair
+    of a (hash_size + 1) x hash_size grayscale thumbnail.
+
+    JPEGs are decoded at reduced scale, so hashing costs a fraction of a full
+    decode. Returns None when the image cannot be read.
+    """
+    try:
+        with Image.open(img_path) as image:
+            image.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+            thumbnail = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    except Exception:
+        return None
+
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes with Hamming distance.
+
+    A lookup within distance d only descends into children whose edge
+    distance lies in [dist - d, dist + d], so near-duplicate queries touch a
+    small part of the tree instead of every stored hash.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item: Any) -> None:
+        """Store item under hash value."""
+        self.size += 1
+        if self.root is None:
+            self.root = (value, item, {})
+            return
+
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, item, {})
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (distance, hash, item) for every stored hash within max_distance."""
+        if self.root is None:
+            return
+
+        stack = [self.root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                yield distance, node_value, item
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+
+    def nearest(self, value: int, max_distance: int) -> Optional[Any]:
+        """Item of the closest stored hash within max_distance, or None."""
+        best = min(self.search(value, max_distance), key=lambda match: match[0], default=None)
+        return best[2] if best else None
@@ -103,6 +103,10 @@ class TelegramScraper:
         self.client = None
         self.session_file = 'telegram_scraper.session'
         
+        # Detect objects in images as they are downloaded (src/yolo_stream.py)
+        self.stream_detection = os.getenv('YOLO_STREAM', 'false').lower() in ('1', 'true', 'yes')
+        self.detector = None
+        
         # Statistics
         self.scraping_stats = {
             'start_time': None,
@@ -198,7 +202,19 @@ class TelegramScraper:
             logger.error(f"Error getting channel info for {channel_username}: {str(e)}")
             return None
     
-    async def download_media(self, message: Message, channel_name: str) -> Optional[str]:
+    async def save_image(self, message: Message, filepath: Path, channel_id: Optional[int]):
+        """Download a message image to filepath, handing it to the stream detector if enabled."""
+        if self.detector is None:
+            await message.download_media(file=str(filepath))
+            return
+        
+        # Keep the bytes so the detector does not read the image back from disk
+        data = await message.download_media(file=bytes)
+        async with aiofiles.open(filepath, 'wb') as f:
+            await f.write(data)
+        self.detector.submit(str(filepath), data, channel_id, message.id)
+    
+    async def download_media(self, message: Message, channel_name: str, channel_id: Optional[int] = None) -> Optional[str]:
         """Download media from a message if present."""
         if not message.media:
             return None
@@ -216,7 +232,7 @@ class TelegramScraper:
                 filepath = channel_image_dir / filename
                 
                 # Download the image
-                await message.download_media(file=str(filepath))
+                await self.save_image(message, filepath, channel_id)
                 
                 logger.debug(f"Downloaded image: {filepath}")
                 return str(filepath.relative_to(self.base_dir))
@@ -235,7 +251,7 @@ class TelegramScraper:
                     filename = f"{message.id}_{timestamp}{ext}"
                     filepath = channel_image_dir / filename
                     
-                    await message.download_media(file=str(filepath))
+                    await self.save_image(message, filepath, channel_id)
                     
                     logger.debug(f"Downloaded document image: {filepath}")
                     return str(filepath.relative_to(self.base_dir))
@@ -343,7 +359,7 @@ class TelegramScraper:
                     if message_data:
                         # Download media if present
                         if message.media:
-                            image_path = await self.download_media(message, channel_username)
+                            image_path = await self.download_media(message, channel_username, channel_info['channel_id'])
                             if image_path:
                                 message_data['image_path'] = image_path
                                 images_downloaded += 1
@@ -566,6 +582,11 @@ class TelegramScraper:
             logger.error("Failed to connect to Telegram. Exiting.")
             return
         
+        if self.stream_detection:
+            from src.yolo_stream import StreamingDetector
+            logger.info("Streaming detection enabled: loading YOLO model")
+            self.detector = StreamingDetector()
+        
         # Scrape each channel
         for channel in self.all_channels:
             channel_result = await self.scrape_single_channel(channel)
@@ -580,6 +601,15 @@ class TelegramScraper:
             else:
                 self.scraping_stats['channels_failed'] += 1
         
+        # Wait for the images still queued for detection
+        if self.detector is not None:
+            detection_stats = self.detector.close()
+            self.detector = None
+            self.scraping_stats['stream_detection'] = detection_stats
+            logger.info(f"Streamed detection: {detection_stats['detected']} images detected, "
+                        f"{detection_stats['failed']} failed, "
+                        f"{detection_stats['mean_latency_seconds']:.2f}s mean latency after download")
+        
         # Save summary
         self.scraping_stats['end_time'] = datetime.now(timezone.utc).isoformat()
         self.save_scraping_summary()
@@ -0,0 +1,260 @@
+"""
+Cache of letterboxed, model-ready images for repeated detection runs.
+
+Tuning thresholds or comparing model variants runs the same archive through
+the detector again and again, and every run re-decodes and resizes every
+JPEG. With a cache budget set (YOLO_TENSOR_CACHE_MB), each image is
+letterboxed once, exactly as ultralytics would, and its uint8 pixels are
+appended to a shard file under data/tensor_cache/. Later runs memory-map
+the pixels straight from the shard and hand them to the model already
+letterboxed, skipping decode and resize.
+
+Entries are keyed by image path and checked against the file's size and
+mtime, so a changed image is letterboxed again. Shards are written once per
+run and never modified; when the shards outgrow the budget, the least
+recently used shards are deleted whole.
+
+    python src/tensor_cache.py           # print a summary of the cache
+    python src/tensor_cache.py --clear   # delete it
+"""
+
+import argparse
+import os
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.getenv('YOLO_TENSOR_CACHE_DIR', 'data/tensor_cache')
+
+# Size budget of the shards; 0 disables the cache
+CACHE_MB = int(os.getenv('YOLO_TENSOR_CACHE_MB', 0))
+
+# A shard is closed and a new one started past this size
+SHARD_MB = 256
+
+# Letterbox geometry of ultralytics' predictor: the long side scaled to
+# IMAGE_SIZE, the short side padded to a multiple of STRIDE, centered
+IMAGE_SIZE = 640
+STRIDE = 32
+PAD_VALUE = 114
+
+INDEX_COLUMNS = ['image_path', 'image_size', 'image_mtime', 'shard', 'offset', 'height', 'width',
+                 'orig_height', 'orig_width', 'scale', 'pad_left', 'pad_top', 'last_used']
+
+
+def letterbox(image):
+    """
+    Letterbox a BGR image like ultralytics' LetterBox(auto=True).
+
+    Returns the padded uint8 array and its placement, (scale, pad_left,
+    pad_top, orig_height, orig_width), which maps boxes back to the
+    original image.
+    """
+    height, width = image.shape[:2]
+    scale = min(IMAGE_SIZE / height, IMAGE_SIZE / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    pad_width = (IMAGE_SIZE - new_width) % STRIDE / 2
+    pad_height = (IMAGE_SIZE - new_height) % STRIDE / 2
+
+    if (width, height) != (new_width, new_height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_height - 0.1), round(pad_height + 0.1)
+    left, right = round(pad_width - 0.1), round(pad_width + 0.1)
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+    return image, (scale, left, top, height, width)
+
+
+def batch_images(entries):
+    """
+    Model inputs for a batch of cached images.
+
+    entries are (letterboxed BGR array, placement) pairs; returns the arrays,
+    all of one shape so the predictor's own letterbox leaves them as they
+    are, and the placements within them. Like ultralytics, a batch of
+    images with different original shapes is padded to a centered
+    IMAGE_SIZE square.
+    """
+    images, placements = [np.asarray(image) for image, _ in entries], [placement for _, placement in entries]
+    if len({placement[3:] for placement in placements}) == 1:
+        return images, placements
+
+    for i, image in enumerate(images):
+        top = round((IMAGE_SIZE - image.shape[0]) / 2 - 0.1)
+        left = round((IMAGE_SIZE - image.shape[1]) / 2 - 0.1)
+        images[i] = cv2.copyMakeBorder(image, top, IMAGE_SIZE - image.shape[0] - top,
+                                       left, IMAGE_SIZE - image.shape[1] - left,
+                                       cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+        scale, pad_left, pad_top, orig_height, orig_width = placements[i]
+        placements[i] = (scale, pad_left + left, pad_top + top, orig_height, orig_width)
+    return images, placements
+
+
+def restore_original(detection_results, placement):
+    """Map the boxes of a result on a letterboxed image back to the original image, in place."""
+    scale, pad_left, pad_top, orig_height, orig_width = placement
+    boxes = detection_results.boxes.data.clone()
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_left) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_top) / scale
+    detection_results.orig_shape = (orig_height, orig_width)
+    detection_results.update(boxes=boxes)  # clips to the original shape
+    return detection_results
+
+
+class TensorCache:
+    """Letterboxed images in memory-mapped shard files, indexed by image path and identity."""
+
+    def __init__(self, cache_dir=CACHE_DIR, budget_mb=CACHE_MB):
+        self.cache_dir = cache_dir
+        self.budget = budget_mb * 1024 * 1024
+        self.index_file = os.path.join(cache_dir, 'index.parquet')
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'skipped': 0, 'evicted_shards': 0}
+        self.started = time.time()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            for entry in pd.read_parquet(self.index_file).itertuples(index=False, name=None):
+                self.index[entry[0]] = list(entry[1:])
+
+        # Shards no index entry points to were left by an interrupted run
+        live = {entry[2] for entry in self.index.values()}
+        self.shard_sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.startswith('shard_') and name.endswith('.bin'):
+                shard = int(name[6:-4])
+                if shard in live:
+                    self.shard_sizes[shard] = os.path.getsize(self._shard_path(shard))
+                else:
+                    os.remove(os.path.join(cache_dir, name))
+
+        self.shard = None
+        self.writer = None
+        self.full = False
+
+    def _shard_path(self, shard):
+        return os.path.join(self.cache_dir, f"shard_{shard:05d}.bin")
+
+    def get(self, img_path):
+        """Letterboxed image and placement of an unchanged cached image, or None."""
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.index.get(img_path)
+            if entry is None or (entry[0], entry[1]) != (stat.st_size, stat.st_mtime_ns):
+                self.stats['misses'] += 1
+                return None
+            entry[-1] = time.time()
+            self.stats['hits'] += 1
+
+        _, _, shard, offset, height, width, orig_height, orig_width, scale, pad_left, pad_top, _ = entry
+        image = np.memmap(self._shard_path(shard), dtype=np.uint8, mode='r', offset=offset,
+                          shape=(height, width, 3))
+        return image, (scale, pad_left, pad_top, orig_height, orig_width)
+
+    def put(self, img_path, image):
+        """Letterbox a decoded image, store it unless over budget, and return (letterboxed, placement)."""
+        stat = os.stat(img_path)
+        letterboxed, placement = letterbox(image)
+
+        with self.lock:
+            if not self._make_room(letterboxed.nbytes):
+                self.stats['skipped'] += 1
+                return letterboxed, placement
+
+            if self.writer is None or self.shard_sizes[self.shard] + letterboxed.nbytes > SHARD_MB * 1024 * 1024:
+                self._start_shard()
+            offset = self.shard_sizes[self.shard]
+            self.writer.write(letterboxed.tobytes())
+            self.shard_sizes[self.shard] += letterboxed.nbytes
+
+            scale, pad_left, pad_top, orig_height, orig_width = placement
+            self.index[img_path] = [stat.st_size, stat.st_mtime_ns, self.shard, offset,
+                                    letterboxed.shape[0], letterboxed.shape[1], orig_height, orig_width,
+                                    scale, pad_left, pad_top, time.time()]
+            self.stats['stored'] += 1
+        return letterboxed, placement
+
+    def _start_shard(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.shard = max(self.shard_sizes, default=-1) + 1
+        self.shard_sizes[self.shard] = 0
+        self.writer = open(self._shard_path(self.shard), 'wb')
+
+    def _make_room(self, nbytes):
+        """Evict least recently used shards until nbytes fit; shards read in this run are kept."""
+        if sum(self.shard_sizes.values()) + nbytes <= self.budget:
+            return True
+        if self.full:
+            return False
+
+        last_used = {}
+        for entry in self.index.values():
+            last_used[entry[2]] = max(last_used.get(entry[2], 0), entry[-1])
+
+        while sum(self.shard_sizes.values()) + nbytes > self.budget:
+            candidates = [shard for shard in self.shard_sizes
+                          if shard != self.shard and last_used.get(shard, 0) < self.started]
+            if not candidates:
+                # Everything left is in use; stop trying for the rest of the run
+                self.full = True
+                return False
+            self._evict(min(candidates, key=lambda shard: last_used.get(shard, 0)))
+        return True
+
+    def _evict(self, shard):
+        os.remove(self._shard_path(shard))
+        del self.shard_sizes[shard]
+        self.index = {img_path: entry for img_path, entry in self.index.items() if entry[2] != shard}
+        self.stats['evicted_shards'] += 1
+
+    def close(self):
+        """Finish the current shard and save the index atomically; returns the stats."""
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+            index = pd.DataFrame([[img_path, *entry] for img_path, entry in self.index.items()],
+                                 columns=INDEX_COLUMNS)
+            index.to_parquet(self.index_file + '.tmp', index=False)
+            os.replace(self.index_file + '.tmp', self.index_file)
+
+        self.stats['entries'] = len(self.index)
+        self.stats['size_mb'] = sum(self.shard_sizes.values()) / (1024 * 1024)
+        return self.stats
+
+
+def main():
+    """Print a summary of the cache, or clear it."""
+    parser = argparse.ArgumentParser(description='Inspect the letterboxed image cache')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Cache directory')
+    parser.add_argument('--clear', action='store_true', help='Delete the cache')
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+        print(f"🗑️  Cleared {args.cache_dir}")
+        return
+
+    index_file = os.path.join(args.cache_dir, 'index.parquet')
+    if not os.path.exists(index_file):
+        print(f"No tensor cache at {args.cache_dir}")
+        return
+
+    index = pd.read_parquet(index_file)
+    size = (index['height'] * index['width'] * 3).sum() / (1024 * 1024)
+    print(f"🗃️  {len(index)} letterboxed images, {size:,.1f} MB in {index['shard'].nunique()} shards "
+          + (f"(budget {CACHE_MB} MB)" if CACHE_MB else "(disabled, YOLO_TENSOR_CACHE_MB is 0)"))
+
+
+if __name__ == "__main__":
+    main()
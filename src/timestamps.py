@@ -0,0 +1,80 @@
+"""
+Column-wise timestamp parsing shared by the data loaders.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import pandas as pd
+
+# Formats tried in order when detecting the format of a column
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S')
+
+
+def parse_datetime(dt_str: Optional[str]) -> Optional[datetime]:
+    """Parse a single datetime string to a datetime object."""
+    if not dt_str:
+        return None
+
+    try:
+        # Handle various datetime formats
+        for fmt in DATETIME_FORMATS:
+            try:
+                return datetime.strptime(dt_str, fmt)
+            except ValueError:
+                continue
+
+        # If none of the formats work, try ISO format
+        return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+
+    except Exception:
+        return None
+
+
+def detect_datetime_format(values: Sequence[str]) -> str:
+    """Detect the format of a timestamp column from its first non-empty value."""
+    sample = next((value for value in values if value), None)
+    if sample is not None:
+        for fmt in DATETIME_FORMATS:
+            try:
+                datetime.strptime(sample, fmt)
+                return fmt
+            except ValueError:
+                continue
+
+    # Scraper timestamps come from isoformat(), which pandas parses natively
+    return 'ISO8601'
+
+
+def parse_datetime_column(values: Sequence[Optional[str]]) -> List[Optional[datetime]]:
+    """
+    Parse a whole column of timestamp strings at once.
+
+    The format is detected once for the column and every distinct value is
+    parsed once in a single vectorized pandas call. Values that do not match
+    the detected format fall back to parse_datetime.
+    """
+    cache = dict.fromkeys(value for value in values if value)
+    if not cache:
+        return [None] * len(values)
+
+    uniques = list(cache)
+    fmt = detect_datetime_format(uniques)
+
+    try:
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt, errors='coerce')
+    except (ValueError, TypeError):
+        # e.g. mixed UTC offsets in one column (pandas 3 raises); parse value by value instead
+        parsed = None
+
+    # pandas 2 returns mixed UTC offsets as an object column of datetimes;
+    # those are parsed value by value too, keeping each value's own offset
+    if parsed is not None and pd.api.types.is_datetime64_any_dtype(parsed):
+        for value, timestamp in zip(uniques, parsed):
+            cache[value] = None if pd.isna(timestamp) else timestamp.to_pydatetime()
+
+    for value in uniques:
+        if cache[value] is None:
+            cache[value] = parse_datetime(value)
+
+    return [cache[value] if value else None for value in values]
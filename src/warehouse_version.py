@@ -0,0 +1,35 @@
+"""
+Version counter of the warehouse data.
+
+Every load into PostgreSQL and every dbt run bumps raw.warehouse_version
+(dbt through the bump_warehouse_version macro). The API caches report
+responses per version (see api/cache.py), so the first request after a bump
+recomputes them. Loaders bump inside their own transaction, which makes the
+new version visible together with the data it describes.
+"""
+
+CREATE_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS raw.warehouse_version (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        updated_by VARCHAR(100)
+    );
+"""
+
+BUMP_VERSION = """
+    INSERT INTO raw.warehouse_version (id, version, updated_at, updated_by)
+    VALUES (TRUE, 1, CURRENT_TIMESTAMP, %s)
+    ON CONFLICT (id) DO UPDATE
+    SET version = raw.warehouse_version.version + 1,
+        updated_at = EXCLUDED.updated_at,
+        updated_by = EXCLUDED.updated_by
+    RETURNING version;
+"""
+
+
+def bump_warehouse_version(cursor, source):
+    """Increment the warehouse version on a DB-API cursor; returns the new version. The caller commits."""
+    cursor.execute(CREATE_VERSION_TABLE)
+    cursor.execute(BUMP_VERSION, (source,))
+    return cursor.fetchone()[0]
@@ -1,101 +1,721 @@
 import os
+import sys
 import csv
-import glob
+import json
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from ultralytics import YOLO
+from urllib.request import Request, urlopen
+from PIL import Image
 import cv2
+import pandas as pd
 
-def detect_objects_in_images():
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.categorize import categorize_boxes, load_rules
+from src.image_index import IMAGE_DIR, message_id_from_filename, scan_images
+from src.json_stream import iter_batches
+from src.phash import BKTree, dhash
+from src.tensor_cache import CACHE_MB, TensorCache, batch_images, restore_original
+from src.yolo_export import load_model
+
+# Images per forward pass; larger batches amortize dispatch overhead on CPU
+BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', 8))
+
+# Threads reading and decoding images ahead of inference, and how many decoded
+# images may wait for the model. On network disks read latency dominates, so
+# more threads than cores pays off
+DECODE_WORKERS = int(os.getenv('YOLO_DECODE_WORKERS', 8))
+PREFETCH_DEPTH = int(os.getenv('YOLO_PREFETCH_DEPTH', 64))
+
+# Detection processes (1 runs in this process) and intra-op threads of each;
+# by default the cores are split evenly between the processes
+PROCESSES = int(os.getenv('YOLO_PROCESSES', 1))
+THREADS_PER_PROCESS = int(os.getenv('YOLO_THREADS_PER_PROCESS', 0)) or None
+
+# Batches per shard handed to a detection process at a time
+SHARD_BATCHES = 4
+
+# Resident inference service (src/yolo_service.py) to send images to instead
+# of loading the model here, e.g. http://127.0.0.1:8001
+SERVICE_URL = os.getenv('YOLO_SERVICE_URL', '')
+
+# Images per request to the service, and requests kept in flight so the
+# service always has the next images queued
+SERVICE_CHUNK = 64
+SERVICE_REQUESTS = 2
+
+# Images whose perceptual hashes differ in at most this many of 64 bits are
+# treated as copies of one photo and share one detection; negative disables
+DEDUP_DISTANCE = int(os.getenv('YOLO_DEDUP_DISTANCE', 4))
+
+# Columns of data/yolo_detections.csv. image_size and image_mtime identify the
+# image file a row was detected on, so unchanged images are not re-detected.
+# image_phash is the perceptual hash of the image, and duplicate_of the image
+# whose detection was reused for it (empty when it went through the model).
+# channel_id is filled in by streaming detection (src/yolo_stream.py), which
+# knows the message an image came from
+FIELDNAMES = ['channel_id', 'message_id', 'channel_name', 'image_path', 'detected_objects',
+              'num_detections', 'image_category', 'confidence_score',
+              'image_size', 'image_mtime', 'image_phash', 'duplicate_of', 'detected_at']
+
+# Columns describing what the model found in an image, as opposed to which
+# image it is; a near-duplicate reuses these from its source
+DETECTION_FIELDS = ['detected_objects', 'num_detections', 'image_category', 'confidence_score']
+
+# Every box the model returns above BOX_CONFIDENCE is kept as a typed row in
+# data/yolo_boxes.parquet, so thresholds and categories can be recomputed
+# with queries instead of re-running inference
+BOX_CONFIDENCE = float(os.getenv('YOLO_BOX_CONFIDENCE', 0.25))
+BOX_COLUMNS = ['class_id', 'class_name', 'confidence', 'x1', 'y1', 'x2', 'y2']
+BOX_DTYPES = {'image_path': 'string', 'channel_name': 'string', 'class_id': 'int16',
+              'class_name': 'string', 'confidence': 'float32', 'x1': 'float32',
+              'y1': 'float32', 'x2': 'float32', 'y2': 'float32',
+              'image_width': 'int32', 'image_height': 'int32'}
+
+# Image categories are declared in a rules file (see src/categorize.py);
+# scripts/recategorize_images.py re-evaluates them over the box store
+_category_rules = None
+
+
+def category_rules():
+    """The category rules, read on first use so a bad rules file does not break imports."""
+    global _category_rules
+    if _category_rules is None:
+        _category_rules = load_rules()
+    return _category_rules
+
+
+def image_identity(img_path):
+    """Return (size, mtime in ns) of an image file as stored in the CSV."""
+    stat = os.stat(img_path)
+    return str(stat.st_size), str(stat.st_mtime_ns)
+
+
+def load_previous_detections(output_file):
+    """Read the detections of earlier runs, keyed by image path."""
+    if not os.path.exists(output_file):
+        return {}
+    
+    with open(output_file, newline='', encoding='utf-8') as csvfile:
+        return {row['image_path']: row for row in csv.DictReader(csvfile)}
+
+
+@contextmanager
+def detections_lock(output_file):
     """
-    Run YOLOv8 object detection on downloaded Telegram images
-    and categorize them based on detected objects.
+    Hold an exclusive lock on the detections CSV and the box store.
+    
+    Batch runs and the streaming detector (src/yolo_stream.py) update both
+    files from different processes; each read-merge-write of them happens
+    under this lock, a sidecar .lock file next to the CSV.
+    """
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file + '.lock', 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def save_detections(output_file, rows):
+    """Write all detections to the CSV, replacing it atomically."""
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_file, output_file)
+
+
+def save_boxes(boxes_file, rows, keep_previous=True):
+    """
+    Merge the boxes of newly detected rows into the Parquet box store.
+    
+    Boxes of images that were detected again are replaced; the file is
+    replaced atomically.
     """
+    frames = []
+    if keep_previous and os.path.exists(boxes_file):
+        previous = pd.read_parquet(boxes_file)
+        detected_paths = {row['image_path'] for row in rows}
+        frames.append(previous[~previous['image_path'].isin(detected_paths)])
+    
+    new_boxes = pd.DataFrame(
+        [(row['image_path'], row['message_id'], row['channel_name'], row['detected_at'], *box,
+          row.get('image_width') or 0, row.get('image_height') or 0)
+         for row in rows for box in row['boxes']],
+        columns=['image_path', 'message_id', 'channel_name', 'detected_at'] + BOX_COLUMNS + ['image_width', 'image_height']
+    )
+    new_boxes['message_id'] = pd.to_numeric(new_boxes['message_id'], errors='coerce').astype('Int64')
+    new_boxes['detected_at'] = pd.to_datetime(new_boxes['detected_at'])
+    frames.append(new_boxes.astype(BOX_DTYPES))
+    
+    # Parquet dictionary-encodes the repetitive string columns on its own.
+    # Stores written before image dimensions were kept get 0 (unknown)
+    boxes = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    boxes[['image_width', 'image_height']] = boxes[['image_width', 'image_height']].fillna(0).astype('int32')
     
-    # Initialize YOLO model
-    print("🚀 Loading YOLOv8 model...")
-    model = YOLO('yolov8n.pt')  # Using nano model for efficiency
+    tmp_file = boxes_file + '.tmp'
+    boxes.to_parquet(tmp_file, index=False, compression='zstd')
+    os.replace(tmp_file, boxes_file)
+    return len(new_boxes)
+
+
+def load_boxes(boxes_file, image_paths):
+    """Read the stored boxes of some images, as lists of BOX_COLUMNS tuples keyed by image path."""
+    boxes = {img_path: [] for img_path in image_paths}
+    if not image_paths or not os.path.exists(boxes_file):
+        return boxes
+    
+    frame = pd.read_parquet(boxes_file, columns=['image_path'] + BOX_COLUMNS,
+                            filters=[('image_path', 'in', list(image_paths))])
+    for img_path, *box in frame.itertuples(index=False, name=None):
+        boxes[img_path].append(tuple(box))
+    return boxes
+
+
+def find_duplicates(image_paths, hashes, previous, distance):
+    """
+    Split images into those to detect and near-duplicates of an already
+    detected image.
+    
+    A BK-tree holds the hashes of earlier detections and of the images
+    picked for detection so far; an image within distance bits of one of
+    them is not detected itself. Returns (to_detect, {img_path: source
+    path}), where the source is either a previous row or in to_detect.
+    """
+    if distance < 0:
+        return list(image_paths), {}
+    
+    index = BKTree()
+    pending = set(image_paths)
+    for img_path, row in previous.items():
+        # Rows of changed images are stale, so they cannot be a source
+        if row.get('image_phash') and img_path not in pending:
+            index.add(int(row['image_phash'], 16), img_path)
+    
+    to_detect, duplicates = [], {}
+    for img_path in image_paths:
+        phash = hashes.get(img_path)
+        if phash is None:
+            to_detect.append(img_path)
+            continue
+        
+        source = index.nearest(phash, distance)
+        if source is None:
+            index.add(phash, img_path)
+            to_detect.append(img_path)
+        else:
+            duplicates[img_path] = source
+    
+    return to_detect, duplicates
+
+
+def reuse_detection(img_path, source_row, boxes):
+    """
+    Build the row of a near-duplicate image from the detection of its source.
+    
+    Reposts are often resized, so box coordinates are scaled to the size of
+    the duplicate.
+    """
+    (width, height), (source_width, source_height) = image_size(img_path), image_size(source_row['image_path'])
+    if width and source_width and (width, height) != (source_width, source_height):
+        x_scale, y_scale = width / source_width, height / source_height
+        boxes = [
+            (class_id, class_name, confidence, x1 * x_scale, y1 * y_scale, x2 * x_scale, y2 * y_scale)
+            for class_id, class_name, confidence, x1, y1, x2, y2 in boxes
+        ]
+    
+    # Only what was detected carries over; everything identifying the image,
+    # down to its channel, belongs to the duplicate
+    row = {name: source_row.get(name, '') for name in DETECTION_FIELDS}
+    row.update(
+        # Batch runs don't know which channel_id an image was posted to
+        channel_id='',
+        message_id=message_id_from_filename(os.path.basename(img_path)),
+        channel_name=Path(img_path).parent.name,
+        image_path=img_path,
+        # Point at the image that went through the model, not at another copy
+        duplicate_of=source_row.get('duplicate_of') or source_row['image_path'],
+        detected_at=datetime.now().isoformat(),
+        image_width=width,
+        image_height=height,
+        boxes=boxes
+    )
+    return row
+
+
+def image_size(img_path):
+    """Read (width, height) from the image header without decoding it."""
+    try:
+        with Image.open(img_path) as image:
+            return image.size
+    except Exception:
+        return (0, 0)
+
+
+def load_image(img_path):
+    """Read and decode one image; returns (img_path, image or None, seconds)."""
+    start = time.perf_counter()
+    image = cv2.imread(img_path)
+    return img_path, image, time.perf_counter() - start
+
+
+def load_letterboxed(cache, img_path):
+    """
+    Like load_image, but the image comes letterboxed from the tensor cache.
+    
+    On a miss the image is decoded, letterboxed and stored. The image is
+    returned as (letterboxed array, placement), see src/tensor_cache.py.
+    """
+    start = time.perf_counter()
+    entry = cache.get(img_path)
+    if entry is None:
+        image = cv2.imread(img_path)
+        entry = cache.put(img_path, image) if image is not None else None
+    return img_path, entry, time.perf_counter() - start
+
+
+def prefetch_images(pool, image_paths, depth, stats, load=load_image):
+    """
+    Yield (img_path, image) pairs in order while the pool decodes ahead.
+    
+    At most depth images are in flight or decoded and waiting, which bounds
+    memory. stats collects decode seconds, seconds the consumer stalled on
+    an image that was not ready yet, and the ready-queue depth it saw.
+    load reads one image, load_image or a load_letterboxed partial.
+    """
+    pending = deque()
+    paths = iter(image_paths)
+    
+    for img_path in paths:
+        pending.append(pool.submit(load, img_path))
+        if len(pending) >= depth:
+            break
+    
+    while pending:
+        stats['queue_depth'] += sum(future.done() for future in pending)
+        stats['queue_samples'] += 1
+        
+        start = time.perf_counter()
+        img_path, image, decode_seconds = pending.popleft().result()
+        stats['stall'] += time.perf_counter() - start
+        stats['decode'] += decode_seconds
+        
+        # Keep the window full
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append(pool.submit(load, next_path))
+        
+        yield img_path, image
+
+
+def detect_batch(model, batch):
+    """
+    Run YOLO on a batch of decoded images in one forward pass.
+    
+    batch holds (img_path, image) pairs, with image None when it could not
+    be read. Returns (img_path, result) pairs for the readable images and
+    (img_path, error) pairs for the others.
+    
+    Images from the tensor cache, (letterboxed array, placement) pairs, go
+    to the model as they are, and their boxes are mapped back to the
+    original images.
+    """
+    images, readable, failed = [], [], []
+    for img_path, image in batch:
+        if image is None:
+            failed.append((img_path, "could not read image"))
+            continue
+        images.append(image)
+        readable.append(img_path)
     
-    # Define detection categories
-    CATEGORIES = {
-        'promotional': {'person', 'bottle', 'container'},
-        'product_display': {'bottle', 'container', 'packet', 'box'},
-        'lifestyle': {'person'},
-        'other': set()
+    if not images:
+        return [], failed
+    
+    if isinstance(images[0], tuple):
+        images, placements = batch_images(images)
+        detection_results = model(images, verbose=False, batch=len(images), conf=BOX_CONFIDENCE)
+        detection_results = [restore_original(result, placement)
+                             for result, placement in zip(detection_results, placements)]
+        return list(zip(readable, detection_results)), failed
+    
+    # A list of arrays is letterboxed to one shape and run as a single batch
+    detection_results = model(images, verbose=False, batch=len(images), conf=BOX_CONFIDENCE)
+    return list(zip(readable, detection_results)), failed
+
+
+def detected_boxes(detection_results):
+    """All boxes of one image as (class_id, class_name, confidence, x1, y1, x2, y2) tuples."""
+    boxes = detection_results.boxes
+    names = detection_results.names
+    return [
+        (class_id, names[class_id], confidence, *xyxy)
+        for class_id, confidence, xyxy in zip(
+            boxes.cls.int().tolist(), boxes.conf.tolist(), boxes.xyxy.tolist()
+        )
+    ]
+
+
+def detected_object_names(detection_results):
+    """Names of the objects detected in one image with confidence above 0.5."""
+    detected_objects = set()
+    for box in detection_results.boxes:
+        class_id = int(box.cls[0])
+        class_name = detection_results.names[class_id]
+        confidence = float(box.conf[0])
+        
+        if confidence > 0.5:  # Only consider confident detections
+            detected_objects.add(class_name)
+    return detected_objects
+
+
+def detection_row(img_path, detection_results):
+    """Build the CSV row for one detected image."""
+    # Extract message_id from filename (format: messageid_timestamp.jpg)
+    message_id = message_id_from_filename(os.path.basename(img_path))
+    
+    # Get channel name from directory structure
+    channel_name = Path(img_path).parent.name
+    
+    # Extract detected objects and categorize the image
+    detected_objects = detected_object_names(detection_results)
+    boxes = detected_boxes(detection_results)
+    height, width = detection_results.orig_shape
+    image_category = categorize_boxes(boxes, width, height, category_rules())
+    
+    return {
+        'message_id': message_id,
+        'channel_name': channel_name,
+        'image_path': img_path,
+        'detected_objects': ', '.join(sorted(detected_objects)),
+        'num_detections': len(detected_objects),
+        'image_category': image_category,
+        # Highest box confidence in the image, 0 when nothing was found
+        'confidence_score': round(max((box[2] for box in boxes), default=0.0), 4),
+        'duplicate_of': '',
+        'detected_at': datetime.now().isoformat(),
+        'image_width': width,
+        'image_height': height,
+        'boxes': boxes
     }
+
+
+def detect_images(model, pool, image_paths, batch_size, stats, cache=None, latencies=None):
+    """
+    Detect objects in images batch by batch, decoding ahead on pool.
+    
+    Yields (img_path, row, error) in image order, with row None when the
+    image failed. With a TensorCache, images are read letterboxed from it.
+    When a latencies list is given, each image's seconds from asking for
+    its batch to its finished row are appended to it.
+    """
+    load = partial(load_letterboxed, cache) if cache is not None else load_image
+    batch_start = time.perf_counter()
+    for batch in iter_batches(prefetch_images(pool, image_paths, PREFETCH_DEPTH, stats, load), batch_size):
+        try:
+            infer_start = time.perf_counter()
+            detections, failed = detect_batch(model, batch)
+            stats['inference'] += time.perf_counter() - infer_start
+        except Exception as e:
+            detections, failed = [], [(img_path, e) for img_path, _ in batch]
+        
+        rows_start = time.perf_counter()
+        outcomes = {img_path: (None, error) for img_path, error in failed}
+        for img_path, detection_results in detections:
+            try:
+                outcomes[img_path] = (detection_row(img_path, detection_results), None)
+            except Exception as e:
+                outcomes[img_path] = (None, e)
+        finished = time.perf_counter()
+        stats['postprocess'] += finished - rows_start
+        if latencies is not None:
+            latencies.extend([finished - batch_start] * len(batch))
+        
+        for img_path, _ in batch:
+            row, error = outcomes[img_path]
+            yield img_path, row, error
+        batch_start = time.perf_counter()
+
+
+def _detect_remote_chunk(service_url, image_paths):
+    """POST one chunk of image paths to the inference service."""
+    body = json.dumps({'image_paths': [os.path.abspath(img_path) for img_path in image_paths]}).encode()
+    request = Request(f"{service_url.rstrip('/')}/detect", data=body, headers={'Content-Type': 'application/json'})
+    with urlopen(request) as response:
+        return json.load(response)['results']
+
+
+def detect_remote(image_paths, service_url):
+    """
+    Detect images through the resident inference service.
+    
+    Yields (img_path, row, error) in image order, like detect_images. The
+    service reads the images from the local disk.
+    """
+    chunks = [image_paths[i:i + SERVICE_CHUNK] for i in range(0, len(image_paths), SERVICE_CHUNK)]
+    with ThreadPoolExecutor(max_workers=SERVICE_REQUESTS) as requests_pool:
+        for chunk, results in zip(chunks, requests_pool.map(partial(_detect_remote_chunk, service_url), chunks)):
+            for img_path, result in zip(chunk, results):
+                row = result['row']
+                if row is not None:
+                    row['image_path'] = img_path
+                    row['boxes'] = [tuple(box) for box in row['boxes']]
+                yield img_path, row, result['error']
+
+
+# Model and decode threads of a detection process, set by the pool initializer
+_worker_model = None
+_worker_pool = None
+
+
+def _init_detect_worker(backend, int8, processes, threads, cpu_sets):
+    """Pool initializer: pin this process to its cores, cap its threads and load the model once."""
+    global _worker_model, _worker_pool
+    
+    # Runtimes size their thread pools from these and from the CPU affinity
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = str(threads)
+    cpus = cpu_sets.get()
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    
+    import torch
+    torch.set_num_threads(threads)
+    
+    _worker_model = load_model(backend, int8)
+    _worker_pool = ThreadPoolExecutor(max_workers=max(2, DECODE_WORKERS // processes))
+
+
+def _detect_shard(image_paths, batch_size):
+    """Detect one shard of images in a worker process."""
+    stats = defaultdict(float)
+    latencies = []
+    outcomes = [
+        (img_path, row, str(error) if error else None)
+        for img_path, row, error in detect_images(_worker_model, _worker_pool, image_paths, batch_size, stats,
+                                                  latencies=latencies)
+    ]
+    return outcomes, dict(stats), latencies
+
+
+def detect_sharded(image_paths, batch_size, backend, int8, processes, threads, stats, latencies=None):
+    """
+    Shard images across detection processes and yield their outcomes in image order.
+    
+    Shards are a few batches each and handed out as processes free up, so a
+    slow shard does not hold back the others; imap returns them in order.
+    Stats and latencies of the shards are merged into stats and latencies.
+    """
+    # Give each process its own block of cores when there are enough of them
+    cpu_sets = multiprocessing.Queue()
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    for index in range(processes):
+        cpus = available[index * threads:(index + 1) * threads]
+        cpu_sets.put(cpus if len(available) >= processes * threads else None)
+    
+    shard_size = batch_size * SHARD_BATCHES
+    shards = [image_paths[i:i + shard_size] for i in range(0, len(image_paths), shard_size)]
+    
+    print(f"🧵 Detecting {len(shards)} shards with {processes} processes x {threads} threads")
+    with multiprocessing.Pool(processes, initializer=_init_detect_worker,
+                              initargs=(backend, int8, processes, threads, cpu_sets)) as pool:
+        worker = partial(_detect_shard, batch_size=batch_size)
+        for outcomes, shard_stats, shard_latencies in pool.imap(worker, shards):
+            for name, value in shard_stats.items():
+                stats[name] += value
+            if latencies is not None:
+                latencies.extend(shard_latencies)
+            yield from outcomes
+
+
+def detect_objects_in_images(batch_size=None, force=False, backend=None, int8=None, processes=None, threads=None,
+                             model=None):
+    """
+    Run YOLOv8 object detection on downloaded Telegram images
+    and categorize them based on detected objects.
     
-    # Prepare output CSV
+    Results accumulate in data/yolo_detections.csv across runs; only images
+    that are new or changed since their last detection are run through the
+    model, unless force is set. backend and int8 select the inference
+    runtime (see src/yolo_export.py).
+    
+    With processes > 1 the images are sharded across that many processes,
+    each pinned to its own cores with threads intra-op threads; results
+    are merged in image order, so the output does not depend on timing.
+    With YOLO_SERVICE_URL set, images are sent to the resident inference
+    service instead (see src/yolo_service.py).
+    
+    Before inference, images are perceptually hashed; near-duplicates of an
+    image detected in this or an earlier run reuse its detection instead
+    of going through the model (see DEDUP_DISTANCE).
+    
+    With YOLO_TENSOR_CACHE_MB set, letterboxed images are kept in a cache
+    (see src/tensor_cache.py), so repeat runs over the same images, e.g.
+    with force, skip decoding and resizing them. Only detection in this
+    process uses the cache.
+    
+    A loaded model can be passed in (scripts/benchmark_detection.py warms
+    one up first); sharded detection loads its own in every process.
+    Returns a summary of the run: image counts, seconds per stage in
+    'stats' and per-image latencies (see detect_images).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    processes = processes or PROCESSES
+    threads_given = bool(threads or THREADS_PER_PROCESS)
+    threads = threads or THREADS_PER_PROCESS or max(1, (os.cpu_count() or 1) // processes)
+    
+    # A bad rules file fails the run before any inference
+    category_rules()
+    
+    # Prepare output CSV and box store
     output_file = "data/yolo_detections.csv"
+    boxes_file = "data/yolo_boxes.parquet"
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    # Find all downloaded images
-    image_dir = "data/raw/images"
-    image_paths = []
+    # Decode threads read images ahead of the model; stats instrument the pipeline
+    pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+    stats = defaultdict(float)
+    latencies = []
+    
+    # Find all downloaded images through the persisted index (src/image_index.py)
+    start = time.perf_counter()
+    index_stats = {}
+    images = scan_images(IMAGE_DIR, stats=index_stats)
+    image_paths = images['image_path'].tolist()
+    identities = dict(zip(image_paths, zip(images['size'].astype(str), images['mtime_ns'].astype(str))))
+    
+    # Skip images whose size and mtime match their previous detection
+    previous = {} if force else load_previous_detections(output_file)
+    pending = []
+    for img_path in image_paths:
+        row = previous.get(img_path)
+        if row is None or (row.get('image_size'), row.get('image_mtime')) != identities[img_path]:
+            pending.append(img_path)
     
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG']:
-        image_paths.extend(glob.glob(os.path.join(image_dir, '**', ext), recursive=True))
+    stats['discover'] = time.perf_counter() - start
+    image_count = len(image_paths)
     
-    print(f"📸 Found {len(image_paths)} images to process")
+    print(f"📸 Found {len(image_paths)} images ({index_stats['listed']} directories listed, "
+          f"{index_stats['reused']} unchanged), {len(pending)} new or changed to process (batch size {batch_size})")
     
-    # Process each image
+    start = time.perf_counter()
+    
+    # Reposted photos only go through the model once
+    hashes = dict(zip(pending, pool.map(dhash, pending))) if DEDUP_DISTANCE >= 0 else {}
+    image_paths, duplicates = find_duplicates(pending, hashes, previous, DEDUP_DISTANCE)
+    stats['hash'] = time.perf_counter() - start
+    if pending and DEDUP_DISTANCE >= 0:
+        print(f"🔁 {len(duplicates)} of {len(pending)} images are near-duplicates of detected ones "
+              f"({len(duplicates) / len(pending):.0%} hit rate), {len(image_paths)} to detect")
+    
+    # Initialize YOLO model, only when there is something to detect
+    if image_paths and processes <= 1 and not SERVICE_URL and model is None:
+        if threads_given:
+            import torch
+            torch.set_num_threads(threads)
+        print("🚀 Loading YOLOv8 model...")
+        model = load_model(backend, int8)  # Nano model, optionally exported for CPU
+    
+    # Same-sized images are letterboxed to a tight rectangle; mixed batches
+    # would all be padded to a square, so batch images of one size together
+    sizes = dict(zip(image_paths, pool.map(image_size, image_paths)))
+    image_paths.sort(key=sizes.get)
+    
+    # Process images batch by batch, here or sharded across processes
     results = []
+    detected = {}
+    cache = None
     
-    for img_path in image_paths:
-        try:
-            # Extract message_id from filename (format: messageid_timestamp.jpg)
-            filename = os.path.basename(img_path)
-            message_id = filename.split('_')[0]
-            
-            # Get channel name from directory structure
-            channel_name = Path(img_path).parent.name
-            
-            # Run YOLO detection
-            detection_results = model(img_path, verbose=False)[0]
-            
-            # Extract detected objects
-            detected_objects = set()
-            for box in detection_results.boxes:
-                class_id = int(box.cls[0])
-                class_name = detection_results.names[class_id]
-                confidence = float(box.conf[0])
-                
-                if confidence > 0.5:  # Only consider confident detections
-                    detected_objects.add(class_name)
-            
-            # Categorize image based on detected objects
-            image_category = 'other'
-            if 'person' in detected_objects and any(obj in detected_objects for obj in ['bottle', 'container', 'packet', 'box']):
-                image_category = 'promotional'
-            elif any(obj in detected_objects for obj in ['bottle', 'container', 'packet', 'box']):
-                image_category = 'product_display'
-            elif 'person' in detected_objects:
-                image_category = 'lifestyle'
-            
-            # Store results
-            results.append({
-                'message_id': message_id,
-                'channel_name': channel_name,
-                'image_path': img_path,
-                'detected_objects': ', '.join(sorted(detected_objects)),
-                'num_detections': len(detected_objects),
-                'image_category': image_category,
-                'confidence_score': 0.8 if detected_objects else 0.1  # Simplified confidence
-            })
-            
-            print(f"  ✓ Processed: {channel_name}/{filename} -> {image_category} ({len(detected_objects)} objects)")
-            
-        except Exception as e:
-            print(f"  ✗ Error processing {img_path}: {e}")
+    if SERVICE_URL:
+        print(f"🛰️  Sending images to the inference service at {SERVICE_URL}")
+        outcomes = detect_remote(image_paths, SERVICE_URL)
+    elif processes <= 1:
+        cache = TensorCache() if CACHE_MB > 0 and image_paths else None
+        outcomes = detect_images(model, pool, image_paths, batch_size, stats, cache, latencies)
+    else:
+        outcomes = detect_sharded(image_paths, batch_size, backend, int8, processes, threads, stats, latencies)
     
-    # Save results to CSV
+    for img_path, row, error in outcomes:
+        if row is None:
+            print(f"  ✗ Error processing {img_path}: {error}")
+            continue
+        
+        # Store results
+        row['image_size'], row['image_mtime'] = identities[img_path]
+        row['image_phash'] = f"{hashes[img_path]:016x}" if hashes.get(img_path) is not None else ''
+        results.append(row)
+        detected[img_path] = row
+        
+        print(f"  ✓ Processed: {row['channel_name']}/{os.path.basename(img_path)} -> "
+              f"{row['image_category']} ({row['num_detections']} objects)")
+    
+    pool.shutdown()
+    
+    if cache is not None:
+        cache_stats = cache.close()
+        print(f"🗃️  Tensor cache: {cache_stats['hits']} hits, {cache_stats['stored']} stored, "
+              f"{cache_stats['skipped']} over budget, {cache_stats['evicted_shards']} shards evicted "
+              f"({cache_stats['entries']} images, {cache_stats['size_mb']:,.0f} of {CACHE_MB} MB)")
+    
+    # Copy detections to the near-duplicates; boxes of sources detected in
+    # earlier runs come from the box store
+    earlier_boxes = load_boxes(boxes_file, {source for source in duplicates.values() if source not in detected})
+    for img_path, source in duplicates.items():
+        if source in detected:
+            row = reuse_detection(img_path, detected[source], detected[source]['boxes'])
+        elif source in previous:
+            row = reuse_detection(img_path, previous[source], earlier_boxes[source])
+        else:
+            print(f"  ✗ Error processing {img_path}: detection of its duplicate {source} failed")
+            continue
+        
+        row['image_size'], row['image_mtime'] = identities[img_path]
+        row['image_phash'] = f"{hashes[img_path]:016x}"
+        results.append(row)
+    
+    if image_paths:
+        elapsed = time.perf_counter() - start
+        print(f"\n⏱️  {len(pending) / elapsed:.1f} images/s over {elapsed:.1f}s | "
+              f"inference {stats['inference']:.1f}s, stalled on decode {stats['stall']:.1f}s "
+              f"({stats['stall'] / elapsed:.0%}), decode {stats['decode']:.1f}s across "
+              f"{DECODE_WORKERS} threads, avg ready queue {stats['queue_depth'] / max(stats['queue_samples'], 1):.1f}"
+              + (f" | {processes} processes x {threads} threads" if processes > 1 else ""))
+    
+    # Merge new results into the earlier ones and save them to CSV; the CSV
+    # is read again, as streaming detection may have added rows meanwhile
     if results:
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['message_id', 'channel_name', 'image_path', 'detected_objects', 
-                         'num_detections', 'image_category', 'confidence_score']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(results)
+        write_start = time.perf_counter()
+        with detections_lock(output_file):
+            detections = {} if force else load_previous_detections(output_file)
+            detections.update((result['image_path'], result) for result in results)
+            save_detections(output_file, detections.values())
+            box_count = save_boxes(boxes_file, results, keep_previous=not force)
+        stats['write'] = time.perf_counter() - write_start
         
-        print(f"\n✅ Saved {len(results)} detections to {output_file}")
+        print(f"\n✅ Saved {len(results)} new detections to {output_file} ({len(detections)} total)")
+        print(f"📦 Saved {box_count} boxes to {boxes_file}")
         
         # Print summary
         categories_count = {}
@@ -107,8 +727,21 @@ def detect_objects_in_images():
         for category, count in categories_count.items():
             print(f"  {category}: {count} images")
     
+    elif not pending:
+        print("✅ No new images to process")
+    
     else:
         print("⚠️ No images were processed successfully")
+    
+    return {
+        'images': image_count,
+        'pending': len(pending),
+        'detected': len(detected),
+        'duplicates': len(results) - len(detected),
+        'failed': len(pending) - len(results),
+        'stats': dict(stats),
+        'latencies': latencies,
+    }
 
 if __name__ == "__main__":
-    detect_objects_in_images()
\ No newline at end of file
+    detect_objects_in_images()
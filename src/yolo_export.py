@@ -0,0 +1,172 @@
+"""
+Optimized CPU inference backends for the YOLO detector.
+
+The stock PyTorch weights are exported once to ONNX Runtime or OpenVINO and
+the artifact is cached next to the weights, so later runs load it directly.
+The ONNX export can also be int8-quantized, calibrated on images from the
+archive itself.
+"""
+
+import os
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+from ultralytics import YOLO
+import cv2
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.image_index import list_images
+
+try:
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+except ImportError:  # Only needed for int8 quantization
+    onnx = None
+    CalibrationDataReader = object
+
+# Backends load_model understands, and the ultralytics export format of each
+BACKENDS = {'pytorch': None, 'onnx': 'onnx', 'openvino': 'openvino'}
+
+# Defaults for load_model, overridable per call
+WEIGHTS = os.getenv('YOLO_WEIGHTS', 'yolov8n.pt')
+BACKEND = os.getenv('YOLO_BACKEND', 'pytorch')
+INT8 = os.getenv('YOLO_INT8', 'false').lower() in ('1', 'true', 'yes')
+
+# Images sampled from the archive to calibrate int8 activation ranges
+CALIBRATION_IMAGES = int(os.getenv('YOLO_CALIBRATION_IMAGES', 64))
+IMAGE_SIZE = 640
+
+
+def exported_path(weights, backend, int8=False):
+    """Path of the cached artifact for a backend, next to the weights."""
+    weights = Path(weights)
+    if backend == 'onnx':
+        return weights.with_name(f"{weights.stem}{'_int8' if int8 else ''}.onnx")
+    return weights.with_name(f"{weights.stem}_openvino_model")
+
+
+def is_fresh(artifact, weights):
+    """
+    Check a cached artifact exists and was built from the current weights.
+
+    Deploys may ship only the exported artifact; without the weights it is
+    used as it is.
+    """
+    if not artifact.exists():
+        return False
+    weights = Path(weights)
+    return not weights.exists() or artifact.stat().st_mtime >= weights.stat().st_mtime
+
+
+def export_model(weights, backend):
+    """Export the weights to a backend format unless a fresh export is cached."""
+    artifact = exported_path(weights, backend)
+    if is_fresh(artifact, weights):
+        return artifact
+
+    print(f"📦 Exporting {weights} to {backend} (one-off)...")
+    # Dynamic shapes keep batched, tightly letterboxed inputs working
+    exported = YOLO(str(weights)).export(format=BACKENDS[backend], dynamic=True, imgsz=IMAGE_SIZE)
+    return Path(exported)
+
+
+class ArchiveCalibrationReader(CalibrationDataReader):
+    """Feed letterboxed archive images to the ONNX Runtime calibrator."""
+
+    def __init__(self, input_name, image_paths):
+        self.input_name = input_name
+        self.image_paths = iter(image_paths)
+
+    def get_next(self):
+        for img_path in self.image_paths:
+            image = cv2.imread(img_path)
+            if image is not None:
+                return {self.input_name: preprocess(image)}
+        return None
+
+
+def preprocess(image):
+    """Letterbox a BGR image to a 640x640 float32 NCHW tensor, as the exporter expects."""
+    height, width = image.shape[:2]
+    scale = IMAGE_SIZE / max(height, width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((IMAGE_SIZE, IMAGE_SIZE, 3), 114, dtype=np.uint8)
+    top = (IMAGE_SIZE - resized.shape[0]) // 2
+    left = (IMAGE_SIZE - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[None]  # BGR HWC -> RGB NCHW
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+
+def quantize_onnx(weights, calibration_dir):
+    """
+    Build an int8 ONNX model from the float export, unless a fresh one is cached.
+
+    Activation ranges are calibrated on a sample of the archive. Box decoding
+    in the detection head stays in float: it loses too much accuracy in int8.
+    """
+    if onnx is None:
+        raise ImportError("int8 quantization requires onnx and onnxruntime: pip install onnx onnxruntime")
+
+    artifact = exported_path(weights, 'onnx', int8=True)
+    if is_fresh(artifact, weights):
+        return artifact
+
+    float_model = export_model(weights, 'onnx')
+    graph = onnx.load(str(float_model)).graph
+
+    # The Detect head is the last '/model.N/' block; its conv branches (cv2,
+    # cv3) are quantized, the DFL and box decoding after them are not
+    blocks = {node.name.split('/')[1] for node in graph.node if node.name.startswith('/model.')}
+    head = f"/model.{max(int(block.split('.')[1]) for block in blocks)}/"
+    nodes_to_exclude = [
+        node.name for node in graph.node
+        if node.name.startswith(head) and not node.name.startswith((head + 'cv2.', head + 'cv3.'))
+    ]
+
+    image_paths = list_images(calibration_dir)
+    if not image_paths:
+        raise ValueError(f"No calibration images found under {calibration_dir}")
+    sample = random.Random(0).sample(sorted(image_paths), min(CALIBRATION_IMAGES, len(image_paths)))
+
+    print(f"🧮 Quantizing {float_model} to int8, calibrating on {len(sample)} images...")
+    quantize_static(
+        str(float_model),
+        str(artifact),
+        ArchiveCalibrationReader(graph.input[0].name, sample),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        nodes_to_exclude=nodes_to_exclude,
+    )
+    return artifact
+
+
+def load_model(backend=None, int8=None, weights=None, calibration_dir='data/raw/images'):
+    """
+    Load the detector for a backend: 'pytorch', 'onnx' or 'openvino'.
+
+    Non-PyTorch backends are exported on first use and cached; int8 is
+    supported for the onnx backend.
+    """
+    backend = backend or BACKEND
+    int8 = INT8 if int8 is None else int8
+    weights = weights or WEIGHTS
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown YOLO backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if int8 and backend != 'onnx':
+        raise ValueError("int8 quantization is supported for the onnx backend only")
+
+    if backend == 'pytorch':
+        return YOLO(weights)
+
+    artifact = quantize_onnx(weights, calibration_dir) if int8 else export_model(weights, backend)
+    return YOLO(str(artifact), task='detect')
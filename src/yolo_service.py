@@ -0,0 +1,214 @@
+"""
+Resident YOLO inference service.
+
+Keeps the detector loaded in one long-lived process and serves detections over
+localhost HTTP, so the scraper, the pipeline and the API do not each pay the
+model startup. Concurrent requests are coalesced into micro-batches: after the
+first image is queued the batcher waits at most MAX_WAIT_MS for others to join,
+up to BATCH_SIZE images per forward pass.
+
+    python src/yolo_service.py
+    YOLO_SERVICE_URL=http://127.0.0.1:8001 python src/yolo_detect.py
+"""
+
+import asyncio
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import List
+
+import cv2
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.yolo_detect import BATCH_SIZE, category_rules, detect_batch, detection_row
+from src.yolo_export import load_model
+
+# Localhost only: the service reads image paths from the local disk
+SERVICE_HOST = os.getenv('YOLO_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('YOLO_SERVICE_PORT', 8001))
+
+# Longest an image waits for a batch to fill before it is run anyway
+MAX_WAIT_MS = float(os.getenv('YOLO_SERVICE_MAX_WAIT_MS', 10))
+
+# Recent requests the latency percentiles are computed over
+METRICS_WINDOW = 1000
+
+
+class MicroBatcher:
+    """
+    Run queued images through the model in micro-batches on one thread.
+
+    submit() returns a Future that resolves to the detection row of the
+    image; the batch is run once it is full or its oldest image has waited
+    max_wait seconds.
+    """
+
+    def __init__(self, model, batch_size=BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+
+        self.lock = threading.Lock()
+        self.counters = {'images': 0, 'failed': 0, 'batches': 0, 'inference_seconds': 0.0}
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+        self.queue_waits = deque(maxlen=METRICS_WINDOW)
+
+        self.thread = threading.Thread(target=self._run, name='yolo-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, img_path, image):
+        """Queue a decoded image (None if unreadable) for detection."""
+        future = Future()
+        self.queue.put((img_path, image, future, time.perf_counter()))
+        return future
+
+    def _next_batch(self):
+        """
+        Block for the first image, then gather more until the batch is full.
+
+        Images already queued are always taken; the batcher only waits for
+        new ones until the oldest image has waited max_wait.
+        """
+        batch = [self.queue.get()]
+        deadline = batch[0][3] + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+
+            # Outcomes are keyed by position: requests in one batch can share a path
+            try:
+                detections, failed = detect_batch(self.model, [(i, image) for i, (_, image, _, _) in enumerate(batch)])
+                outcomes = [(None, "no detection result")] * len(batch)
+                for i, error in failed:
+                    outcomes[i] = (None, error)
+                for i, detection_results in detections:
+                    outcomes[i] = (detection_row(batch[i][0], detection_results), None)
+            except Exception as e:
+                outcomes = [(None, e)] * len(batch)
+
+            finished = time.perf_counter()
+            with self.lock:
+                self.counters['batches'] += 1
+                self.counters['inference_seconds'] += finished - started
+                for (_, _, _, enqueued), (row, _) in zip(batch, outcomes):
+                    self.counters['images'] += 1
+                    self.counters['failed'] += row is None
+                    self.queue_waits.append(started - enqueued)
+                    self.latencies.append(finished - enqueued)
+
+            for (_, _, future, _), (row, error) in zip(batch, outcomes):
+                if row is None:
+                    future.set_exception(ValueError(str(error)))
+                else:
+                    future.set_result(row)
+
+    def metrics(self):
+        """Queue depth, batching and latency counters of the service."""
+        def percentiles(values):
+            values = sorted(values)
+            if not values:
+                return {'p50': None, 'p95': None, 'p99': None}
+            return {f"p{q}": round(values[int(q / 100 * (len(values) - 1))] * 1000, 2) for q in (50, 95, 99)}
+
+        with self.lock:
+            counters = dict(self.counters)
+            latencies, queue_waits = list(self.latencies), list(self.queue_waits)
+
+        return {
+            **counters,
+            'queue_depth': self.queue.qsize(),
+            'mean_batch_size': round(counters['images'] / counters['batches'], 2) if counters['batches'] else None,
+            'batch_size': self.batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'latency_ms': percentiles(latencies),
+            'queue_wait_ms': percentiles(queue_waits),
+            'mean_latency_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        }
+
+
+class DetectRequest(BaseModel):
+    image_paths: List[str]
+
+
+async def detect(batcher, img_path, image):
+    """Detect one decoded image; returns a result entry with the row or the error."""
+    try:
+        row = await asyncio.wrap_future(batcher.submit(img_path, image))
+        return {'image_path': img_path, 'row': row, 'error': None}
+    except Exception as e:
+        return {'image_path': img_path, 'row': None, 'error': str(e)}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load the model once, when the service starts."""
+    category_rules()
+    print("🚀 Loading YOLOv8 model...")
+    app.state.batcher = MicroBatcher(load_model())
+    app.state.started = time.time()
+    print(f"✅ YOLO service ready (batch size {BATCH_SIZE}, max wait {MAX_WAIT_MS:g} ms)")
+    yield
+
+
+app = FastAPI(title="YOLO Inference Service", lifespan=lifespan)
+
+
+@app.get("/health")
+def health():
+    return {"status": "healthy", "uptime_seconds": round(time.time() - app.state.started, 1)}
+
+
+@app.get("/metrics")
+def metrics():
+    return app.state.batcher.metrics()
+
+
+@app.post("/detect")
+async def detect_paths(request: DetectRequest):
+    """Detect objects in images on the local disk; results come back in request order."""
+    # Decoding runs on worker threads so the event loop keeps accepting requests
+    images = await asyncio.gather(*(asyncio.to_thread(cv2.imread, path) for path in request.image_paths))
+    results = await asyncio.gather(*(
+        detect(app.state.batcher, path, image) for path, image in zip(request.image_paths, images)
+    ))
+    return {"results": results}
+
+
+@app.post("/detect/image")
+async def detect_image(request: Request, name: str = "upload.jpg"):
+    """Detect objects in an encoded image sent as the request body."""
+    data = await request.body()
+    image = await asyncio.to_thread(cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPException(status_code=400, detail="Body is not a readable image")
+
+    result = await detect(app.state.batcher, name, image)
+    if result['error']:
+        raise HTTPException(status_code=500, detail=result['error'])
+    return result['row']
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
@@ -0,0 +1,244 @@
+"""
+Streaming YOLO detection for freshly downloaded images.
+
+The scraper hands each image to a StreamingDetector as soon as it is
+downloaded, together with the bytes it already holds in memory. A background
+thread decodes and detects the images in micro-batches and adds their rows
+to data/yolo_detections.csv right away, so detection keeps pace with the
+scrape and no image is read back from disk.
+
+Batch runs of yolo_detect.py replace the same CSV, so every write happens
+under detections_lock and reopens the file. New images are appended; an
+image already in the file (a re-scraped day) replaces its row instead.
+
+Rows carry channel_id and message_id, and the file identity and perceptual
+hash that yolo_detect.py uses, so a later batch run skips these images.
+"""
+
+import csv
+import io
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Add the parent directory to sys.path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.phash import dhash
+from src.yolo_detect import (BATCH_SIZE, FIELDNAMES, category_rules, detect_batch,
+                             detection_row, detections_lock, image_identity,
+                             load_previous_detections, save_boxes, save_detections)
+from src.yolo_export import load_model
+
+# Longest a downloaded image waits for more to fill its batch
+STREAM_MAX_WAIT = float(os.getenv('YOLO_STREAM_MAX_WAIT_MS', 200)) / 1000
+
+# Downloaded images waiting for detection. When the detector falls behind,
+# submit() blocks the scraper instead of holding every image in memory
+STREAM_QUEUE_SIZE = int(os.getenv('YOLO_STREAM_QUEUE_SIZE', 256))
+
+# Detected rows whose boxes are held before they are merged into the box store
+BOX_FLUSH_ROWS = 500
+
+
+def decode_image(data):
+    """Decode encoded image bytes; None when they are not an image."""
+    try:
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    except cv2.error:
+        return None
+
+
+class StreamingDetector:
+    """
+    Detect images pushed by the scraper on a background thread.
+
+    submit() only blocks the caller while queue_size images are waiting;
+    close() waits for the queued images, merges the remaining boxes and
+    returns the counters. A batch that fails is logged and counted, and the
+    thread goes on with the next one.
+    """
+
+    def __init__(self, output_file='data/yolo_detections.csv', boxes_file='data/yolo_boxes.parquet',
+                 batch_size=BATCH_SIZE, max_wait=STREAM_MAX_WAIT, model=None, queue_size=STREAM_QUEUE_SIZE):
+        self.output_file = output_file
+        self.boxes_file = boxes_file
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        category_rules()
+        self.model = model or load_model()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closing = False
+        self.pending_boxes = []
+        self.stats = {'submitted': 0, 'detected': 0, 'failed': 0, 'batches': 0, 'latency_seconds': 0.0}
+
+        # Paths in the CSV, valid while the file is the one last written here
+        self.known_paths = set()
+        self.file_state = None
+
+        self._prepare_output()
+        self.thread = threading.Thread(target=self._run, name='yolo-stream', daemon=True)
+        self.thread.start()
+
+    def _prepare_output(self):
+        """Upgrade a detections CSV with an older header to the current columns."""
+        with detections_lock(self.output_file):
+            if not os.path.exists(self.output_file):
+                return
+            with open(self.output_file, newline='', encoding='utf-8') as csvfile:
+                header = next(csv.reader(csvfile), None)
+            if header != FIELDNAMES:
+                save_detections(self.output_file, load_previous_detections(self.output_file).values())
+
+    def _write_rows(self, rows):
+        """
+        Add detected rows to the CSV, under the lock and through a fresh handle.
+
+        Rows of new images are appended. When an image is already in the
+        file, the file is rewritten with its row replaced, so each image
+        keeps one row.
+        """
+        rows = {row['image_path']: row for row in rows}
+        with detections_lock(self.output_file):
+            try:
+                stat = os.stat(self.output_file)
+                state = (stat.st_ino, stat.st_size)
+            except FileNotFoundError:
+                state = None
+
+            # Another writer replaced or extended the file since it was last seen
+            if state != self.file_state:
+                self.known_paths = set(load_previous_detections(self.output_file))
+
+            if self.known_paths.isdisjoint(rows):
+                with open(self.output_file, 'a', newline='', encoding='utf-8') as csvfile:
+                    writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
+                    if state is None or state[1] == 0:
+                        writer.writeheader()
+                    writer.writerows(rows.values())
+            else:
+                detections = load_previous_detections(self.output_file)
+                detections.update(rows)
+                save_detections(self.output_file, detections.values())
+
+            self.known_paths.update(rows)
+            stat = os.stat(self.output_file)
+            self.file_state = (stat.st_ino, stat.st_size)
+
+    def submit(self, img_path, data, channel_id, message_id):
+        """Queue an image that was just written to img_path, with its encoded bytes; blocks while the queue is full."""
+        self.stats['submitted'] += 1
+        self.queue.put((img_path, data, channel_id, message_id, time.perf_counter()))
+
+    def _next_batch(self):
+        """Block for the first image, then gather more until full or its wait runs out."""
+        first = None if self.closing else self.queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = first[4] + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self.closing = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # One bad batch must not end the thread: its images are counted as
+            # failed and the scrape keeps being detected
+            try:
+                self._detect(batch)
+            except Exception as e:
+                print(f"  ✗ Error processing a batch of {len(batch)} images: {e}")
+                self.stats['failed'] += len(batch)
+            self.stats['batches'] += 1
+
+    def _detect(self, batch):
+        """Detect one batch and write its rows; stats are only updated once the rows are written."""
+        images = [(img_path, decode_image(data)) for img_path, data, _, _, _ in batch]
+        try:
+            detections, failed = detect_batch(self.model, images)
+        except Exception as e:
+            detections, failed = [], [(img_path, e) for img_path, _ in images]
+
+        results = dict(detections)
+        finished = time.perf_counter()
+        rows = []
+        latency = 0.0
+        for img_path, data, channel_id, message_id, submitted in batch:
+            if img_path not in results:
+                continue
+
+            try:
+                row = detection_row(img_path, results[img_path])
+                phash = dhash(io.BytesIO(data))
+                row.update(
+                    channel_id=channel_id,
+                    message_id=message_id,
+                    image_phash=f"{phash:016x}" if phash is not None else ''
+                )
+                row['image_size'], row['image_mtime'] = image_identity(img_path)
+            except Exception as e:
+                failed.append((img_path, e))
+                continue
+            rows.append(row)
+            latency += finished - submitted
+
+        for img_path, error in failed:
+            print(f"  ✗ Error processing {img_path}: {error}")
+        self.stats['failed'] += len(failed)
+
+        # Rows are on disk as soon as their batch is done
+        if rows:
+            try:
+                self._write_rows(rows)
+            except Exception as e:
+                print(f"  ✗ Error writing {len(rows)} detections to {self.output_file}: {e}")
+                self.stats['failed'] += len(rows)
+                return
+        self.pending_boxes.extend(rows)
+        self.stats['detected'] += len(rows)
+        self.stats['latency_seconds'] += latency
+
+        if len(self.pending_boxes) >= BOX_FLUSH_ROWS:
+            try:
+                self._flush_boxes()
+            except Exception as e:
+                # The boxes stay pending and go out with the next flush
+                print(f"  ✗ Error saving boxes to {self.boxes_file}: {e}")
+
+    def _flush_boxes(self):
+        """Merge the boxes of rows detected so far into the box store."""
+        if self.pending_boxes:
+            with detections_lock(self.output_file):
+                save_boxes(self.boxes_file, self.pending_boxes)
+            self.pending_boxes = []
+
+    def close(self):
+        """Wait for queued images to be detected and write out what is left."""
+        self.queue.put(None)
+        self.thread.join()
+        self._flush_boxes()
+
+        stats = dict(self.stats)
+        stats['mean_latency_seconds'] = stats['latency_seconds'] / stats['detected'] if stats['detected'] else 0.0
+        return stats
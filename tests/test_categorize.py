@@ -0,0 +1,30 @@
+"""Tests for category rules validation."""
+
+import json
+
+import pytest
+
+from src.categorize import category_column, load_rules
+
+
+def write_rules(tmp_path, version):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'version': version, 'default': 'other',
+                                'rules': [{'category': 'people', 'all': [{'classes': ['person']}]}]}))
+    return path
+
+
+@pytest.mark.parametrize('version, column', [(2, 'image_category_v2'), ('2_1', 'image_category_v2_1'),
+                                             ('beta', 'image_category_vbeta')])
+def test_version_names_the_category_column(tmp_path, version, column):
+    assert category_column(load_rules(write_rules(tmp_path, version))) == column
+
+
+@pytest.mark.parametrize('version', ['2.1', '1; DROP TABLE raw.yolo_detections', '', 'v 2', True, None])
+def test_version_that_is_not_an_identifier_is_rejected(tmp_path, version):
+    with pytest.raises(ValueError, match='version'):
+        load_rules(write_rules(tmp_path, version))
+
+
+def test_bundled_rules_are_valid():
+    assert load_rules()['rules']
@@ -0,0 +1,72 @@
+"""Tests for the persisted, incremental image index."""
+
+import os
+
+from src.image_index import INDEX_DIRNAME, scan_images
+
+OLD_NS = 1_600_000_000 * 10 ** 9
+
+
+def make_tree(tmp_path):
+    """An image directory with two channels, all mtimes old enough to be trusted."""
+    image_dir = tmp_path / 'images'
+    for channel, names in {'chemed': ['1_a.jpg', '2_b.jpg'], 'lobelia': ['7_c.png']}.items():
+        (image_dir / channel).mkdir(parents=True)
+        for name in names:
+            (image_dir / channel / name).write_bytes(b'x' * 10)
+    age(image_dir)
+    return image_dir
+
+
+def age(image_dir):
+    for root, _, _ in os.walk(image_dir):
+        os.utime(root, ns=(OLD_NS, OLD_NS))
+
+
+def test_unchanged_directories_are_reused(tmp_path):
+    image_dir = make_tree(tmp_path)
+    first = scan_images(str(image_dir))
+    age(image_dir)  # creating the index touched the root directory
+    stats = {}
+    second = scan_images(str(image_dir), stats=stats)
+
+    assert stats == {'listed': 0, 'reused': 3, 'changed': 0}
+    assert second.equals(first)
+    assert second['message_id'].tolist() == [1, 2, 7]
+
+
+def test_file_rewritten_in_place_gets_its_new_identity(tmp_path):
+    image_dir = make_tree(tmp_path)
+    scan_images(str(image_dir))
+    age(image_dir)
+
+    # Downloading an image again overwrites it without touching its directory
+    image = image_dir / 'chemed' / '1_a.jpg'
+    image.write_bytes(b'y' * 25)
+    age(image_dir)
+
+    stats = {}
+    images = scan_images(str(image_dir), stats=stats).set_index('image_path')
+    assert stats['listed'] == 0 and stats['changed'] == 1
+    assert images.loc[str(image), 'size'] == 25
+    assert images.loc[str(image), 'mtime_ns'] == image.stat().st_mtime_ns
+
+
+def test_new_file_lists_its_directory_again(tmp_path):
+    image_dir = make_tree(tmp_path)
+    scan_images(str(image_dir))
+    age(image_dir)
+    (image_dir / 'lobelia' / '8_d.jpg').write_bytes(b'z')
+
+    stats = {}
+    images = scan_images(str(image_dir), stats=stats)
+    assert stats['listed'] == 1
+    assert str(image_dir / 'lobelia' / '8_d.jpg') in images['image_path'].tolist()
+
+
+def test_scan_without_save_writes_nothing(tmp_path):
+    image_dir = make_tree(tmp_path)
+    images = scan_images(str(image_dir), save=False)
+
+    assert len(images) == 3
+    assert not (image_dir / INDEX_DIRNAME).exists()
@@ -0,0 +1,66 @@
+"""Tests for the loader: parallel message parsing and the DuckDB lake views."""
+
+import json
+import os
+
+import pytest
+
+import src.load_to_db as load_to_db
+from src.load_to_db import DataLoader
+
+
+def write_messages(path, count):
+    path.write_text(json.dumps([
+        {'message_id': i, 'channel_id': 1, 'channel_name': 'chemed', 'message_text': f"message {i}",
+         'message_date': '2026-01-05T10:00:00+00:00'}
+        for i in range(count)
+    ]))
+    return path
+
+
+@pytest.fixture
+def loader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return DataLoader(use_sqlite=True, workers=2, batch_size=10)
+
+
+def test_parallel_parse_yields_every_batch(tmp_path, loader):
+    files = [write_messages(tmp_path / f"{name}.json", 25) for name in ('a', 'b', 'c')]
+
+    batches = list(loader.iter_parsed_batches(files))
+
+    assert len(batches) == 9
+    assert sum(len(batch['message_id']) for _, batch in batches) == 75
+
+
+def test_dead_parse_worker_fails_the_load(tmp_path, loader, monkeypatch):
+    files = [write_messages(tmp_path / f"{name}.json", 25) for name in ('a', 'poison', 'c')]
+    parse = load_to_db.iter_message_batches
+
+    def killed_on_poison(filepath, *args, **kwargs):
+        if 'poison' in str(filepath):
+            os._exit(1)  # like the OOM killer: no exception, no message
+        return parse(filepath, *args, **kwargs)
+
+    # Forked workers inherit the patched module
+    monkeypatch.setattr(load_to_db, 'iter_message_batches', killed_on_poison)
+
+    with pytest.raises(RuntimeError, match='Parse worker .* died while parsing'):
+        list(loader.iter_parsed_batches(files))
+
+
+def test_duckdb_payload_is_the_scraped_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    records = [
+        {'message_id': 1, 'channel_id': 5, 'message_text': '2026-01-05', 'views': '12',
+         'media': {'caption': 'true', 'taken_at': '2026-01-05T10:00:00+03:00', 'price': '1.50'}},
+        {'message_id': 2, 'channel_id': 5, 'message_text': 'hi é', 'reactions': [1, '2']},
+    ]
+    partition = tmp_path / 'data' / 'raw' / 'telegram_messages' / '2026-01-05'
+    partition.mkdir(parents=True)
+    (partition / 'chemed.json').write_text(json.dumps(records), encoding='utf-8')
+
+    loader = DataLoader(backend='duckdb')
+    loader.create_views()
+
+    assert [loader.get_message_payload(5, message_id) for message_id in (1, 2)] == records
@@ -0,0 +1,112 @@
+"""Tests for perceptual hashing and the BK-tree near-duplicate lookup."""
+
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.phash import BKTree, dhash, hamming
+
+
+def save_image(path, pixels, size=None, quality=95):
+    """Write an RGB array as a JPEG, optionally resized first."""
+    image = Image.fromarray(pixels)
+    if size:
+        image = image.resize(size, Image.BILINEAR)
+    image.save(path, quality=quality)
+    return path
+
+
+@pytest.fixture
+def photo():
+    """A smooth synthetic photo with structure at thumbnail scale."""
+    y, x = np.mgrid[0:240, 0:320]
+    red = 128 + 100 * np.sin(x / 23.0) * np.cos(y / 31.0)
+    green = 128 + 90 * np.cos(x / 41.0 + y / 17.0)
+    blue = (x + y) / 560 * 255
+    return np.stack([red, green, blue], axis=-1).clip(0, 255).astype(np.uint8)
+
+
+def test_hamming_counts_differing_bits():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(0, (1 << 64) - 1) == 64
+
+
+def test_dhash_is_64_bits_and_stable(tmp_path, photo):
+    path = save_image(tmp_path / 'a.jpg', photo)
+    value = dhash(path)
+    assert 0 <= value < 1 << 64
+    assert dhash(path) == value
+
+
+def test_dhash_of_resized_recompressed_copy_is_close(tmp_path, photo):
+    original = dhash(save_image(tmp_path / 'a.jpg', photo))
+    copy = dhash(save_image(tmp_path / 'b.jpg', photo, size=(160, 120), quality=60))
+    assert hamming(original, copy) <= 4
+
+
+def test_dhash_of_different_images_is_far(tmp_path, photo):
+    original = dhash(save_image(tmp_path / 'a.jpg', photo))
+    flipped = dhash(save_image(tmp_path / 'b.jpg', photo[:, ::-1].copy()))
+    noise = np.random.default_rng(0).integers(0, 256, photo.shape, dtype=np.uint8)
+    other = dhash(save_image(tmp_path / 'c.jpg', noise))
+    assert hamming(original, flipped) > 10
+    assert hamming(original, other) > 10
+
+
+def test_dhash_of_unreadable_file_is_none(tmp_path):
+    path = tmp_path / 'broken.jpg'
+    path.write_bytes(b'not a jpeg')
+    assert dhash(path) is None
+    assert dhash(tmp_path / 'missing.jpg') is None
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    # Near copies of some stored hashes, a few bits apart
+    for value in values[:50]:
+        for bit in rng.sample(range(64), rng.randint(1, 6)):
+            value ^= 1 << bit
+        values.append(value)
+
+    tree = BKTree()
+    for index, value in enumerate(values):
+        tree.add(value, index)
+    assert tree.size == len(values)
+
+    for query in values[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        for radius in (0, 2, 4, 8):
+            expected = {index for index, value in enumerate(values) if hamming(query, value) <= radius}
+            found = {item for _, _, item in tree.search(query, radius)}
+            assert found == expected
+
+
+def test_bktree_search_radius_is_inclusive():
+    tree = BKTree()
+    tree.add(0, 'zero')
+    tree.add(0b1111, 'four bits')
+    tree.add(0b11111, 'five bits')
+
+    assert {item for _, _, item in tree.search(0, 4)} == {'zero', 'four bits'}
+    assert sorted(distance for distance, _, _ in tree.search(0, 5)) == [0, 4, 5]
+
+
+def test_bktree_nearest_picks_closest_within_radius():
+    tree = BKTree()
+    tree.add(0b0000, 'a')
+    tree.add(0b0111, 'b')
+
+    assert tree.nearest(0b0110, 4) == 'b'
+    assert tree.nearest(0b0001, 4) == 'a'
+    assert tree.nearest(0b0001, 0) is None
+    assert BKTree().nearest(0, 64) is None
+
+
+def test_bktree_keeps_items_with_equal_hashes():
+    tree = BKTree()
+    tree.add(42, 'first')
+    tree.add(42, 'second')
+    assert {item for _, _, item in tree.search(42, 0)} == {'first', 'second'}
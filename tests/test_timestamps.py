@@ -0,0 +1,36 @@
+"""Tests for column-wise timestamp parsing."""
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import src.timestamps as timestamps
+from src.timestamps import parse_datetime, parse_datetime_column
+
+MIXED_OFFSETS = ['2026-01-05T10:00:00+03:00', '2026-01-05T10:00:00+00:00', None, '2026-01-05T10:00:00+03:00']
+
+
+def test_column_matches_value_by_value_parsing():
+    values = ['2026-01-05T10:00:00', '2026-01-05T10:00:01.250000', '', None, 'not a date', '2026-01-05T10:00:00']
+    assert parse_datetime_column(values) == [parse_datetime(value) for value in values]
+
+
+def test_uniform_offset_column():
+    parsed = parse_datetime_column(['2026-01-05T10:00:00+03:00', '2026-01-06T11:30:00+03:00'])
+    assert parsed == [datetime(2026, 1, 5, 10, tzinfo=timezone(timedelta(hours=3))),
+                      datetime(2026, 1, 6, 11, 30, tzinfo=timezone(timedelta(hours=3)))]
+
+
+def test_mixed_offsets_keep_each_value_offset():
+    parsed = parse_datetime_column(MIXED_OFFSETS)
+    assert parsed == [parse_datetime(value) for value in MIXED_OFFSETS]
+    assert [value.utcoffset() for value in parsed if value] == [timedelta(hours=3), timedelta(0), timedelta(hours=3)]
+
+
+def test_mixed_offsets_as_object_column_fall_back(monkeypatch):
+    # pandas 2 returns mixed offsets as an object column of datetimes instead of raising
+    def to_datetime(series, **kwargs):
+        return pd.Series([parse_datetime(value) for value in series], dtype=object)
+    monkeypatch.setattr(timestamps.pd, 'to_datetime', to_datetime)
+
+    assert parse_datetime_column(MIXED_OFFSETS) == [parse_datetime(value) for value in MIXED_OFFSETS]
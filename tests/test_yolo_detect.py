@@ -0,0 +1,33 @@
+"""Tests for batch detection helpers."""
+
+import numpy as np
+from PIL import Image
+
+from src.yolo_detect import reuse_detection
+
+
+def save_image(path, width, height):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(np.full((height, width, 3), 200, dtype=np.uint8)).save(path)
+    return str(path)
+
+
+def test_duplicate_from_another_channel_gets_its_own_identity(tmp_path):
+    source = save_image(tmp_path / 'chemed' / '10_a.jpg', 200, 100)
+    duplicate = save_image(tmp_path / 'lobelia' / '77_b.jpg', 100, 50)
+    source_row = {
+        'channel_id': '1001', 'message_id': 10, 'channel_name': 'chemed', 'image_path': source,
+        'detected_objects': 'bottle', 'num_detections': 1, 'image_category': 'product_display',
+        'confidence_score': 0.9, 'image_size': '5000', 'image_mtime': '123', 'image_phash': 'ff',
+        'duplicate_of': '', 'detected_at': '2026-01-05T10:00:00', 'image_width': 200, 'image_height': 100,
+    }
+    boxes = [(39, 'bottle', 0.9, 20.0, 10.0, 120.0, 90.0)]
+
+    row = reuse_detection(duplicate, source_row, boxes)
+
+    assert (row['channel_id'], row['message_id'], row['channel_name']) == ('', 77, 'lobelia')
+    assert (row['image_path'], row['duplicate_of']) == (duplicate, source)
+    assert (row['image_width'], row['image_height']) == (100, 50)
+    assert 'image_size' not in row and 'image_phash' not in row
+    assert (row['detected_objects'], row['image_category'], row['confidence_score']) == ('bottle', 'product_display', 0.9)
+    assert row['boxes'] == [(39, 'bottle', 0.9, 10.0, 5.0, 60.0, 45.0)]
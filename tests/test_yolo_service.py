@@ -0,0 +1,103 @@
+"""Tests for the micro-batching YOLO inference service."""
+
+import asyncio
+import time
+
+import cv2
+import httpx
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from src import yolo_service
+from src.yolo_service import MicroBatcher
+
+NAMES = {0: 'person', 39: 'bottle'}
+
+
+class FakeModel:
+    """
+    Stands in for YOLO: finds one bottle per image, as wide as the image.
+
+    Images of different widths therefore get different rows, and every
+    forward pass is recorded.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, **kwargs):
+        self.calls.append(len(images))
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            boxes = torch.tensor([[0.0, 0.0, float(width), float(height), 0.9, 39.0]])
+            results.append(Results(image, path='', names=NAMES, boxes=boxes))
+        return results
+
+
+def blank_image(width, height=32):
+    return np.full((height, width, 3), 200, dtype=np.uint8)
+
+
+@pytest.fixture
+def batcher():
+    # A long wait, so images submitted together always share a batch
+    return MicroBatcher(FakeModel(), batch_size=8, max_wait=0.5)
+
+
+def test_same_path_in_one_batch_gets_its_own_row(batcher):
+    futures = [batcher.submit('upload.jpg', blank_image(width)) for width in (40, 64, 96)]
+    rows = [future.result(timeout=10) for future in futures]
+
+    assert batcher.model.calls == [3]
+    assert [row['image_width'] for row in rows] == [40, 64, 96]
+    assert [row['boxes'][0][5] for row in rows] == [40.0, 64.0, 96.0]
+    assert all(row['image_path'] == 'upload.jpg' for row in rows)
+
+
+def test_unreadable_image_fails_only_its_own_request(batcher):
+    good = batcher.submit('same.jpg', blank_image(48))
+    bad = batcher.submit('same.jpg', None)
+
+    assert good.result(timeout=10)['image_width'] == 48
+    with pytest.raises(ValueError, match='could not read image'):
+        bad.result(timeout=10)
+    assert batcher.metrics()['failed'] == 1
+
+
+def test_model_error_fails_every_request_of_the_batch(batcher):
+    def broken(images, **kwargs):
+        raise RuntimeError('out of memory')
+    batcher.model = broken
+
+    futures = [batcher.submit('a.jpg', blank_image(32)), batcher.submit('b.jpg', blank_image(32))]
+    for future in futures:
+        with pytest.raises(ValueError, match='out of memory'):
+            future.result(timeout=10)
+
+
+def test_batch_runs_after_max_wait():
+    batcher = MicroBatcher(FakeModel(), batch_size=8, max_wait=0.05)
+    started = time.perf_counter()
+    batcher.submit('a.jpg', blank_image(32)).result(timeout=10)
+
+    assert batcher.model.calls == [1]
+    assert time.perf_counter() - started < 5
+
+
+def test_concurrent_uploads_with_default_name_get_their_own_rows(batcher):
+    yolo_service.app.state.batcher = batcher
+    uploads = [cv2.imencode('.png', blank_image(width))[1].tobytes() for width in (40, 64, 96)]
+
+    async def post_all():
+        transport = httpx.ASGITransport(app=yolo_service.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(*(client.post('/detect/image', content=body) for body in uploads))
+
+    responses = asyncio.run(post_all())
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert [response.json()['image_width'] for response in responses] == [40, 64, 96]
+    assert batcher.model.calls == [3]
@@ -0,0 +1,144 @@
+"""Tests for the streaming detector: its writes to the detections CSV and its failures."""
+
+import csv
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from src.yolo_detect import detections_lock, load_previous_detections, save_detections
+from src.yolo_stream import StreamingDetector
+
+
+class FakeModel:
+    """Stands in for YOLO: finds one bottle per image, as wide as the image."""
+
+    def __call__(self, images, **kwargs):
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            boxes = torch.tensor([[0.0, 0.0, float(width), float(height), 0.9, 39.0]])
+            results.append(Results(image, path='', names={39: 'bottle'}, boxes=boxes))
+        return results
+
+
+def write_image(path, width):
+    """Write a blank JPEG and return its encoded bytes, as the scraper holds them."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = cv2.imencode('.jpg', np.full((32, width, 3), 200, dtype=np.uint8))[1].tobytes()
+    path.write_bytes(data)
+    return data
+
+
+def stream(detector, images):
+    for message_id, (path, width) in enumerate(images, 1):
+        detector.submit(str(path), write_image(path, width), 1, message_id)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def csv_rows(output_file):
+    with open(output_file, newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def make_detector(tmp_path, **kwargs):
+    return StreamingDetector(output_file=str(tmp_path / 'yolo_detections.csv'),
+                             boxes_file=str(tmp_path / 'yolo_boxes.parquet'),
+                             batch_size=2, max_wait=0.01, model=FakeModel(), **kwargs)
+
+
+def test_rows_survive_a_batch_run_replacing_the_csv(tmp_path):
+    images = tmp_path / 'images' / 'channel'
+    detector = make_detector(tmp_path)
+    stream(detector, [(images / '1_a.jpg', 40), (images / '2_b.jpg', 48)])
+    output_file = detector.output_file
+    wait_for(lambda: os.path.exists(output_file) and len(csv_rows(output_file)) == 2)
+
+    # A batch run merges its results in and replaces the file
+    with detections_lock(output_file):
+        detections = load_previous_detections(output_file)
+        detections['batch.jpg'] = {'image_path': 'batch.jpg', 'image_category': 'other'}
+        save_detections(output_file, detections.values())
+
+    stream(detector, [(images / '3_c.jpg', 56)])
+    stats = detector.close()
+
+    assert stats['detected'] == 3
+    paths = [row['image_path'] for row in csv_rows(output_file)]
+    assert sorted(paths) == sorted([str(images / '1_a.jpg'), str(images / '2_b.jpg'), 'batch.jpg',
+                                    str(images / '3_c.jpg')])
+
+
+def test_rescraped_image_replaces_its_row(tmp_path):
+    image = tmp_path / 'images' / 'channel' / '1_a.jpg'
+    detector = make_detector(tmp_path)
+    stream(detector, [(image, 40)])
+    detector.close()
+
+    detector = make_detector(tmp_path)
+    stream(detector, [(image, 64), (tmp_path / 'images' / 'channel' / '2_b.jpg', 48)])
+    detector.close()
+
+    rows = csv_rows(detector.output_file)
+    assert [row['image_path'] for row in rows].count(str(image)) == 1
+    assert len(rows) == 2
+    assert next(row for row in rows if row['image_path'] == str(image))['image_size'] == str(image.stat().st_size)
+
+
+def test_failed_images_and_batches_do_not_stop_the_detector(tmp_path):
+    images = tmp_path / 'images' / 'channel'
+    detector = make_detector(tmp_path)
+    detector.submit(str(images / '1_empty.jpg'), b'', 1, 1)
+    # Detected, but gone from disk before its file identity is read
+    detector.submit(str(images / '2_gone.jpg'), write_image(tmp_path / 'elsewhere.jpg', 40), 1, 2)
+    wait_for(lambda: detector.stats['failed'] == 2)
+
+    # A batch whose CSV write fails
+    write_rows = detector._write_rows
+    def full_disk(rows):
+        detector._write_rows = write_rows
+        raise OSError('No space left on device')
+    detector._write_rows = full_disk
+    stream(detector, [(images / '3_a.jpg', 40)])
+    wait_for(lambda: detector.stats['failed'] == 3)
+
+    stream(detector, [(images / '4_b.jpg', 48)])
+    stats = detector.close()
+
+    assert stats['failed'] == 3 and stats['detected'] == 1
+    assert [row['image_path'] for row in csv_rows(detector.output_file)] == [str(images / '4_b.jpg')]
+
+
+def test_submit_blocks_while_the_queue_is_full(tmp_path):
+    release = threading.Event()
+
+    class SlowModel(FakeModel):
+        def __call__(self, images, **kwargs):
+            release.wait()
+            return super().__call__(images, **kwargs)
+
+    detector = StreamingDetector(output_file=str(tmp_path / 'yolo_detections.csv'),
+                                 boxes_file=str(tmp_path / 'yolo_boxes.parquet'),
+                                 batch_size=1, max_wait=0.01, model=SlowModel(), queue_size=1)
+    paths = [(tmp_path / 'images' / 'channel' / f"{i}_a.jpg", 40) for i in range(1, 4)]
+    # The first image is being detected and the second fills the queue
+    producer = threading.Thread(target=stream, args=(detector, paths))
+    producer.start()
+    wait_for(lambda: detector.stats['submitted'] == 3)
+    time.sleep(0.2)
+    assert producer.is_alive()
+
+    release.set()
+    producer.join(timeout=10)
+    assert not producer.is_alive()
+    assert detector.close()['detected'] == 3